@@ -10,16 +10,14 @@ from lollms.client_session import Client
 import pipmaster as pm
 from lollms.prompting import LollmsContextDetails
 
-if not pm.is_installed("torch"):
-    ASCIIColors.yellow("Diffusers: Torch not found. Installing it")
-    pm.install_multiple(["torch","torchvision","torchaudio"], "https://download.pytorch.org/whl/cu121", force_reinstall=True)
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import is_installed, lazy_import, install_packages, install_requirements
 
-import torch
-if not torch.cuda.is_available():
-    ASCIIColors.yellow("Diffusers: Torch not using cuda. Reinstalling it")
-    pm.install_multiple(["torch","torchvision","torchaudio"], "https://download.pytorch.org/whl/cu121", force_reinstall=True)
-
-import torchaudio
+TORCH_CUDA_INDEX_URL = "https://download.pytorch.org/whl/cu121"
+torchaudio = lazy_import("torchaudio")
 
 from typing import Callable, Any
 class Processor(APScript):
@@ -88,9 +86,10 @@ class Processor(APScript):
     def install(self):
         super().install()
         
-        requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        if not self.torch_has_cuda():
+            ASCIIColors.yellow("Torch not found or not using cuda. Installing it")
+            install_packages(["torch","torchvision","torchaudio"], TORCH_CUDA_INDEX_URL, force_reinstall=is_installed("torch"))
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         try:
             import torchaudio
             ASCIIColors.success("Torch audio OK")
@@ -101,6 +100,12 @@ class Processor(APScript):
         ASCIIColors.success("Installed successfully")
 
 
+    def torch_has_cuda(self):
+        if not is_installed("torch"):
+            return False
+        import torch
+        return torch.cuda.is_available()
+
     def prepare(self):
         if self.music_model is None:
             from audiocraft.models import audiogen
@@ -25,6 +25,11 @@ from lollms.utilities import PromptReshaper, discussion_path_to_url, safe_filena
 from lollms.functions.prompting.image_gen_prompts import get_image_gen_prompt, get_random_image_gen_prompt
 from lollms.client_session import Client
 from lollms.prompting import LollmsContextDetails
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.llm_cache import LLMCacheMixin
 
 
 # Constants for configuration keys
@@ -64,7 +69,7 @@ CONFIG_KEYS = {
     "SD_ADDRESS": "sd_address"
 }
 
-class Processor(APScript):
+class Processor(LLMCacheMixin, APScript):
     """
     ArtBot Personality Script Processor.
     Handles user interaction, prompt generation, and TTI calls.
@@ -111,6 +116,8 @@ class Processor(APScript):
                 {"name": CONFIG_KEYS["THUMBNAIL_RATIO"], "type":"int","value":2, "min":1, "max":5, "help":"Ratio for displaying thumbnails."},
                 {"name": CONFIG_KEYS["NUM_IMAGES"], "type":"int","value":1, "min":1, "max":10,"help":"Number of images to generate sequentially."},
                 {"name": CONFIG_KEYS["MAX_PROMPT_SIZE"], "type":"int","value":1024, "min":64, "max":personality.config["ctx_size"], "help":"Max tokens for LLM generated prompts/titles."},
+                {"name":"llm_cache","type":"bool","value":False, "help":"Reuse the answers of deterministic LLM calls across runs (useful to resume a long job)"},
+                {"name":"llm_cache_max_temperature","type":"float","value":0.0, "min":0.0, "max":2.0, "help":"Only the LLM calls made with a temperature at or below this value are cached"},
 
                 # Legacy/Backend Specific (less emphasis)
                 # {"name": CONFIG_KEYS["SD_MODEL"], "type":"str","value":"", "help":"(Optional) Specific SD model name if using A1111/ComfyUI backend."},
@@ -480,7 +487,7 @@ class Processor(APScript):
             context_size=self.personality.config.ctx_size // 3
         )
         self.print_prompt("Style Selection Prompt", prompt)
-        selected_styles = self.fast_gen(prompt, max_generation_size=100).strip()
+        selected_styles = self.fast_gen(prompt, max_generation_size=100, temperature=0.0).strip()
 
         valid_styles = [s for s in styles_list if s.lower() in selected_styles.lower()]
         return ", ".join(valid_styles)
@@ -504,7 +511,7 @@ class Processor(APScript):
             context_size=self.personality.config.ctx_size // 3
         )
         self.print_prompt("Resolution Selection Prompt", prompt)
-        resolution_str = self.fast_gen(prompt, max_generation_size=20).strip()
+        resolution_str = self.fast_gen(prompt, max_generation_size=20, temperature=0.0).strip()
 
         match = re.search(r'(\d+)\s*,\s*(\d+)', resolution_str)
         if match:
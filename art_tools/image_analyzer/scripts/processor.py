@@ -15,10 +15,15 @@ from lollms.types import MSG_OPERATION_TYPE
 
 import sys
 sys.path.append(str(Path(__file__).parent))
-import torch
-from torchvision import transforms
-from PIL import Image
-from transformers import Blip2Processor, Blip2ForConditionalGeneration
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import
+
+torch = lazy_import("torch")
+transforms = lazy_import("torchvision.transforms", "torchvision")
+Image = lazy_import("PIL.Image", "Pillow")
+transformers = lazy_import("transformers")
 from lollms.utilities import check_and_install_torch
 from typing import Callable, Any
 from lollms.prompting import LollmsContextDetails
@@ -91,8 +96,8 @@ class Processor(APScript):
         if self.model is None:
             self.new_message("",MSG_OPERATION_TYPE.MSG_OPERATION_TYPE_SET_CONTENT_INVISIBLE_TO_AI)
             self.step_start("Loading Blip")
-            self.model = Blip2ForConditionalGeneration.from_pretrained("Salesforce/blip2-opt-2.7b").to(self.personality_config.device)
-            self.processor = Blip2Processor.from_pretrained("Salesforce/blip2-opt-2.7b").to(self.personality_config.device)
+            self.model = transformers.Blip2ForConditionalGeneration.from_pretrained("Salesforce/blip2-opt-2.7b").to(self.personality_config.device)
+            self.processor = transformers.Blip2Processor.from_pretrained("Salesforce/blip2-opt-2.7b").to(self.personality_config.device)
             self.step_end("Loading Blip")
             self.finished_message()
 
@@ -55,7 +55,7 @@ def update_training_session(filepath: str, week: int, volume: int, intensity: in
 def update_training_session_function():
     return {
         "function_name": "update_training_session",
-        "function": partial(update_training_session, filepath=filepath)
+        "function": partial(update_training_session, filepath=filepath),
         "function_description": "Updates a training session in the Excel file.",
         "function_parameters": [
             {"name": "week", "type": "int"},
@@ -83,7 +83,7 @@ def delete_training_session(filepath: str, week: int) -> str:
 def delete_training_session_function():
     return {
         "function_name": "delete_training_session",
-        "function": partial(delete_training_session, filepath=filepath)
+        "function": partial(delete_training_session, filepath=filepath),
         "function_description": "Deletes a training session from the Excel file.",
         "function_parameters": [
             {"name": "week", "type": "int"}
@@ -26,12 +26,14 @@ import sqlite3
 import json
 from datetime import datetime
 from lollms.utilities import PackageManager, discussion_path_to_url, personality_path_to_url
-if not PackageManager.check_package_installed("plotly"):
-    PackageManager.install_package("plotly")
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-import plotly.graph_objs as go
-from plotly.offline import plot
-import plotly.io as pio  # Import Plotly IO for image saving
+go = lazy_import("plotly.graph_objs", "plotly")
+plotly_offline = lazy_import("plotly.offline", "plotly")
+pio = lazy_import("plotly.io", "plotly")  # Plotly IO for image saving
 
 class GuitarLearningDB:
     def __init__(self, db_path='guitar_learning.db'):
@@ -413,7 +415,7 @@ class GuitarLearningDB:
         )
 
         fig = go.Figure(data=data, layout=layout)
-        plot(fig, filename=html_path, auto_open=False)
+        plotly_offline.plot(fig, filename=html_path, auto_open=False)
         
         # Save the plot as a static image
         pio.write_image(fig, image_path)
@@ -552,9 +554,7 @@ class Processor(APScript):
             None
         """        
         super().install()
-        # Example of implementing installation logic. Uncomment and modify as needed.
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")
 
     def help(self, prompt="", full_context=""):
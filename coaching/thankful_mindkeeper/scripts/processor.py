@@ -23,25 +23,16 @@ import sqlite3
 import json
 from datetime import datetime
 from lollms.utilities import PackageManager, discussion_path_to_url
-if not PackageManager.check_package_installed("plotly"):
-    PackageManager.install_package("plotly")
-if not PackageManager.check_package_installed("matplotlib"):
-    PackageManager.install_package("matplotlib")
-import plotly.graph_objs as go
-from plotly.offline import plot
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from lollms.utilities import PackageManager, discussion_path_to_url
-if not PackageManager.check_package_installed("plotly"):
-    PackageManager.install_package("plotly")
-if not PackageManager.check_package_installed("kaleido"):
-    PackageManager.install_package("kaleido")
-
+from pathlib import Path
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
-import kaleido
+go = lazy_import("plotly.graph_objects", "plotly")
+plotly_subplots = lazy_import("plotly.subplots", "plotly")
+pd = lazy_import("pandas")
 
 def create_and_save_happiness_index_plot(data, html_file_path, png_file_path):
     """
@@ -58,7 +49,7 @@ def create_and_save_happiness_index_plot(data, html_file_path, png_file_path):
     df['Timestamp'] = pd.to_datetime(df['Timestamp'])
 
     # Create a subplot
-    fig = make_subplots(rows=1, cols=1)
+    fig = plotly_subplots.make_subplots(rows=1, cols=1)
 
     # Add a scatter plot to the subplot
     fig.add_trace(go.Scatter(x=df['Timestamp'], y=df['Happiness Index'], mode='lines+markers', name='Happiness Index'))
@@ -373,9 +364,7 @@ class Processor(APScript):
             None
         """        
         super().install()
-        # Example of implementing installation logic. Uncomment and modify as needed.
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")
 
     def help(self, prompt="", full_context=""):
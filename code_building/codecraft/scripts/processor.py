@@ -3,6 +3,7 @@ from typing import Any
 from lollms.helpers import ASCIIColors
 from lollms.config import TypedConfig, BaseConfig, ConfigTemplate
 from lollms.personality import APScript, AIPersonality
+from lollms.prompting import LollmsContextDetails
 import subprocess
 from typing import Callable, Any
 
@@ -19,6 +19,10 @@ import sys
 import time
 import threading
 import queue
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.checkpoints import open_run_journal
 
 class CommandExecutor:
     def __init__(self, work_dir = None, shell='cmd.exe' if os.name == 'nt' else '/bin/bash'):
@@ -1026,12 +1030,23 @@ Error:
 
         self.step_start("Executing project tasks...")
 
-        for task_index, task in enumerate(self.project_details.get("tasks", [])):
+        # The tasks of the plan that succeeded before a crash or a restart are not executed again
+        tasks = self.project_details.get("tasks", [])
+        task_keys = [[task_index, {k: v for k, v in task.items() if k != "status"}] for task_index, task in enumerate(tasks)]
+        journal = open_run_journal(self.personality, "execute_project", self.work_folder, [key for _, key in task_keys], folder=self.work_folder/".checkpoints")
+        all_succeeded = True
+        for task_index, task in enumerate(tasks):
+            if journal.done("task", task_keys[task_index]):
+                task["status"]="success"
+                self.step(f"Task {task_index+1} ({task.get('task_type')}) already done")
+                continue
+            success = False
             n=0
             while n<self.personality_config.max_retries:
                 success = self.execute_task(self.project_details, task)
                 task["status"]="success" if success else "failure"
                 if success:
+                    journal.record("task", task_keys[task_index])
                     self.project_details["current_task_index"]=task_index
                     with open(self.work_folder/"project_cfg.json","w") as f:
                         json.dump(self.project_details,f,indent=2)
@@ -1041,6 +1056,9 @@ Error:
                     self.step(f"Failed to execute task: {task['task_type']}")
                     self.step(f"Thinking...")
                     n += 1
+            all_succeeded = all_succeeded and success
 
+        if all_succeeded:
+            journal.finish()
         self.step_start("Project execution completed successfully.")
         
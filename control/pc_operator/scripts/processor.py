@@ -7,11 +7,14 @@ from typing import Callable, Any
 from lollms.prompting import LollmsContextDetails
 
 from functools import partial
-if PackageManager.check_package_installed("pyautogui"):
-    import pyautogui
-else:
-    PackageManager.install_package("pyautogui")
-    import pyautogui
+import sys
+from pathlib import Path
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+pyautogui = lazy_import("pyautogui")
 from PIL import Image
 import webbrowser
 import subprocess
@@ -66,10 +69,7 @@ class Processor(APScript):
         
     def install(self):
         super().install()
-        
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")        
 
     def help(self, prompt="", full_context=""):
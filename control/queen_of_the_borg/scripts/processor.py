@@ -9,13 +9,13 @@ from lollms.prompting import LollmsContextDetails
 
 from pathlib import Path
 from typing import List
-if PackageManager.check_package_installed("pygame"):
-    import pygame
-else:
-    PackageManager.install_package("pygame")
-    import pygame
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-pygame.mixer.init()
+pygame = lazy_import("pygame")
 import subprocess
 
 # Helper functions
@@ -66,10 +66,7 @@ class Processor(APScript):
         
     def install(self):
         super().install()
-        
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")        
 
     def mounted(self):
@@ -79,6 +76,8 @@ class Processor(APScript):
         pass
 
     def play_mp3(self, file_path):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
         pygame.mixer.music.load(file_path)
         pygame.mixer.music.play()
 
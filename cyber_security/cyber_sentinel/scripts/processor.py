@@ -12,11 +12,18 @@ from lollmsvectordb.database_elements.document import Document
 import subprocess
 from pathlib import Path
 import json
-import pipmaster as pm
-if not pm.is_installed("watchdog"):
-    pm.install("watchdog")
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+watchdog_observers = lazy_import("watchdog.observers", "watchdog")
+try:
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    # watchdog is installed by install(), logs monitoring is unavailable until then
+    FileSystemEventHandler = object
 
 # Helper functions
 class Processor(APScript, FileSystemEventHandler):
@@ -74,10 +81,7 @@ class Processor(APScript, FileSystemEventHandler):
     def install(self):
         super().install()
         
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "watchdog"])      
-        subprocess.run(["pip", "install", "--upgrade", "dpkt"])      
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         
         ASCIIColors.success("Installed successfully")        
 
@@ -216,7 +220,7 @@ Here is my report as a valid json:
             self.personality.info("Please setup logs folder path first")
             return
         self.new_message("Starting continuous logs process...")
-        self.observer = Observer()
+        self.observer = watchdog_observers.Observer()
         self.observer.schedule(self, self.personality_config.logs_path, recursive=True)
         self.observer.start()
     
@@ -1,8 +1,12 @@
-import pipmaster as pm
-if pm.is_installed("python-nmap"):
-    pm.install("python-nmap")
-import nmap
 import random
+import sys
+from pathlib import Path
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+nmap = lazy_import("nmap", "python-nmap")
 from lollms.personality import APScript, AIPersonality
 from lollms.client_session import Client
 from lollms.helpers import ASCIIColors
@@ -113,6 +117,8 @@ class Processor(APScript):
         print("Network Monitor selected")
 
     def install(self):
+        super().install()
+        install_requirements(self.personality.personality_package_path)
         print("Network Monitor installed")
 
     def help(self, prompt="", full_context=""):
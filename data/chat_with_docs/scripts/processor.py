@@ -1,12 +1,13 @@
 from lollms.config import TypedConfig, BaseConfig, ConfigTemplate, InstallOption
 from lollms.types import MSG_OPERATION_TYPE
 from lollms.personality import APScript, AIPersonality
+from lollms.prompting import LollmsContextDetails
 from lollms.paths import LollmsPaths
 from lollms.types import MSG_OPERATION_TYPE
 from typing import Callable, Any
 
 from ascii_colors import ASCIIColors, trace_exception
-from safe_store import TextVectorizer, VectorizationMethod, GenericDataLoader
+from safe_store import GenericDataLoader
 
 import numpy as np
 import json
@@ -14,9 +15,18 @@ from pathlib import Path
 import numpy as np
 import json
 import subprocess
+import threading
 from urllib.parse import quote
-
-class Processor(APScript):
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.token_cache import get_token_cache
+from zoo_utilities.doc_index import DocumentIndex, ModelEmbeddings, pack_chunks
+from zoo_utilities.text_clustering import TfidfModel
+from zoo_utilities.batch_generation import BatchGenerationMixin
+
+class Processor(BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -37,10 +47,15 @@ class Processor(APScript):
                 {"name":"batch_mode_questions_file","type":"str","value":"", "help":"A path to a text file containing the list of questions"},
                 {"name":"batch_mode_report_file","type":"str","value":"", "help":"A path to a markdown file to be created."},
                 {"name":"custom_discussion_db_name","type":"str","value":"", "help":"if not empty, you can change this to the path of the database you want to create or use"},
-                {"name":"build_keywords","type":"bool","value":True, "help":"If true, the model will first generate keywords before searching"},
+                {"name":"search_mode","type":"str","value":"hybrid", "options":["hybrid", "dense", "bm25"], "help":"How the chunks are searched: hybrid fuses the vector search with a keyword (BM25) search, dense only uses the vectors and bm25 only the keywords"},
+                {"name":"build_keywords","type":"bool","value":False, "help":"If true, the model will first generate keywords before searching (one more generation per question, rarely useful with the hybrid search)"},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
                 {"name":"load_db","type":"bool","value":False, "help":"If true, the vectorized database will be loaded at startup"},
                 {"name":"save_db","type":"bool","value":False, "help":"If true, the vectorized database will be saved for future use"},
                 {"name":"vectorization_method","type":"str","value":f"model_embedding", "options":["model_embedding", "tfidf_vectorizer"], "help":"Vectoriazation method to be used (changing this should reset database)"},
+                {"name":"embeddings_dtype","type":"str","value":"float32", "options":["float32", "float16"], "help":"Type of the stored embeddings (float16 halves the size of the database on disk and in memory)"},
+                {"name":"ann_probes","type":"int","value":0, "min":0, "max":1024, "help":"Number of clusters searched by the approximate search of databases of more than 10000 chunks (0 for an exact search). More clusters find more of the closest chunks but are slower"},
+                {"name":"ann_lists","type":"int","value":0, "min":0, "max":65536, "help":"Number of clusters of the approximate search (0 to use the square root of the number of chunks)"},
                 {"name":"show_interactive_form","type":"bool","value":False, "help":"If true, a window wil be shown with the data plot in an interactive form"},
                 
                 {"name":"nb_chunks","type":"int","value":2, "min":1, "max":50,"help":"Number of data chunks to use for its vector (at most nb_chunks*max_chunk_size must not exeed two thirds the context size)"},
@@ -52,6 +67,7 @@ class Processor(APScript):
                 
                 {"name":"data_visualization_method","type":"str","value":f"PCA", "options":["PCA", "TSNE"], "help":"The method to be used to show data"},
                 {"name":"interactive_mode_visualization","type":"bool","value":False, "help":"If true, you can get an interactive visualization where you can point on data to get the text"},
+                {"name":"visualization_max_points","type":"int","value":3000, "min":100, "help":"Maximum number of chunks drawn by the database visualization. Larger databases are drawn on a random sample of their chunks"},
                 {"name":"visualize_data_at_startup","type":"bool","value":False, "help":"If true, the database will be visualized at startup"},
                 {"name":"visualize_data_at_add_file","type":"bool","value":False, "help":"If true, the database will be visualized when a new file is added"},
                 {"name":"visualize_data_at_generate","type":"bool","value":False, "help":"If true, the database will be visualized at generation time"},
@@ -87,6 +103,8 @@ class Processor(APScript):
         self.personality = personality
         self.callback = None
         self.vector_store = None
+        self.visualization_lock = threading.Lock()
+        self.visualization_thread = None
 
 
     def install(self):
@@ -103,78 +121,121 @@ class Processor(APScript):
     def help(self, prompt, full_context):
         self.set_message_content(self.personality.help, callback=self.callback)
         
+    def get_references(self, chunk_ids):
+        """
+        Returns the [title, link] of the document chunks used for an answer.
+        """
+        docs_sources=[]
+        for chunk_id in chunk_ids:
+            e = "_".join(chunk_id.replace("\\","/").split("/")[-1].split('_')[:-2])
+            ci = "_".join(chunk_id.replace("\\","/").split("/")[-1].split('_')[-2:])
+            name = "/uploads/" + self.personality.personality_folder_name + "/" + e
+            path = e + f" chunk id : {ci}"
+            docs_sources.append([path, name])
+        return docs_sources
+
+    def pack_documentation(self, chunks, prompt_text):
+        """
+        Packs the retrieved chunks in the context left by the rest of the prompt and the answer.
+
+        Args:
+            chunks (list): The chunks found by the search, best first.
+            prompt_text (str): The rest of the prompt (discussion, question...).
+
+        Returns:
+            tuple: The documentation text and the packing report of `pack_chunks`.
+        """
+        count = get_token_cache(self.personality.model).count
+        header = f"{self.config.start_header_id_template}document chunk {chunks[0]['chunk_id'] if chunks else ''}:\n"
+        budget = self.personality.config.ctx_size - int(self.personality_config.max_answer_size) - count(prompt_text)
+        packed = pack_chunks(chunks, budget, count_tokens=count, chunk_overhead=count(header)+1)
+        if packed["dropped"] or packed["redundant"]:
+            ASCIIColors.warning(f"Left out of the context: {len(packed['dropped'])} chunks too large for the {budget} tokens left, {len(packed['redundant'])} already covered by other chunks")
+        docs = '\n'.join([f"{self.config.start_header_id_template}document chunk {', '.join(passage['chunk_ids'])}:\n{passage['text']}" for passage in packed["passages"]])
+        return docs, packed
+
+    def packing_report(self, packed, heading="##"):
+        """
+        Returns the markdown listing of the references used for an answer and of the chunks left out.
+        """
+        used_ids = [chunk_id for passage in packed["passages"] for chunk_id in passage["chunk_ids"]]
+        report = f"\n{heading} Used References:\n" + "\n".join([f'[{v[0]}]({quote(v[1])})\n' for v in self.get_references(used_ids)])
+        if packed["dropped"]:
+            report += f"\n{heading}# Left out (no room left in the context):\n" + "\n".join([f'[{v[0]}]({quote(v[1])})\n' for v in self.get_references(packed["dropped"])])
+        return report
+
     def process_batch(self, prompt, full_context):
-        output = ""
+        """
+        Answers the questions of the questions file: the search queries are all generated at once, the questions
+        are searched together with one vectorizer call, and the answers are generated concurrently. Each answer
+        is appended to the report as soon as it and the ones before it are ready.
+        """
         if self.personality_config.batch_mode_questions_file=="":
             self.new_message("Please set a questions list file to my configuration to start batch qna")
             return
         self.new_message("")
         questions = GenericDataLoader.read_file(self.personality_config.batch_mode_questions_file)
-        questions = questions.split("\n")
-        for i, question in enumerate(questions):
-            if len(question)>5:
-                output += "## Question:\n"+question+"\n"
-                self.set_message_content(output)
-                self.step_start(f"Analyzing request {i+1}/{len(questions)}")
-                if self.personality_config.build_keywords:
-                    query = self.personality.fast_gen("{self.config.start_header_id_template}prompt:"+question+"{self.config.separator_template}{self.config.start_header_id_template}instruction: Convert the prompt to a web search query."+"\nDo not answer the prompt. Do not add explanations. Use comma separated syntax to make a list of keywords in the same line.\nThe keywords should reflect the ideas written in the prompt so that a seach engine can process them efficiently.{self.config.separator_template}{self.config.start_header_id_template}query: ", max_generation_size=256, show_progress=True)
-                    preprocessed_prompt = self.fast_gen(query, int(self.personality_config["max_answer_size"]),show_progress=True).strip()
-                    output += "### Query:\n"+preprocessed_prompt+"\n"
-                    self.set_message_content(output)
-                else:
-                    preprocessed_prompt = question
-                if preprocessed_prompt=="":
-                    preprocessed_prompt = prompt
-                docs, sorted_similarities, document_ids = self.vector_store.recover_text(preprocessed_prompt, top_k=int(self.personality_config.nb_chunks))
-                docs = '\n'.join([f"{self.config.start_header_id_template}document {s[0]}:\n{v}" for i,(v,s) in enumerate(zip(docs,sorted_similarities))])
-                full_text =f"""{docs}
-{full_context}"""
-
-                tk = self.personality.model.tokenize(full_text)
-                # print(f"total: {len(tk)}")           
-                ASCIIColors.blue("-------------- Documentation -----------------------")
-                ASCIIColors.blue(full_text)
-                ASCIIColors.blue(f"Number of tokens :{len(tk)}")
-                ASCIIColors.blue("----------------------------------------------------")
-                tk = self.personality.model.tokenize(full_text)
-                ASCIIColors.info(f"Documentation size in tokens : {len(tk)}")
-                if self.personality.config.debug:
-                    ASCIIColors.yellow(full_text)
-                answer = self.fast_gen(full_text, self.personality_config["max_answer_size"],show_progress=True).strip()
-                output += "## Answer:\n"+answer+"\n"
-                self.set_message_content(output)
-                docs_sources=[]
-                for entry in sorted_similarities:
-                    e = "_".join(entry[0].replace("\\","/").split("/")[-1].split('_')[:-2])
-                    ci = "_".join(entry[0].replace("\\","/").split("/")[-1].split('_')[-2:])
-                    name = "/uploads/" + self.personality.personality_folder_name + "/" + e
-                    path = e + f" chunk id : {ci}"
-                    docs_sources.append([path, name])
-
-                output += "\n### Used References:\n" + "\n".join([f'[{v[0]}]({quote(v[1])})\n' for v in docs_sources])
-                ASCIIColors.yellow(output)
-
-                self.step_end(f"Analyzing request {i+1}/{len(questions)}")
-                self.set_message_content(output)                
-        self.step_start("Saving report")
-        if self.personality_config.batch_mode_report_file!="":
-            with open(self.personality_config.batch_mode_report_file, "w") as f:
-                f.write(output)
-        self.step_end("Saving report")
+        questions = [question for question in questions.split("\n") if len(question)>5]
+        if len(questions)==0:
+            self.set_message_content("The questions file holds no question")
+            return
+
+        if self.personality_config.build_keywords:
+            keyword_prompts = [f"{self.config.start_header_id_template}prompt:{question}{self.config.separator_template}{self.config.start_header_id_template}instruction: Convert the prompt to a web search query."+f"\nDo not answer the prompt. Do not add explanations. Use comma separated syntax to make a list of keywords in the same line.\nThe keywords should reflect the ideas written in the prompt so that a seach engine can process them efficiently.{self.config.separator_template}{self.config.start_header_id_template}query: " for question in questions]
+            queries = self.map_generate(keyword_prompts, max_generation_size=256, label="Building search queries", return_exceptions=True)
+            queries = [query.strip() if isinstance(query, str) and query.strip()!="" else question for query, question in zip(queries, questions)]
+        else:
+            queries = questions
+
+        self.step_start("Searching the documents")
+        results = self.vector_store.search_many(queries, top_k=int(self.personality_config.nb_chunks))
+        self.step_end("Searching the documents")
+
+        prompts = []
+        packings = []
+        for question, chunks in zip(questions, results):
+            prompt_text = f"""{self.config.start_header_id_template}question: {question}
+{self.config.start_header_id_template}chat_with_docs:"""
+            docs, packed = self.pack_documentation(chunks, prompt_text)
+            packings.append(packed)
+            full_text =f"""{docs}
+{prompt_text}"""
+            ASCIIColors.info(f"Documentation size in tokens : {get_token_cache(self.personality.model).count(full_text)}")
+            if self.personality.config.debug:
+                ASCIIColors.yellow(full_text)
+            prompts.append(full_text)
+
+        report_file = self.personality_config.batch_mode_report_file
+        if report_file!="":
+            Path(report_file).write_text("", encoding="utf8")
+        sections = []
+        def write_answer(index, answer):
+            if isinstance(answer, Exception):
+                answer = f"Couldn't answer this question: {answer}"
+            section = "## Question:\n"+questions[index]+"\n"
+            if self.personality_config.build_keywords:
+                section += "### Query:\n"+queries[index]+"\n"
+            section += "## Answer:\n"+answer.strip()+"\n"
+            section += self.packing_report(packings[index], heading="###") + "\n"
+            sections.append(section)
+            if report_file!="":
+                with open(report_file, "a", encoding="utf8") as f:
+                    f.write(section)
+            self.set_message_content("".join(sections))
+
+        self.map_generate(prompts, max_generation_size=self.personality_config["max_answer_size"], label="Answering questions", on_result=write_answer, return_exceptions=True)
+        ASCIIColors.yellow("".join(sections))
 
     def show_database(self, prompt, full_context):
-        import random
         if self.ready:
-            out_pth = self.personality.lollms_paths.personal_uploads_path/f"{self.personality.personality_folder_name}/"
-            out_pth.mkdir(parents=True, exist_ok=True)
-            out_path = f"/uploads/{self.personality.personality_folder_name}/"
-            end = random.randint(0,99999)
-            out_path+=f"db{end}.png"
-            self.vector_store.show_document(save_fig_path=out_pth/"db.png",show_interactive_form=self.personality_config.show_interactive_form)
-            if self.personality_config.data_visualization_method=="PCA":
-                self.set_message_content(f"Database representation (PCA):\n![{out_path}]({out_path})", callback=self.callback)
+            method = self.personality_config.data_visualization_method
+            self.step_start(f"Computing the database representation ({method})")
+            out_path = self.visualize_database(wait=10)
+            self.step_end(f"Computing the database representation ({method})")
+            if out_path is not None:
+                self.set_message_content(f"Database representation ({method}):\n![{out_path}]({out_path})", callback=self.callback)
             else:
-                self.set_message_content(f"Database representation (TSNE):\n![{out_path}]({out_path})", callback=self.callback)
+                self.set_message_content(f"The database representation ({method}) is being computed in the background. Ask again in a moment to see it.", callback=self.callback)
 
     def set_database(self, prompt, full_context):
         self.goto_state("waiting_for_file")
@@ -205,36 +266,26 @@ class Processor(APScript):
                 preprocessed_prompt = prompt
             self.set_message_content(f"Query : {preprocessed_prompt}")
 
-            docs, sorted_similarities, document_ids = self.vector_store.recover_text(preprocessed_prompt, top_k=int(self.personality_config.nb_chunks))
-            # for doc in docs:
-            #     tk = self.personality.model.tokenize(doc)
-            #     print(len(tk))
-            docs = '\n'.join([f"{self.config.start_header_id_template}document chunk {s[0]}:\n{v}" for i,(v,s) in enumerate(zip(docs,sorted_similarities))])
-            full_text =f"""{docs}
-{full_context}
+            chunks = self.vector_store.search_chunks(preprocessed_prompt, top_k=int(self.personality_config.nb_chunks))
+            if self.personality_config.visualize_data_at_generate:
+                self.visualize_database()
+            prompt_text = f"""{full_context}
 {self.config.start_header_id_template}chat_with_docs:"""
+            docs, packed = self.pack_documentation(chunks, prompt_text)
+            full_text =f"""{docs}
+{prompt_text}"""
 
-            tk = self.personality.model.tokenize(full_text)
-            # print(f"total: {len(tk)}")           
+            nb_tokens = get_token_cache(self.personality.model).count(full_text)
             ASCIIColors.blue("-------------- Documentation -----------------------")
             ASCIIColors.blue(full_text)
-            ASCIIColors.blue(f"Number of tokens :{len(tk)}")
+            ASCIIColors.blue(f"Number of tokens :{nb_tokens}")
             ASCIIColors.blue("----------------------------------------------------")
             ASCIIColors.blue("Thinking")
-            tk = self.personality.model.tokenize(full_text)
-            ASCIIColors.info(f"Documentation size in tokens : {len(tk)}")
+            ASCIIColors.info(f"Documentation size in tokens : {nb_tokens}")
             if self.personality.config.debug:
                 ASCIIColors.yellow(full_text)
             output = self.generate(full_text, self.personality_config["max_answer_size"]).strip()
-            docs_sources=[]
-            for entry in sorted_similarities:
-                e = "_".join(entry[0].replace("\\","/").split("/")[-1].split('_')[:-2])
-                ci = "_".join(entry[0].replace("\\","/").split("/")[-1].split('_')[-2:])
-                name = "/uploads/" + self.personality.personality_folder_name + "/" + e
-                path = e + f" chunk id : {ci}"
-                docs_sources.append([path, name])
-
-            output += "\n## Used References:\n" + "\n".join([f'[{v[0]}]({quote(v[1])})\n' for v in docs_sources])
+            output += self.packing_report(packed)
 
             ASCIIColors.yellow(output)
 
@@ -243,53 +294,113 @@ class Processor(APScript):
         else:
             self.set_message_content("Vector store is not ready. Please send me a document to use. Use Send file command form your chatbox menu to trigger this.", callback=self.callback)
 
-    def build_db(self):
+    def get_vector_store(self):
+        """
+        Returns the index of the chunks of the documents, loading it from the database folder the first time.
+        """
         if self.vector_store is None:
-            root_db_folder = self.personality.lollms_paths.self.personal_discussions_path/self.personality.personality_folder_name
+            root_db_folder = self.personality.lollms_paths.personal_discussions_path/self.personality.personality_folder_name
             root_db_folder.mkdir(exist_ok=True, parents=True)
-            self.vector_store = TextVectorizer(                     
-                    self.personality_config.vectorization_method, # supported "model_embedding" or "tfidf_vectorizer"
-                    model=self.personality.model, #needed in case of using model_embedding
-                    database_path=root_db_folder/"db.json" if self.personality_config.custom_discussion_db_name=="" else self.personality_config.custom_discussion_db_name,
-                    save_db=self.personality_config.save_db,
-                    visualize_data_at_startup=self.personality_config.visualize_data_at_startup,
-                    visualize_data_at_add_file=self.personality_config.visualize_data_at_add_file,
-                    visualize_data_at_generate=self.personality_config.visualize_data_at_generate
-                    )        
-        if len(self.vector_store.chunks)>0:
-            self.ready = True
+            database_path = root_db_folder/"db.json" if self.personality_config.custom_discussion_db_name=="" else Path(self.personality_config.custom_discussion_db_name)
+            try:
+                chunk_size=int(self.personality_config["max_chunk_size"])
+            except:
+                ASCIIColors.warning(f"Couldn't read chunk size. Verify your configuration file")
+                chunk_size=512
+            try:
+                overlap_size=int(self.personality_config["chunk_overlap_sentences"])
+            except:
+                ASCIIColors.warning(f"Couldn't read chunk size. Verify your configuration file")
+                overlap_size=1
+            if self.personality_config.vectorization_method=="tfidf_vectorizer":
+                vectorizer = TfidfModel()
+            else:
+                vectorizer = ModelEmbeddings(self.personality.model)
+            self.vector_store = DocumentIndex(
+                    # The index lives in a folder named after the database file
+                    database_path.with_suffix("") if self.personality_config.save_db else None,
+                    vectorizer,
+                    chunk_size=chunk_size,
+                    overlap=overlap_size,
+                    count_tokens=get_token_cache(self.personality.model).count,
+                    read_file=GenericDataLoader.read_file,
+                    dtype=self.personality_config.embeddings_dtype,
+                    ann_probes=self.personality_config.ann_probes,
+                    ann_lists=self.personality_config.ann_lists,
+                    search_mode=self.personality_config.search_mode
+                    )
+        return self.vector_store
 
+    def build_db(self):
+        """
+        Brings the index up to date with the documents: only new or modified files are read, chunked and embedded,
+        and the chunks of the files that are no longer in the discussion are removed.
+        """
         ASCIIColors.info("-> Vectorizing the database")
-        for file in self.personality.text_files:
-            try:
-                text =  GenericDataLoader.read_file(file)
-                try:
-                    chunk_size=int(self.personality_config["max_chunk_size"])
-                except:
-                    ASCIIColors.warning(f"Couldn't read chunk size. Verify your configuration file")
-                    chunk_size=512
-                try:
-                    overlap_size=int(self.personality_config["chunk_overlap_sentences"])
-                except:
-                    ASCIIColors.warning(f"Couldn't read chunk size. Verify your configuration file")
-                    overlap_size=50
-
-                self.vector_store.add_document(file, text, chunk_size=chunk_size, overlap_size=overlap_size)
-                
-                ASCIIColors.success(f"File {file} added successfully")
-            except Exception as ex:
-                ASCIIColors.error(f"Couldn't add {file}: The vectorizer threw this exception:{ex}")
-                trace_exception(ex)
-                return False
         try:
-            self.vector_store.index()
-            self.ready = True
-            ASCIIColors.success(f"Database indexed successfully")
-            return True
+            changes = self.get_vector_store().sync(
+                self.personality.text_files,
+                on_progress=lambda path, status: ASCIIColors.info(f"Vectorizing {path} ({status})")
+            )
         except Exception as ex:
             ASCIIColors.error(f"Couldn't vectorize database The vectorizer threw this exception:{ex}")
             trace_exception(ex)
             return False
+        for file in changes["added"] + changes["updated"]:
+            ASCIIColors.success(f"File {file} added successfully")
+        self.ready = self.vector_store.ready
+        ASCIIColors.success(f"Database indexed successfully ({len(changes['added'])} added, {len(changes['updated'])} updated, {len(changes['removed'])} removed, {len(changes['unchanged'])} unchanged)")
+        if self.personality_config.visualize_data_at_add_file:
+            self.visualize_database()
+        return True
+
+    def database_image(self):
+        """
+        Returns the path of the image of the database and its url. The name changes with the corpus,
+        so an image is never shown for a database it doesn't represent.
+        """
+        out_pth = self.personality.lollms_paths.personal_uploads_path/f"{self.personality.personality_folder_name}/"
+        out_pth.mkdir(parents=True, exist_ok=True)
+        file_name = f"db_{self.personality_config.data_visualization_method}_{self.vector_store.corpus_version}.png"
+        return out_pth/file_name, f"/uploads/{self.personality.personality_folder_name}/{file_name}"
+
+    def render_database_image(self):
+        """
+        Draws the image of the database, then removes the images of its previous versions.
+        """
+        try:
+            image_path, _ = self.database_image()
+            temporary = image_path.with_suffix(".tmp.png")
+            self.vector_store.show_document(save_fig_path=temporary, method=self.personality_config.data_visualization_method, max_points=self.personality_config.visualization_max_points)
+            if temporary.exists():
+                temporary.replace(image_path)
+            for old_image in image_path.parent.glob("db_*.png"):
+                if old_image != image_path:
+                    old_image.unlink(missing_ok=True)
+        except Exception as ex:
+            trace_exception(ex)
+
+    def visualize_database(self, wait: float = 0):
+        """
+        Returns the url of the image of the database, or None if it is not drawn yet.
+
+        The projection of large databases takes a while, so the image is drawn by a background thread
+        and this only waits `wait` seconds for it. The interactive window is shown in the calling thread.
+        """
+        if self.personality_config.show_interactive_form:
+            self.vector_store.show_document(show_interactive_form=True, method=self.personality_config.data_visualization_method, max_points=self.personality_config.visualization_max_points)
+        image_path, url = self.database_image()
+        if image_path.exists():
+            return url
+        with self.visualization_lock:
+            if self.visualization_thread is None or not self.visualization_thread.is_alive():
+                self.visualization_thread = threading.Thread(target=self.render_database_image, daemon=True)
+                self.visualization_thread.start()
+            thread = self.visualization_thread
+        if wait > 0:
+            thread.join(wait)
+        # The corpus may have changed while the thread was drawing: its image is then not this one
+        return url if image_path.exists() else None
             
     def add_file(self, path, client, callback=None):
         if callback is None and self.callback is not None:
@@ -314,24 +425,11 @@ class Processor(APScript):
 
     def prepare(self):
         if self.vector_store is None:
-            root_db_folder = self.personality.lollms_paths.personal_discussions_path/self.personality.personality_folder_name
-            root_db_folder.mkdir(exist_ok=True, parents=True)
-            self.vector_store = TextVectorizer(                     
-                    self.personality_config.vectorization_method, # supported "model_embedding" or "tfidf_vectorizer"
-                    model=self.personality.model, #needed in case of using model_embedding
-                    database_path=root_db_folder/"db.json" if self.personality_config.custom_discussion_db_name=="" else self.personality_config.custom_discussion_db_name,
-                    save_db=self.personality_config.save_db
-            )        
-
-
-        if self.vector_store and self.personality_config.vectorization_method==VectorizationMethod.TFIDF_VECTORIZER:
-            from safe_store.tf_idf_vectorizer import TfidfVectorizer
-            data = list(self.vector_store.texts.values())
-            if len(data)>0:
-                self.vectorizer = TfidfVectorizer()
-                self.vectorizer.fit(data)
-
-        if len(self.vector_store.chunks)>0:
+            self.get_vector_store()
+            if self.personality_config.visualize_data_at_startup and self.vector_store.ready:
+                self.visualize_database()
+
+        if self.vector_store.ready:
             self.ready = True
 
     from lollms.client_session import Client
@@ -363,7 +461,7 @@ class Processor(APScript):
         self.callback = callback
         self.prepare()
 
-        self.process_state(prompt, full_context, callback)
+        self.process_state(prompt, previous_discussion_text, callback)
 
         return ""
 
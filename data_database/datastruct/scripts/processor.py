@@ -15,14 +15,6 @@ from typing import Callable, Any
 from lollms.client_session import Client
 from lollms.prompting import LollmsContextDetails
 
-try:
-    if not PackageManager.check_package_installed("sqlite3"):
-        PackageManager.install_package("sqlite3")
-    import sqlite3
-except Exception as ex:
-    pass
-
-
 import sqlite3
 
 class DBToText:
@@ -119,8 +111,6 @@ class Processor(APScript):
         
     def install(self):
         super().install()
-        if not PackageManager.check_package_installed("sqlite3"):
-            PackageManager.install_package("sqlite3")
         # requirements_file = self.personality.personality_package_path / "requirements.txt"
         # Install dependencies using pip from requirements.txt
         # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
@@ -14,7 +14,13 @@ import subprocess
 from typing import Callable, Any
 from datetime import datetime
 from lollms.prompting import LollmsContextDetails
-import pandas as pd
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import
+
+pd = lazy_import("pandas")
 import json
 import io
 
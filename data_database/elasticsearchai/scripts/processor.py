@@ -9,10 +9,14 @@ import importlib.util
 import subprocess
 import ssl
 
-if not PackageManager.check_package_installed("elasticsearch"):
-    PackageManager.install_package("elasticsearch")
+from pathlib import Path
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-from elasticsearch import Elasticsearch
+elasticsearch = lazy_import("elasticsearch")
 
 import json
 # Helper functions
@@ -81,10 +85,7 @@ class Processor(APScript):
         
     def install(self):
         super().install()
-        
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")        
 
     def help(self, prompt="", full_context=""):
@@ -152,7 +153,7 @@ class Processor(APScript):
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
-            self.es = Elasticsearch(
+            self.es = elasticsearch.Elasticsearch(
                 self.personality_config.servers.replace(" ", "").replace(".","").split(","), 
                 http_auth=(self.personality_config.user, self.personality_config.password),
                 verify_certs=False)
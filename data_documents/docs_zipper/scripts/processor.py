@@ -1,6 +1,7 @@
 from lollms.helpers import ASCIIColors
 from lollms.config import TypedConfig, BaseConfig, ConfigTemplate
 from lollms.personality import APScript, AIPersonality
+from lollms.prompting import LollmsContextDetails
 from lollms.types import MSG_OPERATION_TYPE
 from typing import Callable, Any
 
@@ -10,8 +11,17 @@ import subprocess
 from pathlib import Path
 from lollms.client_session import Client
 from lollms.types import SUMMARY_MODE
+from safe_store import GenericDataLoader
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.token_cache import get_token_cache
+from zoo_utilities.checkpoints import open_run_journal
+from zoo_utilities.batch_generation import BatchGenerationMixin
+from zoo_utilities.summary_tree import summarize_tree
 # Helper functions
-class Processor(APScript):
+class Processor(BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -31,7 +41,8 @@ class Processor(APScript):
         # options can be added using : "options":["option1","option2"...]        
         personality_config_template = ConfigTemplate(
             [
-                {"name":"zip_mode","type":"str","value":"sequencial","options":["sequencial", "hierarchical"], "help":"algorithm"},
+                {"name":"zip_mode","type":"str","value":"sequencial","options":["sequencial", "hierarchical", "map_reduce"], "help":"algorithm. map_reduce gives the hierarchical summary but sends the chunk summaries concurrently and merges them as soon as enough of them are ready"},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
                 {"name":"zip_size","type":"int","value":1024, "help":"the maximum size of the summary in tokens"},
                 {"name":"data_folder","type":"str","value":"", "help":"The path to a folder where to get the input files."},
                 {"name":"output_path","type":"str","value":"", "help":"The path to a folder where to put the summary file."},
@@ -124,23 +135,45 @@ class Processor(APScript):
         zip_prompt+=f"Important information:{contextual_zipping_text}."+"{separator_template}" if contextual_zipping_text!='' else ''
         zip_prompt+=f"The summary should be written in "+ translate_to +"{separator_template}" if translate_to!='' else ''
         
-        if self.config.dubug:
+        if self.config.debug:
             self.print_prompt(zip_prompt,"zip_prompt")
-        tk = self.personality.model.tokenize(document_text)
-        if len(tk)>int(self.personality_config.zip_size):
+        # The decomposer tokenizes the text again, the cache makes it free
+        token_cache = get_token_cache(self.personality.model)
+        if token_cache.count(document_text)>int(self.personality_config.zip_size) and self.personality_config.zip_mode=="map_reduce":
+            from safe_store.document_decomposer import DocumentDecomposer
+            chunk_size = int(self.personality.config.ctx_size*0.6)
+            document_chunks = DocumentDecomposer.decompose_document(document_text, chunk_size, 0, token_cache.tokenize, token_cache.detokenize, True)
+            # The summaries are generated from worker threads: summarize_chunks would share the
+            # personality answer buffer, so the hierarchical prompt is built here and sent with isolated_generate
+            chunk_header = f"{start_header_id_template}Document chunk{end_header_id_template}{separator_template}"
+            chunk_footer = f"{separator_template}{zip_prompt}"
+            chunk_footer+= f"Answer directly with the summary with no extra comments.{separator_template}"
+            chunk_footer+= f"{start_ai_header_id_template}summary{end_ai_header_id_template}"
+            self.step_start(f"Compressing {len(document_chunks)} chunks")
+            document_text = summarize_tree(
+                document_chunks,
+                lambda text: self.isolated_generate(chunk_header + text + chunk_footer),
+                count_tokens=token_cache.count,
+                input_budget=chunk_size,
+                target_size=int(self.personality_config.zip_size),
+                concurrency=self.default_llm_concurrency(),
+                on_progress=lambda finished, submitted: self.step(f"Compressing: {finished}/{submitted} summaries"),
+            )
+            self.step_end(f"Compressing {len(document_chunks)} chunks")
+        elif token_cache.count(document_text)>int(self.personality_config.zip_size):
+            from safe_store.document_decomposer import DocumentDecomposer
             depth=0
-            while len(tk)>int(self.personality_config.zip_size):
+            while token_cache.count(document_text)>int(self.personality_config.zip_size):
                 if self.personality_config.zip_mode!="sequencial":
                     self.step_start(f"Comprerssing.. [depth {depth}]")
                 chunk_size = int(self.personality.config.ctx_size*0.6)
-                document_chunks = DocumentDecomposer.decompose_document(document_text, chunk_size, 0, self.personality.model.tokenize, self.personality.model.detokenize, True)
+                document_chunks = DocumentDecomposer.decompose_document(document_text, chunk_size, 0, token_cache.tokenize, token_cache.detokenize, True)
                 document_text = self.summarize_chunks(document_chunks, 
                     zip_prompt,
                     "Document chunk",
                     summary_mode=SUMMARY_MODE.SUMMARY_MODE_SEQUENCIAL if self.personality_config.zip_mode=="sequencial" else SUMMARY_MODE.SUMMARY_MODE_HIERARCHICAL,
                     callback=self.sink
                     )
-                tk = self.personality.model.tokenize(document_text)
                 depth += 1
                 if self.personality_config.zip_mode!="sequencial":
                     self.step_end(f"Comprerssing.. [depth {depth}]")
@@ -162,7 +195,7 @@ class Processor(APScript):
             formatting_prompt += "The output text should be written in "+translate_to +f"{separator_template}" if translate_to!='' else ''
             formatting_prompt += "Answer directly with the new enhanced document text with no extra comments.{separator_template}"
             formatting_prompt += f"{start_ai_header_id_template}assistant{end_ai_header_id_template}"
-            if self.config.dubug:
+            if self.config.debug:
                 self.print_prompt(formatting_prompt,"formatting_prompt")
 
             self.step_start(f"Formatting")
@@ -201,6 +234,21 @@ class Processor(APScript):
             )
             return
             
+        # Documents summarized by an interrupted run with the same settings are not summarized again
+        zip_settings = [
+            self.personality_config.zip_mode,
+            self.personality_config.zip_size,
+            self.personality_config.contextual_zipping_text,
+            self.personality_config.add_summary_formatting,
+            self.personality_config.summary_formatting_text,
+            self.personality_config.keep_same_language,
+            self.personality_config.translate_to,
+            self.personality_config.preserve_document_title,
+            self.personality_config.preserve_authors_name,
+            self.personality_config.preserve_results,
+            self.personality_config.maximum_compression,
+        ]
+        journal = open_run_journal(self.personality, "start_zipping", [Path(f).name for f in files], zip_settings)
         all_summaries=""
         formatted_summaries = f"{start_header_id_template}Documents summaries{end_header_id_template}{separator_template}"
         self.step(f"summary mode : {self.personality_config.zip_mode}")
@@ -209,12 +257,12 @@ class Processor(APScript):
                 document_path = Path(file)
                 self.step_start(f"summerizing {document_path.stem}")
                 document_text = GenericDataLoader.read_file(document_path)
-                summary = self.zip_text(
+                summary = journal.run("document_summary", [document_path.name, document_text], lambda: self.zip_text(
                                             document_text,
                                             add_summary_formatting=self.personality_config.add_summary_formatting,
                                             contextual_zipping_text=self.personality_config.contextual_zipping_text,
                                             summary_formatting_text=self.personality_config.summary_formatting_text,
-                                        )
+                                        ))
                 self.step_end(f"summerizing {document_path.stem}")
                 if self.personality_config.output_path:
                     self.save_text(summary, Path(self.personality_config.output_path)/(document_path.stem+"_summary.txt"))
@@ -235,6 +283,7 @@ class Processor(APScript):
         self.set_message_content(output)
         if self.personality_config.output_path:
             self.save_text(summary, Path(self.personality_config.output_path)/("global_summary.txt"))
+        journal.finish()
             
 
 
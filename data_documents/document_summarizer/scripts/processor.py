@@ -14,8 +14,13 @@ from typing import Callable, Any
 from lollmsvectordb.text_document_loader import TextDocumentsLoader
 from lollmsvectordb.text_chunker import TextChunker
 from pathlib import Path
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.batch_generation import BatchGenerationMixin
 # Helper functions
-class Processor(APScript):
+class Processor(BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -42,6 +47,7 @@ class Processor(APScript):
                 {"name":"zip_size","type":"int","value":512, "help":"the maximum size of the summary in tokens"},
                 {"name":"chunk_size","type":"int","value":0, "help":"the size of each chunk to summarize in tokens. If 0, then the context size will be used as reference."},
                 {"name":"output_path","type":"str","value":"", "help":"The path to a folder where to put the summary file."},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
             ]
             )
         personality_config_vals = BaseConfig.from_template(personality_config_template)
@@ -83,9 +89,8 @@ class Processor(APScript):
         super().add_file(path, client, callback)
 
     def bulletpoints(self, chunks, summary_instruction="", chunk_name="chunk", answer_start="", max_generation_size=3000):
-        summeries = []
-        for i, chunk in enumerate(chunks):
-            self.step_start(f"Processing chunk : {i+1}/{len(chunks)}")
+        prompts = []
+        for chunk in chunks:
             txt= "\n".join([
                             f"{self.config.start_header_id_template}{chunk_name}:",
                             f"{chunk}",
@@ -94,13 +99,13 @@ class Processor(APScript):
                             f"```markdown\n{answer_start}"
                             ])
             ASCIIColors.magenta(txt)
-            summary = f"```markdown\n{answer_start}"+ self.fast_gen(
-                        txt,
-                            max_generation_size=max_generation_size).replace("```markdown\n```markdown","```markdown").replace("```\n```","```")
+            prompts.append(txt)
+        summeries = []
+        for answer in self.map_generate(prompts, max_generation_size=max_generation_size, label=f"Processing {len(chunks)} chunks"):
+            summary = f"```markdown\n{answer_start}"+ answer.replace("```markdown\n```markdown","```markdown").replace("```\n```","```")
             summary = self.extract_code_blocks(summary)
             if len(summary)>0:
                 summeries.append(summary[0]["content"].replace("```",""))
-                self.step_end(f"Processing chunk : {i+1}/{len(chunks)}")
             else:
                 raise Exception("The model returned an empty or corrupted text")
         return "\n".join(summeries)
@@ -3,9 +3,15 @@ from lollms.config import ConfigTemplate, BaseConfig, TypedConfig
 from lollms.types import MSG_OPERATION_TYPE
 from typing import Callable
 import os
-import graphrag
-from graphrag.indexer import Indexer
-from graphrag.query_engine import QueryEngine
+import sys
+from pathlib import Path
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+graphrag_indexer = lazy_import("graphrag.indexer", "graphrag")
+graphrag_query_engine = lazy_import("graphrag.query_engine", "graphrag")
 import tempfile
 import shutil
 
@@ -40,8 +46,8 @@ class Processor(APScript):
 
     def mounted(self):
         self.temp_dir = tempfile.mkdtemp()
-        self.indexer = Indexer(self.temp_dir)
-        self.query_engine = QueryEngine(self.temp_dir)
+        self.indexer = graphrag_indexer.Indexer(self.temp_dir)
+        self.query_engine = graphrag_query_engine.QueryEngine(self.temp_dir)
 
     def unmounted(self):
         if self.temp_dir:
@@ -49,8 +55,7 @@ class Processor(APScript):
 
     def install(self):
         super().install()
-        # Install graphrag if not already installed
-        self.personality.install_package("graphrag")
+        install_requirements(self.personality.personality_package_path)
 
     def help(self, prompt="", full_context=""):
         return """
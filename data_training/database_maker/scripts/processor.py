@@ -6,7 +6,14 @@ from lollms.prompting import LollmsContextDetails
 from pathlib import Path
 import json
 import re
+import sys
 from typing import Callable, Any
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.batch_generation import BatchGenerationMixin
+from zoo_utilities.checkpoints import open_run_journal
+from zoo_utilities.progress import ThrottledProgress
 
 def remove_indexing_from_markdown(markdown_text):
     # Define a regular expression pattern to match numbered and hyphenated lists at the beginning of the line
@@ -37,7 +44,7 @@ def find_available_file(folder_path):
             return str(file_path)
         i += 1
 
-class Processor(APScript):
+class Processor(BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
     Inherits from APScript.
@@ -97,6 +104,12 @@ class Processor(APScript):
                     "value": False,
                     "help": "This activates using the keyword building part of the execution diagram. Please read the paper for more details.",
                 },
+                {
+                    "name": "llm_concurrency",
+                    "type": "int",
+                    "value": 0,
+                    "help": "Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)",
+                },
                 
                 
             ]
@@ -165,6 +178,15 @@ class Processor(APScript):
         self.step_start(f"Indexing files")
         self.data_store.index()
         self.step_end(f"Indexing files")
+        # Units completed by an interrupted run on the same data are not generated again
+        journal = open_run_journal(
+            self.personality,
+            "database",
+            [(file_path.name, file_path.stat().st_size, file_path.stat().st_mtime) for file_path in document_files],
+            self.personality_config.questions_gen_size,
+            self.personality_config.answer_gen_size,
+            self.personality_config.data_vectorization_nb_chunks,
+        )
         
         #processing
         if "continue" in prompt.lower():
@@ -187,6 +209,8 @@ class Processor(APScript):
             # Iterate over all chunks and extract text
             questions_vector = []
             total_chunks = len(self.data_store.chunks.items())
+            # The growing output is only sent again when the progress moved, a few times per second at most
+            questions_progress = ThrottledProgress(lambda bars: self.set_message_content(output))
             for chunk_name, chunk in self.data_store.chunks.items():
                 chunk_text = chunk["chunk_text"]
                 processed_chunks += 1
@@ -194,7 +218,7 @@ class Processor(APScript):
                 # Build the prompt text with placeholders
                 prompt_text = f"{self.config.start_header_id_template}instruction: Generate questions or tasks that delve into the specific details and information presented in the text chunks. Please do not ask questions about the form of the text, and do not mention the text itself in your questions. Make sure you format the output using Markdown with each question or task placed in a separate paragraph starting with __P__.\n{self.config.separator_template}{self.config.start_header_id_template}chunk {{chunk_name}}: {{chunk}}{self.config.separator_template}{self.config.start_header_id_template}Here are some questions and tasks to further explore the contents of the given text chunks:\n__P__"
                 # Ask AI to generate questions
-                generated_text = "__P__"+self.fast_gen(prompt_text, max_generation_size=self.personality_config.questions_gen_size, placeholders={"chunk": chunk_text, "chunk_name":chunk_name}, debug=True)
+                generated_text = "__P__"+journal.run("questions", [chunk_name, chunk_text], lambda: self.fast_gen(prompt_text, max_generation_size=self.personality_config.questions_gen_size, placeholders={"chunk": chunk_text, "chunk_name":chunk_name}, debug=True))
                 # Split the generated text into lines and accumulate into questions_vector
                 generated_lines = generated_text.strip().split("__P__")
                 generated_lines = [q.replace("__P__","") for q in generated_lines]
@@ -202,7 +226,8 @@ class Processor(APScript):
                 questions_vector.extend(generated_lines)
                 self.step_end(f"Processing chunk {chunk_name}: {processed_chunks}/{total_chunks}")
                 output += "\n<".join(generated_lines) + "\n"
-                self.set_message_content(output)
+                questions_progress.update([(processed_chunks, total_chunks)])
+            questions_progress.flush()
             
             self.step_start(f"Saving questions for future use")
             with open(output_folder/f"{db_name.split('.')[0]}_q.json", 'w') as file:
@@ -212,7 +237,20 @@ class Processor(APScript):
         output += "### Building answers:\n"
         self.set_message_content(output)
         qna_list=[]
+        answer_prompt_text = """{self.config.start_header_id_template}chunk: {{chunk}}
+{self.config.start_header_id_template}instructions{self.config.end_header_id_template}
+Interpret the textual data contained within the chunk thoroughly to answer the corresponding instruction/task presented alongside it.
+If the information stored in this chunk does not suffice to provide categorically accurate answers, please answer exactly __UNSUFFICIENT_INFORMATION__.
+All statements must be generated solely based on the available input data, discarding any assumptions beyond what has been explicitly stated.
+Do not mention the chunks, assume you are generating training data for an AI to learn from without data.
+It is crucial to maintain strict adherence to the content delineated in each instance of interaction.
+Be precise and helpful.
+{self.config.start_header_id_template}question: {{question}}
+{self.config.start_header_id_template}answer: """
+        # {self.config.start_header_id_template}chunk: {{chunk}}{self.config.separator_template}{self.config.start_header_id_template}instruction: Please use the text chunks to answer the following question:\n{self.config.separator_template}{self.config.start_header_id_template}question: {{question}}\n{self.config.separator_template}{self.config.start_header_id_template}answer: "
         # Perform further processing with questions_vector
+        questions_to_answer = []
+        answer_prompts = []
         for index, question in enumerate(questions_vector):
             docs, sorted_similarities, document_ids = self.data_store.recover_text(question, top_k=self.personality_config.data_vectorization_nb_chunks) 
             if self.personality_config.use_enhanced_mode:
@@ -229,22 +267,14 @@ Valid answers:
                     continue
                 self.step_end(f"Verifying RAG data_{index}")
 
-            self.step_start(f"Asking question {index}/{len(questions_vector)}")
-            prompt_text = """{self.config.start_header_id_template}chunk: {{chunk}}
-{self.config.start_header_id_template}instructions{self.config.end_header_id_template}
-Interpret the textual data contained within the chunk thoroughly to answer the corresponding instruction/task presented alongside it.
-If the information stored in this chunk does not suffice to provide categorically accurate answers, please answer exactly __UNSUFFICIENT_INFORMATION__.
-All statements must be generated solely based on the available input data, discarding any assumptions beyond what has been explicitly stated.
-Do not mention the chunks, assume you are generating training data for an AI to learn from without data.
-It is crucial to maintain strict adherence to the content delineated in each instance of interaction.
-Be precise and helpful.
-{self.config.start_header_id_template}question: {{question}}
-{self.config.start_header_id_template}answer: """
-            # {self.config.start_header_id_template}chunk: {{chunk}}{self.config.separator_template}{self.config.start_header_id_template}instruction: Please use the text chunks to answer the following question:\n{self.config.separator_template}{self.config.start_header_id_template}question: {{question}}\n{self.config.separator_template}{self.config.start_header_id_template}answer: "
-            # Ask AI to generate an answer
-            answer = self.fast_gen(prompt_text, max_generation_size=self.personality_config.answer_gen_size, placeholders={"chunk": "\nchunk: ".join(docs), "question": question})
+            questions_to_answer.append(question)
+            answer_prompts.append({"prompt": answer_prompt_text, "placeholders": {"chunk": "\nchunk: ".join(docs), "question": question}})
+
+        def save_answer(index, answer):
+            nonlocal output
+            question = questions_to_answer[index]
             if "UNSUFFICIENT_INFORMATION" in answer:
-                continue
+                return
             qna_list.append({
                 "conditionning":"Act as LoLLMs expert and answer the following questions.",
                 "question":question,
@@ -252,10 +282,15 @@ Be precise and helpful.
                 "id":0
             })
             output += f"q:{question}\na:{answer}\n"
-            self.set_message_content(output)
-            self.step_end(f"Asking question {index}/{len(questions_vector)}")
+            answers_progress.update([(index + 1, len(questions_to_answer))])
             with open(output_folder/db_name, 'w') as file:
                 json.dump(qna_list, file)
+
+        answers_progress = ThrottledProgress(lambda bars: self.set_message_content(output))
+        # Ask AI to generate the answers, they are saved in order as they arrive
+        self.map_generate(answer_prompts, max_generation_size=self.personality_config.answer_gen_size, label=f"Asking {len(answer_prompts)} questions", on_result=save_answer, journal=journal, journal_step="answer")
+        answers_progress.flush()
+        journal.finish()
         print("Dictionary saved as JSON successfully!")
         return ""
 
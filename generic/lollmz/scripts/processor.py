@@ -34,12 +34,14 @@ from typing import Callable, Any
 from functools import partial
 from ascii_colors import trace_exception
 
-if not PackageManager.check_package_installed("pyautogui"):
-    PackageManager.install_package("pyautogui")
-if not PackageManager.check_package_installed("cv2"):
-    PackageManager.install_package("opencv-python")
+from pathlib import Path
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-import pyautogui
+pyautogui = lazy_import("pyautogui")
 
 
 class Processor(APScript):
@@ -172,9 +174,7 @@ class Processor(APScript):
             None
         """        
         super().install()
-        # Example of implementing installation logic. Uncomment and modify as needed.
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")
 
     def help(self, prompt="", full_context=""):
@@ -13,16 +13,15 @@ from typing import Callable, Any
 from tqdm import tqdm
 import webbrowser
 from functools import partial
-try:
-    if not PackageManager.check_package_installed("pytesseract"):
-        PackageManager.install_package("pytesseract")
-    if not PackageManager.check_package_installed("PIL"):
-        PackageManager.install_package("Pillow")
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+pytesseract = lazy_import("pytesseract")
+Image = lazy_import("PIL.Image", "Pillow")
 
-    import pytesseract
-    from PIL import Image
-except:
-     pass
 class Processor(APScript):
     """
     A class that processes model inputs and outputs.
@@ -69,15 +68,7 @@ class Processor(APScript):
     def install(self):
         super().install()
         self.info("Please install [tesseract](https://github.com/UB-Mannheim/tesseract/wiki) and add it to the path.")
-        requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
-        try:
-            ASCIIColors.info("Loading pytesseract and PIL")
-            import pytesseract
-            from PIL import Image
-        except:
-            pass
+        install_requirements(self.personality.personality_package_path, upgrade=True)
 
     def add_file(self, path, client, callback=None):
         if self.callback is None and callback==None:
@@ -9,12 +9,19 @@ from lollms.helpers import ASCIIColors
 from lollms.config import TypedConfig, BaseConfig, ConfigTemplate
 from lollms.personality import APScript, AIPersonality
 from lollms.prompting import LollmsContextDetails
+import sys
+from pathlib import Path
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.llm_cache import LLMCacheMixin
+from zoo_utilities.batch_generation import BatchGenerationMixin
 import subprocess
 import json
 from typing import Callable, Any
 
 # Helper functions
-class Processor(APScript):
+class Processor(LLMCacheMixin, BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -40,6 +47,9 @@ class Processor(APScript):
                 {"name":"output_file_path","type":"str","value":"", "help":"Path tp the output file to create"},
                 {"name":"models_to_test","type":"str","value":"open_ai::gpt-4o,open_ai::gpt-4-turbo-preview", "help":"List of coma separated models to test in format binding_name::model_name"},
                 {"name":"master_model","type":"str","value":"open_ai::gpt-4o", "help":"A single powerful model in format binding_name::model_name which is going to judge the other models based on the human test file. This model will just compare the output of the model and the human provided answer."},
+                {"name":"llm_cache","type":"bool","value":False, "help":"Reuse the answers of deterministic LLM calls across runs (useful to resume a long job)"},
+                {"name":"llm_cache_max_temperature","type":"float","value":0.0, "min":0.0, "max":2.0, "help":"Only the LLM calls made with a temperature at or below this value are cached"},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
             ]
             )
         personality_config_vals = BaseConfig.from_template(personality_config_template)
@@ -78,7 +88,7 @@ class Processor(APScript):
     def is_ok(self, prompt, true_answer, models_list):
         for model_to_test in models_list:
             model_answer = [f'answer_{model_to_test["binding"]}_{model_to_test["model"]}']
-            return self.yes_no("Are these two answers similar?",f"prompt:\n{prompt}\nanswer 1:\n{true_answer}\nanswer 2:\n{model_answer}")
+            return self.yes_no("Are these two answers similar?",f"prompt:\n{prompt}\nanswer 1:\n{true_answer}\nanswer 2:\n{model_answer}", temperature=0.0)
     
     def start_testing(self, prompt="", full_context="", client=None):
         self.new_message("")
@@ -110,16 +120,13 @@ class Processor(APScript):
         for model in models_list:
             self.step_start(f'Started testing model {model["binding"]}::{model["model"]}')
             self.select_model(model["binding"], model["model"])
-            nb_prompts = len(prompts)
-            for prompt_id, prompt in enumerate(prompts):
-                self.step_start(f'Testing prompt {prompt_id+1}/{nb_prompts} for model {model["model"]}')
-                reworked_prompt = f"{self.system_full_header}{self.ai_custom_header('assistant')}Hi I am assistant and I am here to help you.{self.ai_custom_header('prompt')}{prompt['prompt']}{self.config.separator_template}{self.ai_custom_header('assistant')}"
-                answer = self.fast_gen(reworked_prompt, callback=self.sink)
+            reworked_prompts = [f"{self.system_full_header}{self.ai_custom_header('assistant')}Hi I am assistant and I am here to help you.{self.ai_custom_header('prompt')}{prompt['prompt']}{self.config.separator_template}{self.ai_custom_header('assistant')}" for prompt in prompts]
+            answers = self.map_generate(reworked_prompts, callback=self.sink, label=f'Testing {len(prompts)} prompts for model {model["model"]}')
+            for prompt, answer in zip(prompts, answers):
                 prompt[f'answer_{model["binding"]}_{model["model"]}']={
                     "answer":answer,
                     "val":0
                 }
-                self.step_end(f'Testing prompt {prompt_id+1}/{nb_prompts} for model {model["model"]}')
             self.step_end(f'Started testing model {model["binding"]}::{model["model"]}')
 
         self.step_start(f'Loading master model {master_model["binding"]}::{master_model["model"]}')
@@ -133,7 +140,7 @@ class Processor(APScript):
                 for true_answer in true_answers:
                     model_infos = prompt_entry[f'answer_{model_to_test["binding"]}_{model_to_test["model"]}']
                     model_answer = model_infos["answer"]
-                    if self.yes_no("Is the second answer giving the same information as the first one?",f"prompt:\n{prompt}\nanswer 1:\n{true_answer['text']}\nanswer 2:\n{model_answer}"):
+                    if self.yes_no("Is the second answer giving the same information as the first one?",f"prompt:\n{prompt}\nanswer 1:\n{true_answer['text']}\nanswer 2:\n{model_answer}", temperature=0.0):
                         model_infos["val"]=true_answer['value']
                         break
         self.step_end(f'Judging models')
@@ -5,12 +5,16 @@ from lollms.config import TypedConfig, BaseConfig, ConfigTemplate
 from lollms.personality import APScript, AIPersonality
 from lollms.prompting import LollmsContextDetails
 import subprocess
-if not PackageManager.check_package_installed("pptx"):
-    PackageManager.install_package("pptx")
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.shapes import MSO_SHAPE
-from pptx.dml.color import RGBColor
+import sys
+from pathlib import Path
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+
+pptx = lazy_import("pptx", "python-pptx")
+pptx_util = lazy_import("pptx.util", "python-pptx")
+pptx_color = lazy_import("pptx.dml.color", "python-pptx")
 from typing import Callable, Any
 # Helper functions
 class PowerPointBuilder:
@@ -32,7 +36,7 @@ class PowerPointBuilder:
     """
 
     def __init__(self):
-        self.presentation = Presentation()
+        self.presentation = pptx.Presentation()
 
     def add_slide(self, layout=0):
         """
@@ -49,7 +53,7 @@ class PowerPointBuilder:
         slide = self.presentation.slides.add_slide(slide_layout)
         return slide
 
-    def add_text(self, slide, text, left, top, width, height, font_size=18, font_name="Arial", bold=False, italic=False, color=RGBColor(0, 0, 0)):
+    def add_text(self, slide, text, left, top, width, height, font_size=18, font_name="Arial", bold=False, italic=False, color=None):
         """
         Adds a text box with formatted text to a slide.
 
@@ -64,20 +68,22 @@ class PowerPointBuilder:
             font_name (str): The font name of the text. Default is "Arial".
             bold (bool): Whether the text should be bold. Default is False.
             italic (bool): Whether the text should be italic. Default is False.
-            color (RGBColor): The color of the text. Default is black (RGBColor(0, 0, 0)).
+            color (RGBColor): The color of the text. Default (None) is black (RGBColor(0, 0, 0)).
 
         Returns:
             TextBox: The newly added text box object.
 
         """
-        textbox = slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
+        if color is None:
+            color = pptx_color.RGBColor(0, 0, 0)
+        textbox = slide.shapes.add_textbox(pptx_util.Inches(left), pptx_util.Inches(top), pptx_util.Inches(width), pptx_util.Inches(height))
         text_frame = textbox.text_frame
         p = text_frame.paragraphs[0]
         run = p.add_run()
         run.text = text
 
         font = run.font
-        font.size = Pt(font_size)
+        font.size = pptx_util.Pt(font_size)
         font.name = font_name
         font.bold = bold
         font.italic = italic
@@ -98,7 +104,7 @@ class PowerPointBuilder:
             height (float): The height of the image in inches. Default is None (original height).
 
         """
-        slide.shapes.add_picture(image_path, Inches(left), Inches(top), width=Inches(width) if width else None, height=Inches(height) if height else None)
+        slide.shapes.add_picture(image_path, pptx_util.Inches(left), pptx_util.Inches(top), width=pptx_util.Inches(width) if width else None, height=pptx_util.Inches(height) if height else None)
 
     def set_background_color(self, slide, color):
         """
@@ -112,7 +118,7 @@ class PowerPointBuilder:
         background = slide.background
         fill = background.fill
         fill.solid()
-        fill.fore_color.rgb = RGBColor(color[0], color[1], color[2])
+        fill.fore_color.rgb = pptx_color.RGBColor(color[0], color[1], color[2])
 
     def add_shape(self, slide, shape_type, left, top, width, height):
         """
@@ -130,7 +136,7 @@ class PowerPointBuilder:
             Shape: The newly added shape object.
 
         """
-        shape = slide.shapes.add_shape(shape_type, Inches(left), Inches(top), Inches(width), Inches(height))
+        shape = slide.shapes.add_shape(shape_type, pptx_util.Inches(left), pptx_util.Inches(top), pptx_util.Inches(width), pptx_util.Inches(height))
         return shape
 
     def add_transition(self, slide, transition_type):
@@ -200,10 +206,7 @@ class Processor(APScript):
         
     def install(self):
         super().install()
-        
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")        
 
     def help(self, prompt="", full_context=""):
@@ -14,10 +14,13 @@ from pathlib import Path
 from datetime import datetime
 import json
 
-if not PackageManager.check_package_installed("feedparser"):
-    PackageManager.install_package("feedparser")
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
 
-import feedparser
+feedparser = lazy_import("feedparser")
 # Helper functions
 class Processor(APScript):
     """
@@ -85,9 +88,7 @@ class Processor(APScript):
     def install(self):
         super().install()
         
-        requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         ASCIIColors.success("Installed successfully")        
 
     def help(self, prompt="", full_context=""):
@@ -12,16 +12,25 @@ from pathlib import Path
 import json
 from pathlib import Path
 from datetime import datetime
-from bs4 import BeautifulSoup
 
-import pipmaster as pm
-if not pm.is_installed("docling"):
-    pm.install("docling")
-if not pm.is_installed("feedparser"):
-    pm.install("feedparser")
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+from zoo_utilities.llm_tracing import LLMTracingMixin, traced_run
+from zoo_utilities.llm_cache import LLMCacheMixin
+from zoo_utilities.batch_generation import BatchGenerationMixin
+from zoo_utilities.checkpoints import open_run_journal
+from zoo_utilities.text_clustering import cluster_texts, classify_texts
+from zoo_utilities.feeds import FeedFetcher
+from zoo_utilities.news_store import NewsStore
+from zoo_utilities.web_articles import ArticleExtractor
+from zoo_utilities.progress import ThrottledProgress, percentages
 
-
-from feedparser import parse as feedparse
+feedparser = lazy_import("feedparser")
+docling_converter = lazy_import("docling.document_converter", "docling")
+docling_models = lazy_import("docling.datamodel.base_models", "docling")
 
 from lollmsvectordb.text_document_loader import TextDocumentsLoader
 from lollmsvectordb.text_chunker import TextChunker
@@ -33,14 +42,12 @@ from lollms.client_session import Client
 from ascii_colors import trace_exception
 
 from urllib.parse import urlparse
-
-from docling.document_converter import DocumentConverter
-
-if not pm.is_installed("feedparser"):
-   pm.is_installed("feedparser")
+from io import BytesIO
+import queue
+import re
 
 # Helper functions
-class Processor(APScript):
+class Processor(LLMTracingMixin, LLMCacheMixin, BatchGenerationMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -66,6 +73,17 @@ class Processor(APScript):
                 {"name":"rss_urls","type":"text","value":"https://feeds.bbci.co.uk/news/rss.xml, http://rss.cnn.com/rss/cnn_topstories.rss, https://rss.nytimes.com/services/xml/rss/nyt/HomePage.xml, https://www.theguardian.com/world/rss, https://www.reuters.com/rssfeed/topNews, http://feeds.foxnews.com/foxnews/latest, https://www.aljazeera.com/xml/rss/all.xml, https://www.bloomberg.com/politics/feeds/site.xml", "help":"Here you can put rss feed address to recover data."},
                 {"name":"categories","type":"text","value":"World News,Entertainment,Sport,Technology,Education,Medicine,Space,R&D,Politics,Music,Business,Peaple", "help":"The list of categories to help the AI organize the news."},
                 {"name":"keep_only_multi_articles_subjects","type":"bool","value":False, "help":"When this option is true, only articles that have more than one source are kept"},
+                {"name":"fusion_mode","type":"str","value":"hybrid","options":["vector","hybrid","llm"], "help":"How articles about the same subject are found. vector groups them by text similarity without the AI, hybrid also asks the AI about the borderline pairs and llm asks the AI to compare each new article with every theme (slow)"},
+                {"name":"similarity_threshold","type":"float","value":0.45, "min":0.0, "max":1.0, "help":"Articles whose titles and descriptions are at least this similar are fused (vector and hybrid modes)"},
+                {"name":"borderline_similarity","type":"float","value":0.25, "min":0.0, "max":1.0, "help":"In hybrid mode, the AI is asked about the pairs of articles whose similarity is between this value and the similarity threshold"},
+                {"name":"news_retention_days","type":"int","value":3, "min":1, "help":"Articles and themes are kept from one scrape to the next, until none of their articles was seen in the feeds for this number of days"},
+
+
+                {"name":"categorization_batch_size","type":"int","value":20, "min":1, "help":"Number of themes the AI categorizes in one prompt"},
+                {"name":"category_confidence","type":"float","value":0.3, "min":0.0, "max":1.0, "help":"Themes at least this similar to the themes already put in a category get that category without asking the AI (1 always asks the AI)"},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
+                {"name":"article_cache_hours","type":"float","value":24, "min":0.0, "help":"The full text of the articles is kept for this number of hours, so an article shared by several themes or scrapes is downloaded once"},
+                {"name":"article_timeout","type":"float","value":20, "min":1.0, "help":"Maximum time in seconds to download the full text of an article and convert it"},
 
 
                 {"name":"memorization_prompt","type":"text","value":"Make sure you keep all important information as bullet points. If you find a new article url and title add it immediately to the memory.", "help":"The instructions about what to memorize from the articles"},
@@ -84,6 +102,8 @@ class Processor(APScript):
                 {"name":"preserve_authors_name","type":"bool","value":False, "help":"Force the algorithm to preserve the authors names as an important information"},
                 {"name":"preserve_results","type":"bool","value":True, "help":"Force the algorithm to preserve the document results the authors names as an important information"},
                 {"name":"maximum_compression","type":"bool","value":False, "help":"Force the algorithm to compress the document as much as possible. Useful for what is this document talking about kind of summary"},
+                {"name":"llm_cache","type":"bool","value":False, "help":"Reuse the answers of deterministic LLM calls across runs (useful to resume a long job)"},
+                {"name":"llm_cache_max_temperature","type":"float","value":0.0, "min":0.0, "max":2.0, "help":"Only the LLM calls made with a temperature at or below this value are cached"},
             ]
             )
         personality_config_vals = BaseConfig.from_template(personality_config_template)
@@ -109,9 +129,16 @@ class Processor(APScript):
                         )
         self.cv = None
         self.position = None
+        self.feed_fetcher = None
+        self.article_extractor = None
+        # Idle document converters, the extraction threads convert at once with one converter each
+        self.document_converters = queue.SimpleQueue()
+        # The comparisons progress is only redrawn when a percentage changes, a few times per second at most
+        self.double_progress = ThrottledProgress(self.render_double_progress)
 
     def install(self):
         super().install()
+        install_requirements(self.personality.personality_package_path)
         ASCIIColors.success("Installed successfully")        
 
     def help(self, prompt="", full_context=""):
@@ -127,6 +154,67 @@ class Processor(APScript):
         with open(path,"w", encoding="utf8") as f:
             f.write(text)
 
+    def get_feed_fetcher(self, output_folder:Path):
+        """
+        Returns the feed fetcher, whose HTTP session and cache are kept from one scrape to the next.
+        """
+        cache_folder = output_folder / "feeds_cache"
+        if self.feed_fetcher is None or self.feed_fetcher.cache_folder != cache_folder:
+            self.feed_fetcher = FeedFetcher(cache_folder)
+        return self.feed_fetcher
+
+    def get_article_extractor(self, output_folder:Path):
+        """
+        Returns the extractor of the full text of the articles, which keeps their markdown in a cache folder.
+        """
+        cache_folder = output_folder / "articles_cache"
+        if self.article_extractor is None or self.article_extractor.cache_folder != cache_folder:
+            self.article_extractor = ArticleExtractor(
+                cache_folder,
+                self.convert_article,
+                timeout=self.personality_config.article_timeout,
+                ttl=self.personality_config.article_cache_hours * 3600,
+                session=self.get_feed_fetcher(output_folder).session
+            )
+        self.article_extractor.timeout = self.personality_config.article_timeout
+        self.article_extractor.ttl = self.personality_config.article_cache_hours * 3600
+        return self.article_extractor
+
+    def convert_article(self, url, content, content_type):
+        """
+        Converts a downloaded page to markdown. Called from the extraction threads, each conversion
+        takes an idle document converter, built when none is free and kept for the next ones.
+        """
+        suffix = ".pdf" if "pdf" in content_type.lower() or urlparse(url).path.lower().endswith(".pdf") else ".html"
+        try:
+            converter = self.document_converters.get_nowait()
+        except queue.Empty:
+            converter = docling_converter.DocumentConverter()
+        try:
+            result = converter.convert(docling_models.DocumentStream(name=f"article{suffix}", stream=BytesIO(content)))
+        finally:
+            self.document_converters.put(converter)
+        return result.document.export_to_markdown()
+
+    def find_thumbnail(self, entry):
+        """
+        Returns the first image of an RSS feed entry (a dict with its url) or None.
+        """
+        if 'media_thumbnail' in entry and entry['media_thumbnail']:
+            return entry['media_thumbnail'][0]  # Take the first thumbnail
+        elif 'media_content' in entry:
+            thumbnails = [media for media in entry['media_content'] if media.get('type', '').startswith('image/')]
+            if thumbnails:
+                return thumbnails[0]  # Take the first image media
+        elif 'enclosures' in entry:
+            thumbnails = [enclosure for enclosure in entry['enclosures'] if enclosure.get('type', '').startswith('image/')]
+            if thumbnails:
+                return thumbnails[0]  # Take the first image enclosure
+        return None
+
+    def has_thumbnail(self, entry):
+        return isinstance(entry, dict) and self.find_thumbnail(entry) is not None
+
     def generate_thumbnail_html(self, entry):
         """
         Generates HTML for a single thumbnail or favicon from an RSS feed entry.
@@ -139,41 +227,19 @@ class Processor(APScript):
             return ''
         
         # Try to find a thumbnail
-        thumbnail = None
-        if 'media_thumbnail' in entry and entry['media_thumbnail']:
-            thumbnail = entry['media_thumbnail'][0]  # Take the first thumbnail
-        elif 'media_content' in entry:
-            thumbnails = [media for media in entry['media_content'] if media.get('type', '').startswith('image/')]
-            if thumbnails:
-                thumbnail = thumbnails[0]  # Take the first image media
-        elif 'enclosures' in entry:
-            thumbnails = [enclosure for enclosure in entry['enclosures'] if enclosure.get('type', '').startswith('image/')]
-            if thumbnails:
-                thumbnail = thumbnails[0]  # Take the first image enclosure
+        thumbnail = self.find_thumbnail(entry)
         
         # If no thumbnail is found, try to get the favicon
         if not thumbnail:
             try:
                 # Get the base URL from the entry's link or source
                 link = entry.get('link', '')
-                if not link:
-                    return ''
-                
-                base_url = urlparse(link).netloc
-                if not base_url:
+                if not link or self.feed_fetcher is None:
                     return ''
                 
-                # Fetch the website's HTML to find the favicon
-                response = requests.get(f"https://{base_url}",timeout=3)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Look for the favicon in the HTML
-                favicon = soup.find('link', rel='icon') or soup.find('link', rel='shortcut icon')
-                if favicon:
-                    favicon_url = favicon['href']
-                    if not favicon_url.startswith(('http:', 'https:')):
-                        favicon_url = f"https://{favicon_url.lstrip('/')}"
-                    
+                # The favicons of the sites are looked up once and cached on disk
+                favicon_url = self.feed_fetcher.favicon_url(link)
+                if favicon_url:
                     # Use the favicon as the thumbnail
                     thumbnail = {'url': favicon_url}
             except Exception as e:
@@ -224,41 +290,55 @@ class Processor(APScript):
             print("No RSS URLs configured.")
             return
         
-        rss_feeds = [feed.strip() for feed in self.personality_config.rss_urls.split(",")]
+        rss_feeds = [feed.strip() for feed in self.personality_config.rss_urls.split(",") if feed.strip()]
         links = []
         feeds = []
         
-        for rss_feed in rss_feeds:
-            feed = feedparse(rss_feed)
-            for p in feed.entries[:self.personality_config.nb_rss_feeds_per_source]:
-                self.step(f"Processing {p.title}")
-                content = p.get('summary', p.get('description', ''))
-                thumbnail_html = self.generate_thumbnail_html(p)
-                if content:
-                    # Save feed data for later use in fuse_articles
-                    feed_data = {
-                        'title': p.title,
-                        'link': p.link,
-                        'description': content,
-                        'media_thumbnail': p.get('media_thumbnail', []),  # Assuming media_thumbnail is available
-                        'thumbnail_html': thumbnail_html,  # Add the thumbnail HTML to the JSON
-                    }
-                    feeds.append(feed_data)
-                    
-                    # Generate HTML card for immediate display
-                    card = f'''
-                    <div class="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow">
-                        <div class="p-6">
-                            <h3 class="text-lg font-medium text-gray-800 mb-2">
-                                <a href="{p.link}" target="_blank" class="hover:text-blue-600 transition-colors">{p.title}</a>
-                            </h3>
-                            {thumbnail_html}
-                            <p class="text-gray-600 text-sm">{content}</p>
-                        </div>
+        # All the feeds are downloaded at once, unchanged ones answer 304 and come from the cache
+        fetcher = self.get_feed_fetcher(output_folder)
+        self.step_start(f"Fetching {len(rss_feeds)} feeds")
+        entries = []
+        for result in fetcher.fetch_feeds(rss_feeds):
+            if result["content"] is None:
+                self.step(f"Couldn't fetch {result['url']}: {result['error']}")
+                continue
+            if result["status"] == "stale":
+                self.step(f"Couldn't fetch {result['url']}, using its last version")
+            feed = feedparser.parse(result["content"])
+            entries.extend(feed.entries[:self.personality_config.nb_rss_feeds_per_source])
+        self.step_end(f"Fetching {len(rss_feeds)} feeds")
+        fetcher.prefetch_favicons([p.get('link', '') for p in entries if not self.has_thumbnail(p)])
+
+        for p in entries:
+            self.step(f"Processing {p.title}")
+            content = p.get('summary', p.get('description', ''))
+            thumbnail_html = self.generate_thumbnail_html(p)
+            if content:
+                # Save feed data for later use in fuse_articles
+                feed_data = {
+                    'title': p.title,
+                    'link': p.link,
+                    'guid': p.get('id', ''),
+                    'description': content,
+                    'media_thumbnail': p.get('media_thumbnail', []),  # Assuming media_thumbnail is available
+                    'thumbnail_html': thumbnail_html,  # Add the thumbnail HTML to the JSON
+                }
+                feeds.append(feed_data)
+                
+                # Generate HTML card for immediate display
+                card = f'''
+                <div class="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow">
+                    <div class="p-6">
+                        <h3 class="text-lg font-medium text-gray-800 mb-2">
+                            <a href="{p.link}" target="_blank" class="hover:text-blue-600 transition-colors">{p.title}</a>
+                        </h3>
+                        {thumbnail_html}
+                        <p class="text-gray-600 text-sm">{content}</p>
                     </div>
-                    '''
-                    links.append(card)
-        
+                </div>
+                '''
+                links.append(card)
+    
         self.step("Saving the news json file")
         # Save feeds to JSON for later use in fuse_articles
         with open(output_folder / "news_data.json", "w") as f:
@@ -302,40 +382,72 @@ class Processor(APScript):
         
         with open(output_folder / "news_data.json", "r") as f:
             feeds = json.load(f)
+        # The articles and themes of the previous scrapes are kept: only the new articles are compared
+        # and only the themes they join are summarized again
+        store = NewsStore(output_folder / "news_store.json")
+        new_keys = store.add_articles(feeds)
+        store.prune(self.personality_config.news_retention_days)
+        pending = store.unassigned()
+        self.step(f"{len(new_keys)} new articles, {len(feeds) - len(new_keys)} already known")
+        # Comparisons done by an interrupted run on the same articles are not asked again
+        journal = open_run_journal(
+            self.personality,
+            "fuse_articles",
+            sorted(pending),
+            self.personality_config.fusion_mode
+        )
         
-        themes = {}
-        processed = set()     
-        total_feeds = len(feeds)   
-        for i, feed in enumerate(feeds):
-            if i in processed:
-                continue
-            
-            # Create a new theme for this article
-            theme_key = f"theme_{len(themes) + 1}"
-            themes[theme_key] = {
-                'title': feed['title'],
-                'thumbnails': feed.get('media_thumbnail', []),
-                'content': feed.get('description', ''),
-                'urls': [feed['link']]
-            }
-            
-            # Compare with other articles to find similar ones
-            for j, other_feed in enumerate(feeds[i + 1:], start=i + 1):
-                if j in processed:
-                    continue
-                
-                # Simple similarity check (can be replaced with more advanced NLP)
-                if self.are_articles_similar(feed, other_feed):
-                    themes[theme_key]['urls'].append(other_feed['link'])
-                    themes[theme_key]['content'] += f"\n\n{other_feed.get('description', '')}"
-                    processed.add(j)
-                self.update_double_progress(i, total_feeds, j-i, total_feeds - i, feed['title'], other_feed['title'])
-            
-            processed.add(i)
-        nb_fused_articles = 0
-        for theme_key, theme_data in themes.items():
-            if len(theme_data['urls']) > 1:
-                nb_fused_articles += 1
+        if self.personality_config.fusion_mode == "llm":
+            # Each new article is compared with the first article of every theme until one matches
+            theme_keys = list(store.themes)
+            for i, key in enumerate(pending):
+                article = store.articles[key]
+                for j, theme_key in enumerate(theme_keys):
+                    representative = store.theme_articles(theme_key)[0]
+                    self.update_double_progress(i, len(pending), j, len(theme_keys), article['title'], representative['title'])
+                    if journal.run("similarity", [representative.get('link'), article.get('link')], lambda: self.are_articles_similar(representative, article)):
+                        store.attach(theme_key, [key])
+                        break
+                else:
+                    theme_keys.append(store.add_theme([key]))
+            self.double_progress.flush()
+        elif pending:
+            # Group the articles by text similarity, the AI only settles the borderline pairs in hybrid mode
+            keys = list(store.articles)
+            articles = [store.articles[key] for key in keys]
+            positions = {key: position for position, key in enumerate(keys)}
+
+            def confirm(i, j):
+                return journal.run("similarity", [articles[i].get('link'), articles[j].get('link')], lambda: self.are_articles_similar(articles[i], articles[j]))
+
+            def show_progress(done, total):
+                if done == total or done % 10 == 0:
+                    self.step(f"Checked {done}/{total} borderline pairs of articles")
+
+            hybrid = self.personality_config.fusion_mode == "hybrid"
+            clusters = cluster_texts(
+                [f"{article.get('title', '')} {article.get('description', '')}" for article in articles],
+                threshold=self.personality_config.similarity_threshold,
+                borderline=self.personality_config.borderline_similarity if hybrid else None,
+                confirm=confirm if hybrid else None,
+                on_progress=show_progress,
+                groups=[[positions[key] for key in theme['articles']] for theme in store.themes.values()],
+                new=[positions[key] for key in pending],
+            )
+            for cluster in clusters:
+                members = [keys[index] for index in cluster]
+                theme_keys = {store.articles[key]['theme'] for key in members} - {None}
+                if not theme_keys:
+                    store.add_theme(members)
+                elif any(store.articles[key]['theme'] is None for key in members) or len(theme_keys) > 1:
+                    theme_key = store.merge_themes(theme_keys)
+                    store.attach(theme_key, [key for key in members if store.articles[key]['theme'] is None])
+        store.save()
+        journal.finish()
+
+        themes = store.fused_articles()
+        to_summarize = store.themes_to_summarize()
+        nb_fused_articles = sum(1 for theme_key in to_summarize if len(themes[theme_key]['urls']) > 1)
 
         self.set_message_html(f"""<div class="flex justify-center items-end">
             <p><span animate-pulse text-xl font-semibold mr-2>{nb_fused_articles} themes are being built out of the articles...</spam></div>
@@ -347,28 +459,35 @@ class Processor(APScript):
         document.querySelector('span').textContent = 'Summary complete!';
         }}, 30 * nb_fused_articles);
         </script>""")
-        # Generate summaries for themes with multiple articles
-        toremove = []
-        for theme_key, theme_data in themes.items():
+        # The articles of all the themes to summarize are extracted at once
+        extractor = self.get_article_extractor(output_folder)
+        # The articles that fail are skipped by the themes of this run, and tried again by the next one
+        extractor.forget_failures()
+        urls = [url for theme_key in to_summarize if len(themes[theme_key]['urls']) > 1 for url in themes[theme_key]['urls']]
+        if urls:
+            self.step_start(f"Loading {len(set(urls))} articles")
+            extractor.extract_many(urls)
+            self.step_end(f"Loading {len(set(urls))} articles")
+        # Generate summaries for the themes with multiple articles whose articles changed,
+        # the store is saved after each one so an interrupted run keeps the finished summaries
+        for theme_key in to_summarize:
+            theme_data = themes[theme_key]
             if len(theme_data['urls']) > 1:
                 prompt = self.create_summary_prompt(theme_data)
                 summary = self.sequential_summarize(
-                                                        prompt, 
-                                                        summary_context=self.personality_config.memorization_prompt,
-                                                        task=self.personality_config.task_prompt,format=self.personality_config.output_format)
-                theme_data['summary'] = summary
+                                prompt, 
+                                summary_context=self.personality_config.memorization_prompt,
+                                task=self.personality_config.task_prompt,format=self.personality_config.output_format)
+                store.set_summary(theme_key, summary)
+                store.save()
             else:
-                if self.personality_config.keep_only_multi_articles_subjects:
-                    toremove.append(theme_key)
-                else:
-                    theme_data['summary'] = theme_data['content'].strip()
-                    
-        # Remove themes that are no longer needed using a dictionary comprehension.
-        themes = {key: value for key, value in themes.items() if not key in toremove}
+                store.set_summary(theme_key, theme_data['content'].strip())
+        store.save()
 
         # Save the fused data to a JSON file
         with open(output_folder / "fused_articles.json", "w") as f:
-            json.dump(themes, f, indent=4)
+            json.dump(store.fused_articles(self.personality_config.keep_only_multi_articles_subjects), f, indent=4)
+        extractor.prune()
 
     def load_article_text(self, url):
         """
@@ -377,9 +496,10 @@ class Processor(APScript):
         :param url: The URL of the article.
         :return: The text content of the article.
         """
-        converter = DocumentConverter()
-        result = converter.convert(url)
-        return result.document.export_to_markdown()
+        text = self.get_article_extractor(Path(self.personality_config.output_folder)).extract(url)
+        if text is None:
+            raise ValueError(f"Couldn't load {url}")
+        return text
 
     def create_summary_prompt(self, theme_data):
         """
@@ -388,25 +508,31 @@ class Processor(APScript):
         :param theme_data: The data for the theme containing multiple articles.
         :return: A prompt string for the AI to generate a summary.
         """
+        # The articles are downloaded concurrently, those already extracted come from the cache
+        texts = self.get_article_extractor(Path(self.personality_config.output_folder)).extract_many(theme_data['urls'])
         prompt = "List of articles:\n\n"
         for i, url in enumerate(theme_data['urls']):
             prompt += f"Article {i + 1}:\n"
             prompt += f"Title: {theme_data['title']}\n"
             prompt += f"URL: {url}\n"
             prompt += f"Description: {theme_data['content']}\n"
-            try:
-                prompt += f"Text Content:\n{self.load_article_text(url)}\n\n"
-            except:
+            if texts.get(url) is not None:
+                prompt += f"Text Content:\n{texts[url]}\n\n"
+            else:
                 ASCIIColors.warning("Couldn't load the webpage because of protection")
         return prompt
     
 
     def update_double_progress(self, outer_current, outer_total, inner_current, inner_total, current_feed_title, other_feed_title):
-        # Calculate outer progress percentage
-        outer_progress_percent = (outer_current / outer_total) * 100
+        self.double_progress.update(
+            [(outer_current, outer_total), (inner_current, inner_total)],
+            current_feed_title=current_feed_title,
+            other_feed_title=other_feed_title
+        )
 
-        # Calculate inner progress percentage
-        inner_progress_percent = (inner_current / inner_total) * 100
+    def render_double_progress(self, bars, current_feed_title, other_feed_title):
+        (outer_current, outer_total), (inner_current, inner_total) = bars
+        outer_progress_percent, inner_progress_percent = percentages(bars)
 
         # Generate the updated HTML
         html_code = f"""
@@ -471,13 +597,18 @@ class Processor(APScript):
         
         # Use the yes_no method to determine similarity
         question = f"Are these two articles similar based on their titles and descriptions? Article 1: {combined_text1} Article 2: {combined_text2}"
-        return self.yes_no(question, context="Determining article similarity", max_answer_length=50)
+        return self.yes_no(question, context="Determining article similarity", max_answer_length=50, temperature=0.0)
     def categorize_news(self):
         """
         Categorizes news articles and generates a categorized HTML output.
         Fused articles (themes with multiple articles) are displayed with AI-generated summaries,
         a clear indication that they are a fusion, and interactive buttons for copying summaries.
         The full summary is displayed in a scrollable container within the card.
+
+        Themes keep their category while their articles do not change. The others are first
+        matched against the themes categorized before by text similarity, and the AI is asked
+        only about the uncertain ones, several themes per prompt. The page is shown again as
+        each batch of categories arrives.
         """
         output_folder = Path(self.personality_config.output_folder)
         if not output_folder.exists():
@@ -487,21 +618,178 @@ class Processor(APScript):
         # Load the fused articles instead of raw feeds
         with open(output_folder / "fused_articles.json", "r") as f:
             themes = json.load(f)
+        store = NewsStore(output_folder / "news_store.json")
         
-        categories = [c.strip() for c in self.personality_config.categories.split(",")]
+        categories = [c.strip() for c in self.personality_config.categories.split(",") if c.strip()]
         categorized = {cat: [] for cat in categories}
+
+        # The cards don't depend on the category, they are built once with the favicons fetched together
+        fetcher = self.get_feed_fetcher(output_folder)
+        fetcher.prefetch_favicons([theme_data['urls'][0] for theme_data in themes.values() if theme_data['urls']])
+        cards = {theme_key: self.build_news_card(theme_data) for theme_key, theme_data in themes.items()}
+
+        assigned = {}
+        for theme_key in themes:
+            category = store.category(theme_key) if theme_key in store.themes else None
+            if category in categorized:
+                assigned[theme_key] = category
+        remaining = [theme_key for theme_key in themes if theme_key not in assigned]
+        self.step(f"{len(assigned)} themes keep their category, {len(remaining)} to categorize")
+
+        # Cheap pre-classification against the themes categorized before (and the category names)
+        examples = {cat: [cat] for cat in categories}
+        for theme_key, category in assigned.items():
+            examples[category].append(self.theme_text(themes[theme_key]))
+        guesses = classify_texts(
+            [self.theme_text(themes[theme_key]) for theme_key in remaining],
+            examples,
+            min_similarity=self.personality_config.category_confidence
+        )
+        uncertain = []
+        for theme_key, (category, similarity) in zip(remaining, guesses):
+            if category is not None:
+                assigned[theme_key] = category
+            else:
+                uncertain.append(theme_key)
+
+        def show(bars=None):
+            for cat in categories:
+                categorized[cat] = [theme_key for theme_key in themes if assigned.get(theme_key) == cat]
+            self.set_message_html(self.build_categorized_page(categories, categorized, cards))
+
+        show()
+        # The uncertain themes are sent to the AI in batches, the page is updated as the batches come back
+        batch_size = max(1, self.personality_config.categorization_batch_size)
+        batches = [uncertain[i:i + batch_size] for i in range(0, len(uncertain), batch_size)]
+        progress = ThrottledProgress(show)
+
+        def save_categories(index, answer):
+            batch = batches[index]
+            labels = self.parse_categories(answer, len(batch), categories) if isinstance(answer, str) else [None] * len(batch)
+            for theme_key, category in zip(batch, labels):
+                assigned[theme_key] = category or self.assign_category(themes[theme_key], categories)
+            progress.update([(index + 1, len(batches))])
+
+        self.map_generate(
+            [self.build_categorization_prompt([themes[theme_key] for theme_key in batch], categories) for batch in batches],
+            label=f"Categorizing {len(uncertain)} themes",
+            on_result=save_categories,
+            return_exceptions=True,
+            max_generation_size=16 * batch_size + 64
+        )
+        for theme_key, category in assigned.items():
+            if theme_key in store.themes:
+                store.set_category(theme_key, category)
+        store.save()
+
+        for cat in categories:
+            categorized[cat] = [theme_key for theme_key in themes if assigned.get(theme_key) == cat]
+        output = self.build_categorized_page(categories, categorized, cards)
         
-        # Assign categories to themes
-        for theme_key, theme_data in themes.items():
-            # Assign category based on content
-            category = self.assign_category(theme_data, categories)
-            if category:
-                categorized[category].append(theme_data)
-        
+        with open(output_folder / "categorized_news.html", "w", encoding="utf8") as f:
+            f.write(output)
+
+        self.set_message_html(output)
+
+    def theme_text(self, theme_data):
+        return f"{theme_data.get('title', '')} {theme_data.get('content', '')}"
+
+    def build_categorization_prompt(self, themes, categories):
+        """
+        Builds a prompt asking the category of several themes at once, answered as a JSON list.
+        """
+        news = "\n".join(
+            f"{i + 1}. {theme_data.get('title', '')}: {re.sub(r'<[^>]+>', ' ', theme_data.get('content', ''))[:300].strip()}"
+            for i, theme_data in enumerate(themes)
+        )
+        return "\n".join([
+            self.system_full_header + "You sort news into categories.",
+            self.system_custom_header("categories"),
+            ", ".join(categories),
+            self.system_custom_header("news"),
+            news,
+            self.system_custom_header("instructions"),
+            f"Give the category of each of the {len(themes)} news above, in the same order, choosing only from the categories list.",
+            "Answer with a JSON list of strings inside a ```json code block, without any comment.",
+            self.ai_full_header
+        ])
+
+    def parse_categories(self, answer, count, categories):
+        """
+        Reads the JSON list of categories answered by the AI. Missing or unknown categories are None.
+        """
+        known = {cat.lower(): cat for cat in categories}
+        match = re.search(r"\[.*\]", answer, re.DOTALL)
+        try:
+            values = json.loads(match.group(0)) if match else []
+        except ValueError:
+            values = re.findall(r'"([^"]*)"', match.group(0))
+        labels = [known.get(str(value).strip().lower()) for value in values[:count]] if isinstance(values, list) else []
+        return labels + [None] * (count - len(labels))
+
+    def build_news_card(self, theme_data):
+        """
+        Builds the HTML card of a theme.
+        """
+        output = '                <div class="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow">\n'
+
+        # Add thumbnail or favicon if available
+        thumbnail = theme_data.get("thumbnails", [{}])[0].get("url", "") if theme_data.get("thumbnails") else ""
+        if not thumbnail and theme_data['urls'] and self.feed_fetcher is not None:
+            # Use the favicon of the website, looked up once per domain and cached on disk
+            thumbnail = self.feed_fetcher.favicon_url(theme_data['urls'][0])
+
+        if thumbnail:
+            output += f'                    <img src="{thumbnail}" alt="Thumbnail" class="w-full h-48 object-cover">\n'
+
+        output += '                    <div class="p-6">\n'
+        output += f'                        <h3 class="text-lg font-medium text-gray-800 mb-2">\n'
+        output += f'                            <a href="{theme_data["urls"][0]}" class="hover:text-blue-600 transition-colors">{theme_data["title"]}</a>\n'
+
+        # Add a "Fusion" label if this theme contains multiple articles
+        if len(theme_data['urls']) > 1:
+            output += '                            <span class="ml-2 bg-blue-100 text-blue-800 text-xs font-semibold px-2 py-1 rounded">Fusion</span>\n'
+
+        output += '                        </h3>\n'
+
+        # Display the AI-generated summary in a scrollable container
+        if len(theme_data['urls']) > 1:
+            full_summary = theme_data.get("summary", "")
+            output += f'                        <div class="summary-scroll text-gray-600 text-sm mb-4">\n'
+            output += f'                            <strong>Summary:</strong> {full_summary}\n'
+            output += '                        </div>\n'
+        else:
+            output += f'                        <p class="text-gray-600 text-sm mb-4">{theme_data.get("content", "")[:150]}...</p>\n'
+
+        output += '                        <div class="flex items-center text-xs text-gray-500">\n'
+
+        # Use current date if published date is not available
+        published_date = datetime.now().strftime("%Y-%m-%d")
+        output += f'                            <span class="mr-2">📅 {published_date}</span>\n'
+
+        # Shorten long URLs to website name
+        source = urlparse(theme_data['urls'][0]).netloc if theme_data['urls'] else "Unknown source"
+        output += f'                            <span>{source}</span>\n'
+
+        # Add favicon next to the source
+        if source != "Unknown source":
+            favicon_url = (self.feed_fetcher.favicon_url(theme_data['urls'][0]) if self.feed_fetcher is not None else "") or f"https://{source}/favicon.ico"
+            output += f'                            <img src="{favicon_url}" alt="Favicon" class="favicon ml-2">\n'
+
+        output += '                        </div>\n'
+        output += '                    </div>\n'
+        output += '                </div>\n'
+
+        return output
+
+    def build_categorized_page(self, categories, categorized, cards):
+        """
+        Builds the categorized news page out of the cards of the themes of each category.
+        """
         # Generate navigation links for categories with articles
         navigation_links = []
         for cat in categories:
-            if categorized[cat]:  # Only include categories with articles
+            if categorized.get(cat):  # Only include categories with articles
                 navigation_links.append(f'<a href="#{cat.lower().replace(" ", "-")}" class="text-blue-600 hover:text-blue-800">{cat}</a>')
         
         output = '<!DOCTYPE html>\n'
@@ -556,64 +844,8 @@ class Processor(APScript):
             output += f'            <h2 class="text-2xl font-semibold text-gray-800 mb-6">{cat}</h2>\n'
             output += '            <div class="grid gap-6 md:grid-cols-2 lg:grid-cols-3">\n'
 
-            for theme_data in themes_in_category:
-                output += '                <div class="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-lg transition-shadow">\n'
-                
-                # Add thumbnail or favicon if available
-                thumbnail = theme_data.get("thumbnails", [{}])[0].get("url", "") if theme_data.get("thumbnails") else ""
-                if not thumbnail:
-                    # Try to get favicon from the website
-                    domain = urlparse(theme_data['urls'][0]).netloc if theme_data['urls'] else ""
-                    if domain:
-                        favicon_url = f"https://{domain}/favicon.ico"
-                        try:
-                            # Check if favicon exists
-                            response = requests.head(favicon_url)
-                            if response.status_code == 200:
-                                thumbnail = favicon_url
-                        except:
-                            pass
-                
-                if thumbnail:
-                    output += f'                    <img src="{thumbnail}" alt="Thumbnail" class="w-full h-48 object-cover">\n'
-                
-                output += '                    <div class="p-6">\n'
-                output += f'                        <h3 class="text-lg font-medium text-gray-800 mb-2">\n'
-                output += f'                            <a href="{theme_data["urls"][0]}" class="hover:text-blue-600 transition-colors">{theme_data["title"]}</a>\n'
-                
-                # Add a "Fusion" label if this theme contains multiple articles
-                if len(theme_data['urls']) > 1:
-                    output += '                            <span class="ml-2 bg-blue-100 text-blue-800 text-xs font-semibold px-2 py-1 rounded">Fusion</span>\n'
-                
-                output += '                        </h3>\n'
-                
-                # Display the AI-generated summary in a scrollable container
-                if len(theme_data['urls']) > 1:
-                    full_summary = theme_data.get("summary", "")
-                    output += f'                        <div class="summary-scroll text-gray-600 text-sm mb-4">\n'
-                    output += f'                            <strong>Summary:</strong> {full_summary}\n'
-                    output += '                        </div>\n'
-                else:
-                    output += f'                        <p class="text-gray-600 text-sm mb-4">{theme_data.get("content", "")[:150]}...</p>\n'
-                
-                output += '                        <div class="flex items-center text-xs text-gray-500">\n'
-                
-                # Use current date if published date is not available
-                published_date = datetime.now().strftime("%Y-%m-%d")
-                output += f'                            <span class="mr-2">📅 {published_date}</span>\n'
-                
-                # Shorten long URLs to website name
-                source = urlparse(theme_data['urls'][0]).netloc if theme_data['urls'] else "Unknown source"
-                output += f'                            <span>{source}</span>\n'
-                
-                # Add favicon next to the source
-                if source != "Unknown source":
-                    favicon_url = f"https://{source}/favicon.ico"
-                    output += f'                            <img src="{favicon_url}" alt="Favicon" class="favicon ml-2">\n'
-                
-                output += '                        </div>\n'
-                output += '                    </div>\n'
-                output += '                </div>\n'
+            for theme_key in themes_in_category:
+                output += cards[theme_key]
 
             output += '            </div>\n'
             output += '        </section>\n'
@@ -621,13 +853,8 @@ class Processor(APScript):
         output += '    </div>\n'
         output += '</body>\n'
         output += '</html>\n'
-        
-        with open(output_folder / "categorized_news.html", "w", encoding="utf8") as f:
-            f.write(output)
-
-        self.set_message_html(output)
+        return output
 
-        
     def assign_category(self, article, categories):
         """
         Assigns a category to an article based on its content.
@@ -638,7 +865,7 @@ class Processor(APScript):
             str: The assigned category.
         """
         title = article.get('title', '').lower()
-        description = article.get('description', '').lower()
+        description = article.get('description', article.get('content', '')).lower()
         
         # Simple keyword-based categorization
         for cat in categories:
@@ -646,6 +873,7 @@ class Processor(APScript):
                 return cat
         return categories[0]  # Default to the first category if no match is found
 
+    @traced_run
     def scrape_news(self, command, full_context, callback, context_state, client:Client):
         """
         Main function to scrape, fuse, and categorize news.
@@ -11,16 +11,25 @@ from lollmsvectordb.database_elements.document import Document
 import subprocess
 from pathlib import Path
 import json
-import pipmaster as pm
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import lazy_import, install_requirements
+from zoo_utilities.llm_tracing import LLMTracingMixin, traced_run
+from zoo_utilities.batch_generation import BatchGenerationMixin
+from zoo_utilities.checkpoints import open_run_journal
+from zoo_utilities.progress import ThrottledProgress, progress_text
 
-if not pm.is_installed("watchdog"):
-    pm.install("watchdog")
-    
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+watchdog_observers = lazy_import("watchdog.observers", "watchdog")
+try:
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    # watchdog is installed by install(), logs monitoring is unavailable until then
+    FileSystemEventHandler = object
 
 # Helper functions
-class Processor(APScript, FileSystemEventHandler):
+class Processor(LLMTracingMixin, BatchGenerationMixin, APScript, FileSystemEventHandler):
     """
     A class that processes model inputs and outputs.
 
@@ -46,6 +55,7 @@ class Processor(APScript, FileSystemEventHandler):
                 {"name":"chunk_size","type":"int","value":3072, "help":"The size of the chunk to read each time"},
                 {"name":"chunk_overlap","type":"int","value":256, "help":"The overlap between blocs"},
                 {"name":"save_each_n_chunks","type":"int","value":0, "help":"The number of chunks to process before saving the file. If 0, then the report is built at the end and a soingle report will be built for all logs."},
+                {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
             ]
             )
         personality_config_vals = BaseConfig.from_template(personality_config_template)
@@ -71,14 +81,16 @@ class Processor(APScript, FileSystemEventHandler):
                             ],
                             callback=callback
                         )
+        # Journal of the read_all_logs run in progress, analyses made while monitoring are not journaled
+        self.journal = None
+        # Position of the file being processed by process_logs, None while monitoring
+        self.file_progress = None
+        self.progress = ThrottledProgress(lambda bars: self.set_message_content(progress_text(bars, ["File", "Chunk"][-len(bars):])))
         
     def install(self):
         super().install()
         
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "watchdog"])      
-        subprocess.run(["pip", "install", "--upgrade", "dpkt"])      
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         
         ASCIIColors.success("Installed successfully")        
 
@@ -86,6 +98,7 @@ class Processor(APScript, FileSystemEventHandler):
         self.set_message_content(self.personality.help)
 
 
+    @traced_run
     def on_modified(self, event):
         if not event.is_directory:
             file_path = Path(event.src_path)
@@ -163,9 +176,13 @@ Act as DocuSphere, a comprehensive document analysis AI that provides insightful
 Answer in a markdown format without any extra comments following the instruction.
 {self.system_custom_header("instructions")}
 """
-            for prompt in prompts:
-                self.step_start(f"Processing {file.name} chunk {i+1}/{n_chunks}- {prompt['title']}")
-                analysis = self.fast_gen(prompt_prefix+chunk_prompt+prompt["content"]+self.ai_full_header)
+            analyses = self.map_generate(
+                [prompt_prefix+chunk_prompt+prompt["content"]+self.ai_full_header for prompt in prompts],
+                label=f"Running the analysis prompts on chunk {i+1}/{n_chunks}",
+                journal=self.journal,
+                journal_step="analysis"
+            )
+            for prompt, analysis in zip(prompts, analyses):
                 try:
                     self.output_file.write("### "+ prompt['title'] + "\n" + prompt["content"]+"\n"+analysis+"\n")
                     self.output_file.flush()
@@ -176,13 +193,14 @@ Answer in a markdown format without any extra comments following the instruction
 
                 except Exception as ex:
                     ASCIIColors.error(ex)
-                self.step_end(f"Processing {file.name} chunk {i+1}/{n_chunks}")
-                self.set_message_content(self.output)
+            self.step_end(f"Processing {file.name} chunk {i+1}/{n_chunks}")
+            self.progress.update(([self.file_progress] if self.file_progress else []) + [(i+1, n_chunks)])
             self.output_file.write("\n\n")
             self.output_file.flush()
 
         self.step_end(f"Processing {file.name}")
 
+    @traced_run
     def read_all_logs(self, command="", full_context="", callback=None, context_state="", client=None):
         if self.personality_config.output_file_path=="":
             self.personality.info("Please setup output file path first")
@@ -192,10 +210,23 @@ Answer in a markdown format without any extra comments following the instruction
             return
         self.output = ""
         self.new_message("")
-        self.process_logs(
-                            self.personality_config.logs_path, 
-                            self.personality_config.file_types
+        # After a crash, the chunks already analyzed are replayed from the journal instead of being generated again
+        self.journal = open_run_journal(
+                            self.personality,
+                            "read_all_logs",
+                            self.personality_config.logs_path,
+                            self.personality_config.file_types,
+                            self.personality_config.chunk_size,
+                            self.personality_config.chunk_overlap
                         )
+        try:
+            self.process_logs(
+                                self.personality_config.logs_path, 
+                                self.personality_config.file_types
+                            )
+            self.journal.finish()
+        finally:
+            self.journal = None
 
     def stop_logs_monitoring(self, command="", full_context="", callback=None, context_state="", client=None):
         self.observer.stop()
@@ -208,7 +239,7 @@ Answer in a markdown format without any extra comments following the instruction
             self.personality.info("Please setup logs folder path first")
             return
         self.new_message("Starting continuous logs process...")
-        self.observer = Observer()
+        self.observer = watchdog_observers.Observer()
         self.observer.schedule(self, self.personality_config.logs_path, recursive=True)
         self.observer.start()
     
@@ -222,9 +253,14 @@ Answer in a markdown format without any extra comments following the instruction
         
         self.output = ""
 
-        for file in files:
-            if file.is_file() and file.suffix[1:] in extension_list:
+        files = [file for file in files if file.is_file() and file.suffix[1:] in extension_list]
+        try:
+            for index, file in enumerate(files):
+                self.file_progress = (index + 1, len(files))
                 self.process_file(file)
+            self.progress.flush()
+        finally:
+            self.file_progress = None
 
     
     def add_file(self, path, client, callback=None):
@@ -25,9 +25,11 @@ from ascii_colors import trace_exception
 import sqlite3
 from pathlib import Path
 from typing import List, Tuple
-from lollms.utilities import PackageManager
-if not PackageManager.check_package_installed("lollmsvectordb"):
-    PackageManager.install_or_update("lollmsvectordb")
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import install_requirements
 
 from lollmsvectordb.directory_binding import DirectoryBinding
 from lollmsvectordb.text_chunker import TextChunker
@@ -196,9 +198,7 @@ class Processor(APScript):
             None
         """        
         super().install()
-        # Example of implementing installation logic. Uncomment and modify as needed.
-        # requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])      
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         ASCIIColors.success("Installed successfully")
 
     def help(self, prompt="", full_context=""):
@@ -15,8 +15,13 @@ import json
 from lollmsvectordb import VectorDatabase
 import requests 
 from typing import Callable, Any
-if not PackageManager.check_package_installed("arxiv"):
-    PackageManager.install_package("arxiv")
+import sys
+zoo_path = str(Path(__file__).resolve().parents[3])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
+from zoo_utilities.dependencies import is_installed, install_requirements
+from zoo_utilities.llm_cache import LLMCacheMixin
+from zoo_utilities.token_cache import get_token_cache
 
 def query_server(base_url, query_params):
     url = base_url + "?" + "&".join([f"{key}={value}" for key, value in query_params.items()])
@@ -28,7 +33,7 @@ def classify_reports(reports):
     sorted_reports = sorted(reports, key=lambda x: x['relevance_score'], reverse=True)
     return sorted_reports
 
-class Processor(APScript):
+class Processor(LLMCacheMixin, APScript):
     """
     A class that processes model inputs and outputs.
 
@@ -68,6 +73,8 @@ class Processor(APScript):
                 {"name":"max_generation_prompt_size","type":"int","value":2048, "min":10, "max":personality.config["ctx_size"], "help":"Crop the maximum generation prompt size"},
                 {"name":"relevance_check_severity","type":"int","value":4, "min":0, "max":10, "help":"The severity of the selection is the threshold under which the AI considers the article as irrelevant"},
                 {"name":"chunk_size","type":"int","value":512, "help":"The size of chunks when using document summary"},
+                {"name":"llm_cache","type":"bool","value":False, "help":"Reuse the answers of deterministic LLM calls across runs (useful to resume a long job)"},
+                {"name":"llm_cache_max_temperature","type":"float","value":0.0, "min":0.0, "max":2.0, "help":"Only the LLM calls made with a temperature at or below this value are cached"},
             ]
             )
         personality_config_vals = BaseConfig.from_template(personality_config_template)
@@ -119,10 +126,8 @@ class Processor(APScript):
         Updated
         """
         if self.personality_config.ieee_explore_key!="" and self.personality_config.nb_ieee_explore_results>0:
-            if not PackageManager.check_package_installed("xploreapi"):
-                PackageManager.install_package("xploreapi")
-
-            from xploreapi import XPLORE
+            if not is_installed("xploreapi"):
+                ASCIIColors.warning("xploreapi is not installed, please reinstall this personality to use IEEE Xplore")
 
         
     def install(self):
@@ -132,9 +137,7 @@ class Processor(APScript):
         # We put this in the shared folder in order as this can be used by other personalities.
         shared_folder = root_dir/"shared"
 
-        requirements_file = self.personality.personality_package_path / "requirements.txt"
-        # Step 2: Install dependencies using pip from requirements.txt
-        subprocess.run(["pip", "install", "--upgrade", "-r", str(requirements_file)])            
+        install_requirements(self.personality.personality_package_path, upgrade=True)
         ASCIIColors.success("Installed successfully")
 
     
@@ -177,8 +180,7 @@ class Processor(APScript):
         self.new_message("")
         for pdf in self.personality.text_files:
             text = TextDocumentsLoader.read_file(pdf)
-            tk = self.personality.model.tokenize(text)
-            cropped = self.personality.model.detokenize(tk[:self.personality_config.chunk_size])
+            cropped = get_token_cache(self.personality.model).head(text, self.personality_config.chunk_size)
             title = self.fast_gen(f"{self.start_header_id_template}request: Extract the title of this document from the chunk.\nAnswer directly by the title without any extra comments.{self.separator_template}{self.start_header_id_template} Document chunk:\n{cropped}{self.separator_template}{self.start_header_id_template}document title:", callback=self.sink)
             authors = self.fast_gen(f"{self.start_header_id_template}request: Extract the abstract of this document from the chunk.\nAnswer directly by the list of authors without any extra comments.{self.separator_template}{self.start_header_id_template} Document chunk:\n{cropped}{self.separator_template}{self.start_header_id_template}authors list:", callback=self.sink)
             if self.personality_config.read_only_first_chunk:
@@ -230,8 +232,7 @@ class Processor(APScript):
         fn = str(file_name).replace('\\','/')
         if self.personality_config.read_the_whole_article:
             text = TextDocumentsLoader.read_file(file_name)
-            tk = self.personality.model.tokenize(text)
-            cropped = self.personality.model.detokenize(tk[:self.personality_config.chunk_size])            
+            cropped = get_token_cache(self.personality.model).head(text, self.personality_config.chunk_size)
             if self.personality_config.read_only_first_chunk:
                 abstract = self.fast_gen(f"{self.start_header_id_template}request: Extract the abstract of this document from the chunk.\nAnswer directly by the abstract without any extra comments.{self.separator_template}{self.start_header_id_template} Document chunk:\n{cropped}{self.separator_template}{self.start_header_id_template}abstract:")
             else:
@@ -248,7 +249,8 @@ class Processor(APScript):
             f"{self.start_header_id_template}subject:{research_subject}",
             f"{self.start_header_id_template}relevance_value:"]), 10,
             debug=self.personality.config.debug, 
-            callback=self.sink)
+            callback=self.sink,
+            temperature=0.0)
         relevance_score = self.find_numeric_value(relevance_score)
         if relevance_score is None:
             relevance="unknown"
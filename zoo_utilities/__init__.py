@@ -0,0 +1,7 @@
+"""
+Shared helpers for the personalities of the zoo.
+
+These modules only depend on the standard library and on the packages lollms
+already ships with, so they can be used both by processors at runtime and by
+maintenance command line tools run from the zoo root.
+"""
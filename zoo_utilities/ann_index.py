@@ -0,0 +1,237 @@
+"""
+Approximate nearest neighbour index
+
+An IVF-flat index written with NumPy only, to keep the search of large
+document indexes fast. The vectors are split in `n_lists` clusters by a
+spherical k-means trained on a sample. A query is compared with the cluster
+centroids first, then only with the vectors of the `n_probe` closest clusters.
+More probes find more of the exact nearest neighbours and cost more time: the
+search compares a query with about `n_probe / n_lists` of the vectors, so with
+`n_lists` growing like the square root of the corpus the query time grows
+much slower than the corpus.
+
+The index only stores the centroids and the cluster of each row: the vectors
+stay in the matrix of the caller, which reads the candidate rows.
+
+Usage in a module:
+    from zoo_utilities.ann_index import IVFIndex
+
+    ivf = IVFIndex()
+    ivf.train(vectors)                     # normalized float32 rows
+    ivf.add(vectors)                       # the cluster of each row, in row order
+    candidates = ivf.probe(query_vectors, n_probe=8)
+    ivf.save(folder / "ivf.npz")
+
+Usage from the command line, to measure the recall and the latency against an exact search:
+    python -m zoo_utilities.ann_index [--rows 50000] [--dims 384] [--probes 1 4 16]
+    python -m zoo_utilities.ann_index --index DB_FOLDER
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from ascii_colors import ASCIIColors
+
+DEFAULT_PROBES = 8
+DEFAULT_ITERATIONS = 10
+# The k-means is trained on at most this many vectors per cluster
+TRAINING_POINTS_PER_LIST = 64
+ASSIGN_BLOCK_ROWS = 16384
+
+
+def default_list_count(rows: int) -> int:
+    """
+    Returns the number of clusters used for a number of rows: about the square root of the rows.
+    """
+    return max(1, int(np.sqrt(rows)))
+
+
+class IVFIndex:
+    """
+    The clusters of the rows of a matrix of normalized vectors.
+
+    Args:
+        centroids (np.ndarray): The normalized centroids of the clusters (None before training).
+        assignments (np.ndarray): The cluster of each row.
+    """
+
+    def __init__(self, centroids: np.ndarray = None, assignments: np.ndarray = None) -> None:
+        self.centroids = centroids
+        self.assignments = assignments if assignments is not None else np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._lists = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids) if self.trained else 0
+
+    def train(self, vectors: np.ndarray, n_lists: int = 0, iterations: int = DEFAULT_ITERATIONS, seed: int = 0) -> None:
+        """
+        Computes the centroids with a spherical k-means on a sample of the vectors.
+
+        Args:
+            vectors (np.ndarray): The normalized vectors (a memory mapped matrix is read once).
+            n_lists (int): The number of clusters (0 for `default_list_count`).
+            iterations (int): The number of k-means iterations.
+            seed (int): The seed of the sampling and of the initial centroids.
+        """
+        rng = np.random.default_rng(seed)
+        n_lists = min(n_lists or default_list_count(len(vectors)), len(vectors))
+        sample_size = min(len(vectors), n_lists * TRAINING_POINTS_PER_LIST)
+        sample = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        points = np.asarray(vectors[sample], dtype=np.float32)
+        centroids = points[rng.choice(len(points), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(points @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, points)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # An empty cluster takes a random point, so that no list is wasted
+            sums[empty] = points[rng.choice(len(points), int(empty.sum()))]
+            norms[empty] = 1
+            centroids = sums / norms
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_rows = len(vectors)
+        self._lists = None
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns the closest cluster of each vector.
+        """
+        labels = [np.argmax(np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32) @ self.centroids.T, axis=1) for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS)]
+        return np.concatenate(labels).astype(np.int32) if labels else np.zeros(0, dtype=np.int32)
+
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        Assigns the rows appended to the matrix of the caller.
+        """
+        self.assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        self._lists = None
+
+    def remap(self, kept_rows: np.ndarray) -> None:
+        """
+        Follows a renumbering of the rows: row `i` becomes the old row `kept_rows[i]`.
+        """
+        self.assignments = self.assignments[kept_rows]
+        self._lists = None
+
+    def _sorted_lists(self):
+        # The rows sorted by cluster and the start of each cluster in them
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            offsets = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def probe(self, query_vectors: np.ndarray, n_probe: int = DEFAULT_PROBES) -> list:
+        """
+        Returns, for each query, the sorted rows of its `n_probe` closest clusters.
+        """
+        order, offsets = self._sorted_lists()
+        n_probe = max(1, min(n_probe, self.n_lists))
+        scores = np.asarray(query_vectors, dtype=np.float32) @ self.centroids.T
+        closest = np.argpartition(-scores, n_probe - 1, axis=1)[:, :n_probe]
+        return [np.sort(np.concatenate([order[offsets[cluster]:offsets[cluster + 1]] for cluster in clusters])) for clusters in closest]
+
+    def save(self, path: Path, **extra) -> None:
+        """
+        Writes the index, and `extra` integers the caller checks when loading it, atomically.
+        """
+        path = Path(path)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments, trained_rows=self.trained_rows, **extra)
+        temporary.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """
+        Returns the index saved in a file and its extra values, or (None, {}) if it can't be read.
+        """
+        try:
+            with np.load(path) as data:
+                index = cls(data["centroids"], data["assignments"])
+                index.trained_rows = int(data["trained_rows"])
+                extra = {key: int(data[key]) for key in data.files if key not in ("centroids", "assignments", "trained_rows")}
+        except (OSError, ValueError, KeyError):
+            return None, {}
+        return index, extra
+
+
+def exact_top_k(vectors: np.ndarray, query_vectors: np.ndarray, top_k: int) -> np.ndarray:
+    similarities = query_vectors @ vectors.T
+    return np.argpartition(-similarities, top_k - 1, axis=1)[:, :top_k]
+
+
+def ivf_top_k(ivf: IVFIndex, vectors: np.ndarray, query_vectors: np.ndarray, top_k: int, n_probe: int) -> list:
+    results = []
+    for query_vector, rows in zip(query_vectors, ivf.probe(query_vectors, n_probe)):
+        similarities = vectors[rows] @ query_vector
+        k = min(top_k, len(rows))
+        results.append(rows[np.argpartition(-similarities, k - 1)[:k]])
+    return results
+
+
+def synthetic_vectors(rows: int, dims: int, seed: int = 0) -> np.ndarray:
+    """
+    Returns normalized vectors grouped around topics, like the embeddings of document chunks.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(2, rows // 200), dims)).astype(np.float32)
+    vectors = topics[rng.integers(0, len(topics), rows)] + 1.5 * rng.standard_normal((rows, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the recall and the latency of the IVF search against an exact search")
+    parser.add_argument("--index", type=Path, help="Use the vectors of a document index folder instead of synthetic ones")
+    parser.add_argument("--rows", type=int, default=50000, help="Number of synthetic vectors")
+    parser.add_argument("--dims", type=int, default=384, help="Dimensions of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of neighbours searched")
+    parser.add_argument("--lists", type=int, default=0, help="Number of clusters (0 for the square root of the rows)")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Numbers of probed clusters to measure")
+    args = parser.parse_args()
+
+    if args.index is not None:
+        from zoo_utilities.doc_index import DocumentIndex
+
+        _, vectors = DocumentIndex(args.index, vectorizer=None)._live_vectors()
+    else:
+        vectors = synthetic_vectors(args.rows, args.dims)
+    if len(vectors) < args.top_k:
+        ASCIIColors.error("Not enough vectors to search")
+        return
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries)] + 0.5 * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32) / np.sqrt(vectors.shape[1])
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    start = time.perf_counter()
+    ivf = IVFIndex()
+    ivf.train(vectors, args.lists)
+    ivf.add(vectors)
+    print(f"{len(vectors)} vectors, {vectors.shape[1]} dimensions, {ivf.n_lists} lists, built in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    exact = [set(exact_top_k(vectors, query[None, :], args.top_k)[0]) for query in queries]
+    exact_ms = 1000 * (time.perf_counter() - start) / args.queries
+    print(f"{'probes':>6} {'recall@' + str(args.top_k):>9} {'ms/query':>9} {'scanned':>8}")
+    print(f"{'exact':>6} {1:9.3f} {exact_ms:9.3f} {1:8.1%}")
+    for n_probe in args.probes:
+        start = time.perf_counter()
+        found = ivf_top_k(ivf, vectors, queries, args.top_k, n_probe)
+        elapsed_ms = 1000 * (time.perf_counter() - start) / args.queries
+        recall = np.mean([len(exact_rows & set(rows)) / args.top_k for exact_rows, rows in zip(exact, found)])
+        scanned = np.mean([len(rows) for rows in ivf.probe(queries, n_probe)]) / len(vectors)
+        print(f"{n_probe:6d} {recall:9.3f} {elapsed_ms:9.3f} {scanned:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
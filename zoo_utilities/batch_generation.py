@@ -0,0 +1,288 @@
+"""
+Batch generation
+
+A mixin giving processors `map_generate`, which runs a list of independent
+prompts and returns the answers in the same order. Prompts go to the binding's
+batch endpoint when it has one. Otherwise they go through a bounded thread pool
+when the binding talks to a remote server that serves requests concurrently, or
+one after another for local models that generate one answer at a time.
+
+The personality helpers (`fast_gen`, `generate`...) accumulate the streamed
+answer in the personality (`bot_says`), so two of them running at once mix their
+answers. Concurrent plain prompts are therefore generated by `isolated_generate`,
+which calls the binding with a buffer of its own; other concurrent calls run one
+at a time.
+
+Progress is shown as a step that counts the finished prompts. Answers can also
+be consumed as soon as they and all the ones before them are ready, so a
+pipeline can keep writing its output in order while the rest is generated.
+
+Processors can expose the concurrency as a personality setting:
+    {"name":"llm_concurrency","type":"int","value":0, "help":"Number of LLM requests sent at once (0 to choose from the binding: parallel for remote servers, sequential for local models)"},
+
+Usage in a processor:
+    from zoo_utilities.batch_generation import BatchGenerationMixin
+
+    class Processor(BatchGenerationMixin, APScript):
+        def summarize_all(self, chunks):
+            prompts = [f"Summarize this:\n{chunk}" for chunk in chunks]
+            return self.map_generate(prompts, max_generation_size=512, label="Summarizing chunks")
+"""
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ascii_colors import ASCIIColors
+
+# Bindings that forward the generations to a server able to handle several requests at once
+REMOTE_BINDINGS = {
+    "open_ai", "openai", "azure_openai", "ollama", "lollms", "elf", "vllm", "litellm", "groq",
+    "mistral_ai", "gemini", "anthropic", "open_router", "openrouter", "together_ai", "hugging_face_inference_api",
+}
+DEFAULT_REMOTE_CONCURRENCY = 4
+# Names of the batch endpoints a binding may expose, taking a list of prompts and returning a list of answers
+BATCH_ENDPOINTS = ("generate_batch", "batch_generate")
+# The only helper arguments the batch endpoints receive (as their n_predict)
+BATCH_SIZE_ARGUMENTS = ("max_generation_size", "max_size")
+# The helper arguments `isolated_generate` takes. Concurrent calls with other arguments, or to other
+# helpers, would share the answer buffer of the personality and run one at a time instead
+ISOLATED_ARGUMENTS = ("max_generation_size", "max_size", "callback", "temperature", "top_k", "top_p", "repeat_penalty", "repeat_last_n")
+
+_batch_context = threading.local()
+
+
+def current_batch_caller() -> str:
+    """
+    Returns the name of the processor method that started the `map_generate` running
+    in this thread, or None outside of a batch. Lets the LLM tracing attribute calls
+    made from the worker threads.
+    """
+    return getattr(_batch_context, "caller", None)
+
+
+class BatchGenerationMixin:
+    """
+    Runs independent LLM calls concurrently. Put it before APScript in the bases.
+
+    The `llm_concurrency` personality setting, when set to a positive value, takes
+    precedence over the class attribute of the same name. None or 0 chooses from the binding.
+    """
+
+    llm_concurrency = None
+
+    def _llm_binding_name(self) -> str:
+        try:
+            return str(self.personality.config["binding_name"]).lower()
+        except Exception:
+            return ""
+
+    def default_llm_concurrency(self) -> int:
+        """
+        Returns the number of requests sent at once when `map_generate` is not given one.
+        """
+        try:
+            configured = self.personality_config["llm_concurrency"]
+        except Exception:
+            configured = None
+        for value in (configured, self.llm_concurrency):
+            try:
+                if value is not None and int(value) > 0:
+                    return int(value)
+            except (TypeError, ValueError):
+                pass
+        return DEFAULT_REMOTE_CONCURRENCY if self._llm_binding_name() in REMOTE_BINDINGS else 1
+
+    def _batch_endpoint(self, method: str, items: list, kwargs: dict):
+        # The batch endpoint takes raw prompts, so only plain prompts without per call options can use it
+        if method not in ("fast_gen", "generate") or any(not isinstance(item, str) for item in items):
+            return None
+        if any(key not in BATCH_SIZE_ARGUMENTS for key in kwargs):
+            return None
+        model = getattr(self.personality, "model", None)
+        for name in BATCH_ENDPOINTS:
+            endpoint = getattr(model, name, None)
+            if callable(endpoint):
+                return endpoint
+        return None
+
+    def isolated_generate(self, prompt: str, max_generation_size: int = None, callback=None, temperature: float = None, top_k: int = None, top_p: float = None, repeat_penalty: float = None, repeat_last_n: int = None, max_size: int = None) -> str:
+        """
+        Generates an answer from the binding directly, accumulating it in a buffer of its own.
+
+        Unlike `fast_gen`, nothing is kept in the personality, so several calls can run at once.
+        The answer is not streamed to the message (`callback` is accepted and ignored), and the
+        prompt is sent as is, without the reshaping of `fast_gen`.
+        """
+        personality = self.personality
+        model = personality.model
+        n_predict = max_generation_size or max_size
+        if not n_predict:
+            try:
+                from zoo_utilities.token_cache import get_token_cache
+
+                n_predict = min(int(personality.config["ctx_size"]) - get_token_cache(model).count(prompt), int(personality.config["max_n_predict"]))
+            except Exception:
+                n_predict = None
+            n_predict = max(1, n_predict) if n_predict is not None else None
+        parameters = {
+            "temperature": temperature if temperature is not None else getattr(personality, "model_temperature", None),
+            "top_k": top_k if top_k is not None else getattr(personality, "model_top_k", None),
+            "top_p": top_p if top_p is not None else getattr(personality, "model_top_p", None),
+            "repeat_penalty": repeat_penalty if repeat_penalty is not None else getattr(personality, "model_repeat_penalty", None),
+            "repeat_last_n": repeat_last_n if repeat_last_n is not None else getattr(personality, "model_repeat_last_n", None),
+        }
+        parameters = {key: value for key, value in parameters.items() if isinstance(value, (int, float))}
+        pieces = []
+
+        def receive(chunk, message_type=None, *args, **kwargs):
+            pieces.append(str(chunk))
+            # Stops the generation at an antiprompt, like the personality does
+            return not personality.detect_antiprompt("".join(pieces))
+
+        answer = model.generate(prompt, n_predict, callback=receive, **parameters)
+        text = "".join(pieces) if pieces else str(answer or "")
+        antiprompt = personality.detect_antiprompt(text)
+        markers = [antiprompt] if isinstance(antiprompt, str) and antiprompt else []
+        try:
+            markers.append(self.config.separator_template + self.config.start_header_id_template)
+        except Exception:
+            pass
+        for marker in markers:
+            position = text.lower().find(marker.lower())
+            if position >= 0:
+                text = text[:position]
+        return text.strip()
+
+    def map_generate(self, prompts: list, concurrency: int = None, method: str = "fast_gen", label: str = "Generating", on_result=None, return_exceptions: bool = False, journal=None, journal_step: str = "map_generate", **kwargs) -> list:
+        """
+        Runs a generation helper on each prompt and returns the answers in the order of the prompts.
+
+        Args:
+            prompts (list): The prompts. An entry can also be a dict of keyword arguments for
+                the helper (for example {"prompt": ..., "placeholders": {...}}).
+            concurrency (int): Maximum number of requests sent at once. Defaults to
+                `default_llm_concurrency()`. Only plain "fast_gen" or "generate" prompts run at once
+                (through `isolated_generate`), the other calls run one at a time.
+            method (str): The APScript helper to call ("fast_gen", "generate", "summarize_text"...).
+            label (str): The text of the progress step.
+            on_result (callable): Called with (index, answer) for each answer, in the order of the
+                prompts, as soon as the answer and all the previous ones are ready.
+            return_exceptions (bool): If True, a failed call gives its exception in the results
+                instead of stopping the batch.
+            journal (RunJournal): A run journal (see `zoo_utilities.checkpoints`). Prompts it already
+                holds an answer for are not generated again and new answers are recorded in it.
+            journal_step (str): The step id of the answers in the journal.
+            **kwargs: Keyword arguments passed to every helper call (max_generation_size...). The batch
+                endpoint is only used when they hold nothing but the generation size.
+
+        Returns:
+            list: The answers.
+        """
+        items = list(prompts)
+        total = len(items)
+        results = [None] * total
+        if total == 0:
+            return results
+        concurrency = max(1, min(int(concurrency or self.default_llm_concurrency()), total))
+        caller = sys._getframe(1).f_code.co_name
+        self.step_start(label)
+
+        endpoint = self._batch_endpoint(method, items, kwargs) if concurrency > 1 and journal is None else None
+        if endpoint is not None:
+            n_predict = kwargs.get("max_generation_size", kwargs.get("max_size"))
+            try:
+                answers = list(endpoint(items, n_predict=n_predict) if n_predict else endpoint(items))
+                if len(answers) != total:
+                    raise ValueError(f"The batch endpoint returned {len(answers)} answers for {total} prompts")
+            except Exception as ex:
+                if return_exceptions:
+                    answers = [ex] * total
+                else:
+                    # The prompts are sent one by one instead, each failure then stops the batch as usual
+                    ASCIIColors.warning(f"The batch endpoint failed, sending the prompts one by one: {ex}")
+                    answers = None
+            if answers is not None:
+                try:
+                    for index, answer in enumerate(answers):
+                        results[index] = answer
+                        if on_result is not None:
+                            on_result(index, answer)
+                except BaseException:
+                    self.step_end(label, False)
+                    raise
+                self.step_end(label)
+                return results
+
+        if concurrency > 1 and method in ("fast_gen", "generate") and all(isinstance(item, str) for item in items) and all(key in ISOLATED_ARGUMENTS for key in kwargs):
+            helper = self.isolated_generate
+        else:
+            helper = getattr(self, method)
+            # The other helpers keep the answer in the personality, they can't run at once
+            concurrency = 1
+        # Callbacks are left out of the journal keys, their text changes from one run to the next
+        journal_params = {key: value for key, value in kwargs.items() if not callable(value)}
+
+        def call(item):
+            if journal is not None:
+                recorded = journal.get(journal_step, [method, item, journal_params])
+                if recorded is not None:
+                    return recorded[0]
+            item_kwargs = dict(kwargs, **item) if isinstance(item, dict) else dict(kwargs, prompt=item)
+            if concurrency > 1:
+                # Concurrent answers would be streamed into the same message
+                item_kwargs.setdefault("callback", self.sink)
+            prompt = item_kwargs.pop("prompt", None)
+            previous_caller = current_batch_caller()
+            _batch_context.caller = caller
+            try:
+                answer = helper(prompt, **item_kwargs) if prompt is not None else helper(**item_kwargs)
+            finally:
+                _batch_context.caller = previous_caller
+            if journal is not None:
+                journal.record(journal_step, [method, item, journal_params], answer)
+            return answer
+
+        done = set()
+        next_to_deliver = 0
+
+        def deliver(index, answer):
+            nonlocal next_to_deliver
+            results[index] = answer
+            done.add(index)
+            while next_to_deliver in done:
+                if on_result is not None:
+                    on_result(next_to_deliver, results[next_to_deliver])
+                next_to_deliver += 1
+
+        try:
+            if concurrency == 1:
+                for index, item in enumerate(items):
+                    try:
+                        answer = call(item)
+                    except Exception as ex:
+                        if not return_exceptions:
+                            raise
+                        answer = ex
+                    deliver(index, answer)
+                    self.step(f"{label}: {index + 1}/{total}")
+            else:
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="map_generate") as executor:
+                    pending = {executor.submit(call, item): index for index, item in enumerate(items)}
+                    try:
+                        while pending:
+                            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                index = pending.pop(future)
+                                error = future.exception()
+                                if error is not None and not return_exceptions:
+                                    raise error
+                                deliver(index, error if error is not None else future.result())
+                            self.step(f"{label}: {len(done)}/{total}")
+                    finally:
+                        for future in pending:
+                            future.cancel()
+        except BaseException:
+            self.step_end(label, False)
+            raise
+        self.step_end(label)
+        return results
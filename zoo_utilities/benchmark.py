@@ -0,0 +1,239 @@
+"""
+Processor benchmark
+
+Runs every `scripts/processor.py` of the zoo against the lollms stubs and a
+deterministic fake model, without GPU nor network access, to find out which
+personalities are worth optimizing.
+
+Each processor is measured in a fresh interpreter:
+    - import time of the processor module,
+    - construction time of the `Processor`,
+    - wall time of a first `run_workflow` call and time to its first output,
+    - number of LLM calls, prompt tokens sent and tokens generated.
+
+Everything the processor writes goes to a temporary work folder and outgoing
+network connections are refused.
+
+Usage:
+    python -m zoo_utilities.benchmark [--filter TEXT] [--prompt TEXT] [--timeout SECONDS] [--jobs N] [--json PATH]
+"""
+import argparse
+import inspect
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from zoo_utilities.import_budget import ZOO_ROOT, discover_processors, import_processor
+
+DEFAULT_PROMPT = "Hello, can you help me with a short example?"
+DEFAULT_TIMEOUT = 120
+RESULT_PREFIX = "BENCHMARK_RESULT "
+# Makes the tools a processor may spawn (pip, npm, git...) fail fast instead of reaching the network
+OFFLINE_ENVIRONMENT = {
+    "HTTP_PROXY": "http://127.0.0.1:9", "HTTPS_PROXY": "http://127.0.0.1:9", "NO_PROXY": "",
+    "PIP_NO_INDEX": "1", "npm_config_offline": "true", "HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1",
+}
+
+
+def block_network() -> None:
+    """
+    Makes every internet socket connection fail immediately. Unix sockets still work.
+    """
+    original_connect = socket.socket.connect
+
+    def connect(sock, address):
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            raise ConnectionRefusedError("Network access is disabled during benchmarks")
+        return original_connect(sock, address)
+
+    def create_connection(*args, **kwargs):
+        raise ConnectionRefusedError("Network access is disabled during benchmarks")
+
+    socket.socket.connect = connect
+    socket.create_connection = create_connection
+
+
+def build_workflow_arguments(run_workflow, context_details, client, callback) -> dict:
+    """
+    Builds the arguments of a `run_workflow` call from its signature, supporting both the
+    `context_details` style and the older `prompt, previous_discussion_text` style.
+    """
+    available = {
+        "prompt": context_details.prompt,
+        "previous_discussion_text": context_details.discussion_messages,
+        "full_context": context_details.discussion_messages,
+        "context_details": context_details,
+        "client": client,
+        "callback": callback,
+    }
+    arguments = {}
+    for name, parameter in inspect.signature(run_workflow).parameters.items():
+        if name in available:
+            arguments[name] = available[name]
+        elif parameter.default is inspect.Parameter.empty and parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            arguments[name] = None
+    return arguments
+
+
+def benchmark_processor(processor_path: Path, work_folder: Path, prompt: str = DEFAULT_PROMPT) -> dict:
+    """
+    Benchmarks a processor in the current interpreter. Meant to run in a fresh process.
+
+    Returns:
+        dict: The measurements. `status` is "ok", "missing" (a third party module is not
+        installed here) or "error", and `stage` tells which step was reached.
+    """
+    from zoo_utilities.lollms_stubs import FakePersonality, LollmsContextDetails, Stub, install_lollms_stubs
+
+    install_lollms_stubs()
+    block_network()
+    processor_path = Path(processor_path)
+    personality = FakePersonality(processor_path.parent.parent, work_folder)
+    result = {
+        "path": str(processor_path), "status": "ok", "stage": "import", "error": "",
+        "import_seconds": None, "construction_seconds": None, "workflow_seconds": None,
+        "first_output_seconds": None, "wall_seconds": None,
+        "llm_calls": 0, "prompt_tokens": 0, "generated_tokens": 0,
+    }
+    start = time.perf_counter()
+    try:
+        module = import_processor(processor_path)
+        result["import_seconds"] = time.perf_counter() - start
+
+        result["stage"] = "construction"
+        step_start = time.perf_counter()
+        processor = module.Processor(personality, callback=None)
+        result["construction_seconds"] = time.perf_counter() - step_start
+
+        result["stage"] = "workflow"
+        # The stub base class has no run_workflow, so processors that only expose commands are skipped
+        if inspect.getattr_static(processor, "run_workflow", None) is not None:
+            run_workflow = processor.run_workflow
+            context_details = LollmsContextDetails(
+                prompt=prompt,
+                discussion_messages=f"!@>user: {prompt}\n",
+                conditionning="",
+                ai_prefix="!@>assistant: ",
+                current_language="english",
+                is_continue=False,
+                extra="",
+            )
+            personality.first_output_time = None
+            step_start = time.perf_counter()
+            run_workflow(**build_workflow_arguments(run_workflow, context_details, Stub(client_id="benchmark"), lambda *args, **kwargs: True))
+            result["workflow_seconds"] = time.perf_counter() - step_start
+            if personality.first_output_time is not None:
+                result["first_output_seconds"] = personality.first_output_time - step_start
+        result["stage"] = "done"
+    except ImportError as ex:
+        # Lazy imports raise an ImportError chained to the ModuleNotFoundError
+        missing = ex if isinstance(ex, ModuleNotFoundError) else ex.__cause__
+        result["status"] = "missing" if isinstance(missing, ModuleNotFoundError) else "error"
+        result["error"] = f"missing module {missing.name}" if isinstance(missing, ModuleNotFoundError) else f"ImportError: {ex}"
+    except BaseException as ex:
+        result["status"] = "error"
+        # Point at the deepest zoo frame rather than inside a library
+        frames = traceback.extract_tb(ex.__traceback__)
+        zoo_frames = [f for f in frames if f.filename.startswith(str(processor_path.parents[3]))]
+        frame = (zoo_frames or frames)[-1]
+        result["error"] = f"{type(ex).__name__}: {ex} ({Path(frame.filename).name}:{frame.lineno})"[:500]
+    result["wall_seconds"] = time.perf_counter() - start
+    result.update(personality.model.stats())
+    return result
+
+
+def benchmark_in_subprocess(processor_path: Path, zoo_path: Path = ZOO_ROOT, prompt: str = DEFAULT_PROMPT, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    Benchmarks a processor in a fresh interpreter running in a temporary work folder.
+    """
+    work_folder = Path(tempfile.mkdtemp(prefix="zoo_benchmark_"))
+    command = [sys.executable, "-m", "zoo_utilities.benchmark", "--measure", str(processor_path), "--work", str(work_folder), "--prompt", prompt]
+    env = dict(os.environ, **OFFLINE_ENVIRONMENT, PYTHONPATH=os.pathsep.join([str(zoo_path), os.environ.get("PYTHONPATH", "")]).rstrip(os.pathsep))
+    try:
+        completed = subprocess.run(command, cwd=str(work_folder), env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout)
+        for line in reversed(completed.stdout.splitlines()):
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX):])
+        return {"path": str(processor_path), "status": "error", "stage": "unknown", "error": completed.stderr.strip()[-500:]}
+    except subprocess.TimeoutExpired:
+        return {"path": str(processor_path), "status": "timeout", "stage": "unknown", "error": f"no result after {timeout}s", "wall_seconds": timeout}
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+def run_benchmark(zoo_path: Path = ZOO_ROOT, name_filter: str = "", prompt: str = DEFAULT_PROMPT, timeout: float = DEFAULT_TIMEOUT, jobs: int = 1) -> list:
+    """
+    Benchmarks every processor of the zoo.
+
+    Args:
+        zoo_path (Path): The zoo root.
+        name_filter (str): Only processors whose path contains this text are measured.
+        prompt (str): The user prompt sent to each workflow.
+        timeout (float): Maximum time given to a processor, in seconds.
+        jobs (int): Number of processors measured in parallel.
+
+    Returns:
+        list: One result per processor, with paths relative to the zoo.
+    """
+    processors = discover_processors(zoo_path, name_filter)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = list(executor.map(lambda p: benchmark_in_subprocess(p, zoo_path, prompt, timeout), processors))
+    for result in results:
+        result["path"] = Path(result["path"]).relative_to(zoo_path).as_posix()
+    return results
+
+
+def _ms(value) -> str:
+    return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(results: list) -> None:
+    print(f"{'import ms':>9} {'build ms':>9} {'1st out ms':>10} {'wall ms':>9} {'calls':>5} {'tok in':>7} {'tok out':>7}  personality")
+    for result in sorted(results, key=lambda r: -(r.get("wall_seconds") or 0)):
+        if result["status"] != "ok":
+            continue
+        print(f"{_ms(result['import_seconds'])} {_ms(result['construction_seconds'])} {_ms(result['first_output_seconds']):>10} {_ms(result['wall_seconds'])} "
+              f"{result['llm_calls']:5d} {result['prompt_tokens']:7d} {result['generated_tokens']:7d}  {result['path']}")
+    for result in results:
+        if result["status"] != "ok":
+            print(f"{result['status']:<8} [{result['stage']}] {result['path']}: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the import, construction and first workflow run of every processor of the zoo")
+    parser.add_argument("--zoo", type=Path, default=ZOO_ROOT, help="The root folder of the zoo")
+    parser.add_argument("--filter", default="", help="Only benchmark processors whose path contains this text")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="The user prompt sent to the workflows")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Maximum time given to each processor in seconds")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processors benchmarked in parallel (skews the timings when larger than the number of cores)")
+    parser.add_argument("--json", type=Path, default=None, help="Write the measurements to this file")
+    parser.add_argument("--measure", type=Path, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--work", type=Path, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        result = benchmark_processor(args.measure, args.work or Path.cwd(), args.prompt)
+        print(RESULT_PREFIX + json.dumps(result))
+        sys.stdout.flush()
+        # Processors may leave non daemon threads behind
+        os._exit(0)
+
+    results = run_benchmark(args.zoo.resolve(), args.filter, args.prompt, args.timeout, args.jobs)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=4)
+    nb_ok = sum(1 for r in results if r["status"] == "ok")
+    print(f"{nb_ok} processors benchmarked, {len(results) - nb_ok} failed or not runnable here")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Zoo catalog
+
+Builds and maintains a single compact JSON index of every personality in the
+zoo so that listing and searching the zoo does not require parsing every
+`<category>/<personality>/config.yaml` file at mount time.
+
+Each entry also points to the content-hashed logo thumbnails produced by
+`zoo_utilities.thumbnails`.
+
+The catalog is rebuilt incrementally: a config file is only re-parsed when its
+size or modification time changed *and* its content hash is different from the
+one recorded in the catalog.
+
+Usage:
+    python -m zoo_utilities.catalog [--zoo PATH] [--output PATH] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import yaml
+from ascii_colors import ASCIIColors, trace_exception
+
+from zoo_utilities.thumbnails import logo_digest, thumbnail_names
+
+CATALOG_FORMAT_VERSION = 2
+CATALOG_FILE_NAME = "zoo_catalog.json"
+ZOO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value).strip()
+
+
+def extract_entry(personality_folder: Path, config_data: dict) -> dict:
+    """
+    Extracts the catalog fields of a personality from its parsed config.yaml.
+
+    Args:
+        personality_folder (Path): The folder of the personality.
+        config_data (dict): The parsed content of its config.yaml file.
+
+    Returns:
+        dict: The catalog entry (without the bookkeeping fields).
+    """
+    commands = []
+    for command in config_data.get("commands") or []:
+        if isinstance(command, dict):
+            commands.append({
+                "name": _text(command.get("name")),
+                "value": _text(command.get("value")),
+                "help": _text(command.get("help")),
+            })
+    return {
+        "name": _text(config_data.get("name", personality_folder.name)),
+        "category": _text(config_data.get("category", personality_folder.parent.name)),
+        "author": _text(config_data.get("author")),
+        "version": _text(config_data.get("version")),
+        "language": _text(config_data.get("language")),
+        "description": _text(config_data.get("personality_description")),
+        "disclaimer": _text(config_data.get("disclaimer")),
+        "dependencies": config_data.get("dependencies") or [],
+        "commands": commands,
+        "has_processor": (personality_folder / "scripts" / "processor.py").exists(),
+    }
+
+
+def refresh_logo(personality_folder: Path, entry: dict) -> bool:
+    """
+    Updates the logo and thumbnail fields of a catalog entry.
+
+    The logo is only hashed again when its size or modification time changed.
+
+    Returns:
+        bool: True if the entry was modified.
+    """
+    logo_path = personality_folder / "assets" / "logo.png"
+    if not logo_path.exists():
+        if entry.get("logo") is None and "thumbnails" in entry:
+            return False
+        entry["logo"] = None
+        entry["thumbnails"] = {}
+        return True
+    stat = logo_path.stat()
+    logo = entry.get("logo")
+    if logo and logo["mtime_ns"] == stat.st_mtime_ns and logo["size"] == stat.st_size:
+        return False
+    digest = logo_digest(logo_path)
+    entry["logo"] = {
+        "path": logo_path.relative_to(personality_folder.parent.parent).as_posix(),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest,
+    }
+    entry["thumbnails"] = thumbnail_names(digest)
+    return True
+
+
+class ZooCatalog:
+    """
+    An incrementally rebuilt index of all the personalities of the zoo.
+
+    Entries are keyed by `<category folder>/<personality folder>`, which is the
+    same identifier lollms uses to mount a personality.
+    """
+
+    def __init__(self, zoo_path: Path = ZOO_ROOT, catalog_path: Path = None) -> None:
+        self.zoo_path = Path(zoo_path)
+        self.catalog_path = Path(catalog_path) if catalog_path else self.zoo_path / CATALOG_FILE_NAME
+        self.entries = {}
+        self.generated = 0
+        self.load()
+
+    def load(self) -> None:
+        """
+        Loads the catalog from disk. A missing or incompatible file results in an empty catalog.
+        """
+        self.entries = {}
+        if not self.catalog_path.exists():
+            return
+        try:
+            with open(self.catalog_path, "r", encoding="utf8") as f:
+                data = json.load(f)
+            if data.get("format_version") == CATALOG_FORMAT_VERSION:
+                self.entries = data.get("personalities", {})
+                self.generated = data.get("generated", 0)
+        except Exception as ex:
+            ASCIIColors.warning(f"Couldn't load the zoo catalog {self.catalog_path}, it will be rebuilt: {ex}")
+
+    def save(self) -> None:
+        """
+        Writes the catalog atomically so that readers never see a partial file.
+        """
+        data = {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "generated": self.generated,
+            "personalities": dict(sorted(self.entries.items())),
+        }
+        tmp_path = self.catalog_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.catalog_path)
+
+    def iter_config_files(self):
+        for config_file in self.zoo_path.glob("*/*/config.yaml"):
+            if config_file.parent.parent.name.startswith("."):
+                continue
+            yield config_file
+
+    def update(self, force: bool = False) -> dict:
+        """
+        Synchronizes the catalog with the zoo folder and saves it if anything changed.
+
+        Args:
+            force (bool): If True, every config file is re-parsed.
+
+        Returns:
+            dict: Counters of added, updated, unchanged, removed and failed entries.
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        seen = set()
+        changed = not self.catalog_path.exists()
+        for config_file in self.iter_config_files():
+            personality_folder = config_file.parent
+            key = f"{personality_folder.parent.name}/{personality_folder.name}"
+            seen.add(key)
+            stat = config_file.stat()
+            entry = self.entries.get(key)
+            if not force and entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                changed |= refresh_logo(personality_folder, entry)
+                stats["unchanged"] += 1
+                continue
+
+            data = config_file.read_bytes()
+            digest = _file_digest(data)
+            if not force and entry and entry["sha256"] == digest:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entry["size"] = stat.st_size
+                refresh_logo(personality_folder, entry)
+                stats["unchanged"] += 1
+                changed = True
+                continue
+
+            try:
+                config_data = yaml.safe_load(data.decode("utf8")) or {}
+                new_entry = extract_entry(personality_folder, config_data)
+            except Exception as ex:
+                ASCIIColors.error(f"Couldn't parse {config_file}: {ex}")
+                trace_exception(ex)
+                stats["failed"] += 1
+                continue
+            new_entry.update({
+                "path": key,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest,
+            })
+            if entry and not force:
+                new_entry["logo"] = entry.get("logo")
+                new_entry["thumbnails"] = entry.get("thumbnails", {})
+            refresh_logo(personality_folder, new_entry)
+            stats["updated" if entry else "added"] += 1
+            self.entries[key] = new_entry
+            changed = True
+
+        for key in [k for k in self.entries if k not in seen]:
+            del self.entries[key]
+            stats["removed"] += 1
+            changed = True
+
+        if changed:
+            self.generated = time.time()
+            self.save()
+        return stats
+
+    def search(self, text: str = "", category: str = None) -> list:
+        """
+        Searches the catalog by name, description and category.
+
+        Args:
+            text (str): Case insensitive text to look for. Empty matches everything.
+            category (str): If provided, only entries of this category folder are returned.
+
+        Returns:
+            list: The matching entries.
+        """
+        text = text.lower()
+        results = []
+        for key, entry in self.entries.items():
+            if category and key.split("/")[0] != category:
+                continue
+            if text and text not in entry["name"].lower() and text not in entry["description"].lower() and text not in entry["category"].lower():
+                continue
+            results.append(entry)
+        return results
+
+
+def load_catalog(zoo_path: Path = ZOO_ROOT, catalog_path: Path = None) -> ZooCatalog:
+    """
+    Returns an up to date catalog of the zoo, rebuilding only the entries whose config changed.
+    """
+    catalog = ZooCatalog(zoo_path, catalog_path)
+    catalog.update()
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the personalities zoo catalog")
+    parser.add_argument("--zoo", type=Path, default=ZOO_ROOT, help="The root folder of the zoo")
+    parser.add_argument("--output", type=Path, default=None, help=f"The catalog file (defaults to <zoo>/{CATALOG_FILE_NAME})")
+    parser.add_argument("--force", action="store_true", help="Re-parse every config file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = ZooCatalog(args.zoo, args.output)
+    stats = catalog.update(force=args.force)
+    ASCIIColors.success(f"Catalog {catalog.catalog_path} holds {len(catalog.entries)} personalities ({', '.join(f'{k}: {v}' for k, v in stats.items())}) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
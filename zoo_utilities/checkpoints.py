@@ -0,0 +1,168 @@
+"""
+Run checkpoints
+
+An append-only journal of the completed units of a long processor run, so that
+a run interrupted by a crash or a restart resumes where it stopped instead of
+starting over.
+
+Each unit is recorded as a JSON line holding its step id, the hash of its
+inputs and its result. A unit is only skipped when both match, so changing a
+document, a prompt or a setting redoes exactly the units it affects. A run has
+its own journal file, named after the run and the hash of the run inputs, that
+is deleted once the run completes.
+
+Usage in a processor:
+    from zoo_utilities.checkpoints import open_run_journal
+
+    journal = open_run_journal(self.personality, "summaries", data_folder, self.personality_config.chunk_size)
+    for chunk in chunks:
+        summary = journal.run("summary", chunk, lambda: self.fast_gen(f"Summarize:\n{chunk}"))
+    journal.finish()
+
+Usage from the command line:
+    python -m zoo_utilities.checkpoints FOLDER [--clear]
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+CHECKPOINTS_FOLDER_NAME = "checkpoints"
+JOURNAL_SUFFIX = ".jsonl"
+
+
+def input_hash(value) -> str:
+    """
+    Returns a stable hash of JSON-like inputs (dicts are hashed independently of their key order).
+    """
+    description = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(description.encode("utf8", errors="surrogatepass")).hexdigest()
+
+
+class RunJournal:
+    """
+    The journal of the completed units of a run.
+
+    Args:
+        journal_file (Path): The JSONL file the units are appended to. Units already
+            recorded in it are loaded, a truncated last line left by a crash is ignored.
+    """
+
+    def __init__(self, journal_file: Path) -> None:
+        self.journal_file = Path(journal_file)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.resumed = 0
+        if self.journal_file.exists():
+            with open(self.journal_file, "r", encoding="utf8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[(entry["step"], entry["input_hash"])] = entry.get("value")
+        self.recovered = len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, step: str, inputs):
+        """
+        Returns the recorded result of a unit (a tuple holding it) or None if the unit was not completed.
+        """
+        key = (step, input_hash(inputs))
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self.resumed += 1
+            return (self._entries[key],)
+
+    def done(self, step: str, inputs) -> bool:
+        with self._lock:
+            return (step, input_hash(inputs)) in self._entries
+
+    def record(self, step: str, inputs, value=None) -> None:
+        """
+        Records a completed unit and its JSON serializable result. The line is on disk when this returns.
+        """
+        entry = {"step": step, "input_hash": input_hash(inputs), "time": time.time(), "value": value}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_file, "a", encoding="utf8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[(entry["step"], entry["input_hash"])] = value
+
+    def run(self, step: str, inputs, function):
+        """
+        Returns the recorded result of a unit, or calls `function()` and records its result.
+        """
+        recorded = self.get(step, inputs)
+        if recorded is not None:
+            return recorded[0]
+        value = function()
+        self.record(step, inputs, value)
+        return value
+
+    def finish(self) -> None:
+        """
+        Marks the run as completed by deleting its journal, so the next run starts from scratch.
+        """
+        with self._lock:
+            self._entries.clear()
+            try:
+                self.journal_file.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def open_run_journal(personality, run_name: str, *run_inputs, folder: Path = None) -> RunJournal:
+    """
+    Opens the journal of a run of a personality, resuming it if a previous run with the same inputs was interrupted.
+
+    Args:
+        personality (AIPersonality): The personality, used to locate the checkpoints folder.
+        run_name (str): The name of the run (usually the command).
+        *run_inputs: What identifies the run (data folder, settings...). Runs with other inputs get another journal.
+        folder (Path): Where to keep the journal. Defaults to
+            `<personal_outputs_path>/checkpoints/<personality>`.
+
+    Returns:
+        RunJournal: The journal.
+    """
+    if folder is None:
+        name = str(getattr(personality, "personality_folder_name", None) or getattr(personality, "name", "personality"))
+        folder = Path(personality.lollms_paths.personal_outputs_path) / CHECKPOINTS_FOLDER_NAME / name
+    journal = RunJournal(Path(folder) / f"{run_name}_{input_hash(list(run_inputs))[:16]}{JOURNAL_SUFFIX}")
+    if journal.recovered:
+        ASCIIColors.info(f"Resuming {run_name}: {journal.recovered} units were already completed")
+    return journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists or deletes the journals of interrupted runs")
+    parser.add_argument("folder", type=Path, help=f"A {CHECKPOINTS_FOLDER_NAME} folder of the personal outputs, or the folder of one personality")
+    parser.add_argument("--clear", action="store_true", help="Delete the journals so that the runs start from scratch")
+    args = parser.parse_args()
+
+    journals = sorted(args.folder.rglob(f"*{JOURNAL_SUFFIX}"))
+    for journal_file in journals:
+        if args.clear:
+            journal_file.unlink()
+            continue
+        with open(journal_file, "r", encoding="utf8") as f:
+            nb_units = sum(1 for line in f if line.strip())
+        print(f"{nb_units:8d} units  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(journal_file.stat().st_mtime))}  {journal_file.relative_to(args.folder).as_posix()}")
+    if args.clear:
+        ASCIIColors.success(f"Deleted {len(journals)} journals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Deferred dependency handling
+
+Processors must import quickly and without side effects: mounting a
+personality should never shell out to pip. Each personality declares its
+python requirements in its `requirements.txt` file, they are only installed
+by `Processor.install()`, and the optional modules are imported lazily the
+first time they are actually used.
+
+Installed packages are resolved once per process from an `importlib.metadata`
+snapshot instead of calling pip.
+
+Usage in a processor:
+    import sys
+    from pathlib import Path
+    zoo_path = str(Path(__file__).resolve().parents[3])
+    if zoo_path not in sys.path:
+        sys.path.append(zoo_path)
+    from zoo_utilities.dependencies import lazy_import, install_requirements
+
+    feedparser = lazy_import("feedparser")
+
+    class Processor(APScript):
+        def install(self):
+            super().install()
+            install_requirements(self.personality.personality_package_path)
+"""
+import importlib
+import re
+import subprocess
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+REQUIREMENTS_FILE_NAME = "requirements.txt"
+
+_requirement_name = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+_requirement_egg = re.compile(r"#egg=([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a distribution name as described in PEP 503.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+@lru_cache(maxsize=1)
+def installed_distributions() -> dict:
+    """
+    Returns a snapshot of the installed distributions as {normalized name: version}.
+
+    The snapshot is computed once per process. Call `refresh_installed_distributions`
+    after installing packages.
+    """
+    import importlib.metadata
+
+    distributions = {}
+    for distribution in importlib.metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name:
+            distributions[normalize_name(name)] = distribution.version
+    return distributions
+
+
+def refresh_installed_distributions() -> None:
+    installed_distributions.cache_clear()
+    importlib.invalidate_caches()
+
+
+def is_installed(distribution_name: str) -> bool:
+    """
+    Checks if a distribution is installed without calling pip.
+
+    Args:
+        distribution_name (str): The pip name of the package (not the import name).
+    """
+    return normalize_name(distribution_name) in installed_distributions()
+
+
+def read_requirements(personality_path: Path) -> list:
+    """
+    Reads the distribution names declared in the requirements.txt of a personality.
+
+    Pip options, comments and blank lines are ignored. Version specifiers,
+    extras and environment markers are stripped and urls are resolved to
+    their `#egg=` name.
+
+    Args:
+        personality_path (Path): The personality folder.
+
+    Returns:
+        list: The declared distribution names.
+    """
+    requirements_file = Path(personality_path) / REQUIREMENTS_FILE_NAME
+    if not requirements_file.exists():
+        return []
+    names = []
+    with open(requirements_file, "r", encoding="utf8") as f:
+        for line in f:
+            line = line.split(" #")[0].strip()
+            if not line or line.startswith("-"):
+                continue
+            if "://" in line:
+                match = _requirement_egg.search(line)
+            else:
+                match = _requirement_name.match(line)
+            if match:
+                names.append(match.group(1))
+    return names
+
+
+def missing_requirements(personality_path: Path) -> list:
+    """
+    Returns the requirements of a personality that are not installed.
+    """
+    return [name for name in read_requirements(personality_path) if not is_installed(name)]
+
+
+def install_requirements(personality_path: Path, upgrade: bool = False, force: bool = False) -> bool:
+    """
+    Installs the requirements of a personality using pip. Meant to be called from `Processor.install()`.
+
+    Args:
+        personality_path (Path): The personality folder.
+        upgrade (bool): If True, installed requirements are upgraded too.
+        force (bool): If True, pip is called even if every requirement is already installed.
+
+    Returns:
+        bool: True if all requirements are installed.
+    """
+    requirements_file = Path(personality_path) / REQUIREMENTS_FILE_NAME
+    if not requirements_file.exists():
+        return True
+    if not force and not upgrade and not missing_requirements(personality_path):
+        return True
+    command = [sys.executable, "-m", "pip", "install", "-r", str(requirements_file)]
+    if upgrade:
+        command.append("--upgrade")
+    ASCIIColors.info(f"Installing requirements of {Path(personality_path).name}")
+    result = subprocess.run(command)
+    refresh_installed_distributions()
+    if result.returncode != 0:
+        ASCIIColors.error(f"Couldn't install the requirements of {Path(personality_path).name}")
+        return False
+    return True
+
+
+def install_packages(packages: list, index_url: str = None, force_reinstall: bool = False) -> bool:
+    """
+    Installs a list of packages using pip. Meant to be called from `Processor.install()`
+    for packages that can't be expressed in requirements.txt, like CUDA builds of torch.
+
+    Args:
+        packages (list): The pip names of the packages.
+        index_url (str): An optional index url to install the packages from.
+        force_reinstall (bool): If True, the packages are reinstalled even if present.
+
+    Returns:
+        bool: True if pip succeeded.
+    """
+    command = [sys.executable, "-m", "pip", "install", "--upgrade", *packages]
+    if index_url:
+        command += ["--index-url", index_url]
+    if force_reinstall:
+        command.append("--force-reinstall")
+    result = subprocess.run(command)
+    refresh_installed_distributions()
+    return result.returncode == 0
+
+
+class LazyModule:
+    """
+    A module proxy that only imports the real module when one of its attributes is used.
+
+    If the module is missing, the error raised at first use tells the user which
+    package to install instead of failing when the personality is mounted.
+    """
+
+    def __init__(self, module_name: str, package_name: str = None) -> None:
+        self.__dict__["_module_name"] = module_name
+        self.__dict__["_package_name"] = package_name or module_name.split(".")[0]
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    try:
+                        module = importlib.import_module(self._module_name)
+                    except ImportError as ex:
+                        raise ImportError(f"{self._module_name} is not installed. Please reinstall the personality or run: pip install {self._package_name}") from ex
+                    self.__dict__["_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self._module_name}' ({state})>"
+
+
+def lazy_import(module_name: str, package_name: str = None) -> LazyModule:
+    """
+    Returns a proxy that imports `module_name` on first attribute access.
+
+    Args:
+        module_name (str): The module to import, for example "docling.document_converter".
+        package_name (str): The pip package providing it, used in the error message when it is missing.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    return LazyModule(module_name, package_name)
@@ -0,0 +1,998 @@
+"""
+Document index
+
+An incremental vector index of the chunks of a set of files, for the
+personalities that chat with documents. Each file is recorded with its size,
+modification time and content hash. Syncing the index with a list of files
+only reads, chunks and embeds the files that are new or changed, and removes
+the chunks of the files that are gone, so adding the 30th document costs the
+same as adding the first.
+
+The index folder holds:
+    chunks.sqlite       the documents, the text and metadata of the chunks and the
+                        row of each chunk in the vector matrix
+    vectors_<n>.npy     the vectors (float32 or float16), opened memory mapped
+    vectors_<n>.log     the vectors added since the matrix was written, appended as raw rows
+    ivf.npz             the clusters of the approximate search, when it is enabled
+    tfidf.npz           the fitted vectorizer and the sparse chunk matrix, for corpus dependent
+                        vectorizers such as TF-IDF
+
+Opening an index reads no text and no vector: the matrix is mapped and the
+chunk texts are read from SQLite for the search results only. Removing a
+document deletes its rows from SQLite; its vectors stay in the matrix until a
+compaction writes the next generation of the matrix, when the dead rows or the
+log grow too large.
+
+The words of the chunks are also kept in an inverted index (the `postings`
+table), searched with BM25. Its terms keep digits, so that codes such as
+`E1234` or `ISO9001` are indexed whole. The `hybrid` search mode fuses the BM25 ranking
+with the vector ranking by reciprocal rank fusion, which finds the chunks
+holding rare keywords (names, codes...) that embeddings tend to miss.
+
+Vector searches are exact by default. With `ann_probes` set, an index of more than
+ANN_MIN_ROWS chunks is searched through an IVF index (see ann_index.py): a
+query is only compared with the chunks of the `ann_probes` closest clusters.
+
+Chunks are searched by cosine similarity. Their ids follow the
+`<document>_chunk_<n>` convention, so the processors can link the sources of
+an answer back to their documents.
+
+Usage in a processor:
+    from zoo_utilities.doc_index import DocumentIndex, ModelEmbeddings, pack_chunks
+
+    index = DocumentIndex(db_folder, ModelEmbeddings(self.personality.model), chunk_size=512,
+                          count_tokens=get_token_cache(self.personality.model).count, read_file=GenericDataLoader.read_file)
+    changes = index.sync(self.personality.text_files)
+    texts, similarities, document_ids = index.recover_text(query, top_k=3)
+    packed = pack_chunks(index.search_chunks(query, top_k=10), token_budget, count_tokens)
+
+Usage from the command line:
+    python -m zoo_utilities.doc_index DB_FOLDER [--compact]
+"""
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+from ascii_colors import ASCIIColors
+
+from zoo_utilities.ann_index import IVFIndex, default_list_count
+from zoo_utilities.text_clustering import STOP_WORDS
+
+DATABASE_FILE_NAME = "chunks.sqlite"
+ANN_FILE_NAME = "ivf.npz"
+TFIDF_FILE_NAME = "tfidf.npz"
+INDEX_FORMAT_VERSION = 2
+# Rows multiplied at once when scanning the matrix, to bound the memory used by float16 conversions
+SEARCH_BLOCK_ROWS = 16384
+# Queries compared with the matrix at once by `search_many`, to bound the size of the similarity matrix
+QUERY_BLOCK_ROWS = 64
+# The log is merged into the matrix once it holds more rows than the matrix, and at least this many
+MIN_COMPACTED_LOG_ROWS = 4096
+# Below this number of chunks an exact search is fast enough and no approximate index is built
+ANN_MIN_ROWS = 10000
+SEARCH_MODES = ("dense", "hybrid", "bm25")
+# BM25 parameters, and the constant and depth of the reciprocal rank fusion of the hybrid search
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# Version of the terms of the postings table, bumped when `keyword_terms` changes so that existing indexes are indexed again
+POSTINGS_VERSION = 2
+HYBRID_CANDIDATES = 50
+# Chunks plotted by `show_document`: larger indexes are plotted on a random sample
+PROJECTION_MAX_POINTS = 3000
+_KEYWORD = re.compile(r"[^\W_]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, chunks INTEGER);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY, row INTEGER UNIQUE, document_name TEXT,
+    chunk_index INTEGER, chunk_text TEXT, chunk_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_name);
+CREATE TABLE IF NOT EXISTS postings (term TEXT, row INTEGER, tf INTEGER, PRIMARY KEY (term, row)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunk_lengths (row INTEGER PRIMARY KEY, length INTEGER);
+"""
+
+
+def file_digest(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def keyword_terms(text: str) -> list:
+    """
+    Returns the lowercase terms of a text indexed for the keyword search: runs of letters and
+    digits, split on punctuation and underscores, without stop words. Unlike `text_terms`,
+    numbers and alphanumeric codes are kept ("X7-B" gives "x7" and "b").
+    """
+    return [term for term in _KEYWORD.findall(str(text).lower()) if term not in STOP_WORDS]
+
+
+def split_sentences(text: str) -> list:
+    """
+    Splits a text at the ends of its sentences and paragraphs.
+    """
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence and sentence.strip()]
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int = 0, count_tokens=None) -> list:
+    """
+    Packs the sentences of a text into chunks of at most `chunk_size` tokens.
+
+    Args:
+        text (str): The text.
+        chunk_size (int): Maximum number of tokens of a chunk.
+        overlap (int): Number of sentences repeated at the start of the next chunk.
+        count_tokens (callable): Counts the tokens of a text (defaults to counting words).
+
+    Returns:
+        list: The chunks.
+    """
+    count_tokens = count_tokens or (lambda value: len(value.split()))
+    sentences = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) <= chunk_size:
+            sentences.append(sentence)
+            continue
+        # Sentences longer than a chunk are cut by words
+        words = sentence.split()
+        step = max(1, chunk_size // 2)
+        sentences.extend(" ".join(words[start:start + step]) for start in range(0, len(words), step))
+    chunks = []
+    current = []
+    current_size = 0
+    for sentence in sentences:
+        size = count_tokens(sentence)
+        if current and current_size + size > chunk_size:
+            chunks.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+            current_size = sum(count_tokens(kept) for kept in current)
+            if current_size + size > chunk_size:
+                current, current_size = [], 0
+        current.append(sentence)
+        current_size += size
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class ModelEmbeddings:
+    """
+    Embeds texts with the `embed` function of a lollms binding.
+    """
+
+    def __init__(self, model) -> None:
+        self.model = model
+
+    def transform(self, texts: list) -> np.ndarray:
+        return np.array([self.model.embed(text) for text in texts], dtype=np.float32).reshape(len(texts), -1)
+
+
+def reciprocal_rank_fusion(rankings: list, top_k: int, k: int = RRF_K) -> tuple:
+    """
+    Fuses rankings of rows: each row scores the sum of 1 / (k + rank) over the rankings it is in.
+
+    Args:
+        rankings (list): (rows, scores) pairs, best first. Rows with equal scores share the same rank,
+            so that the order of ties (common with keyword scores) does not favour any of them.
+        top_k (int): The number of rows returned.
+        k (int): The fusion constant: larger values flatten the difference between the first ranks.
+
+    Returns:
+        tuple: The `top_k` best rows and their fused scores.
+    """
+    scores = {}
+    for rows, row_scores in rankings:
+        row_scores = np.asarray(row_scores)
+        # The rank of a row is the number of rows scoring strictly better
+        ranks = np.searchsorted(-row_scores, -row_scores, side="left")
+        for rank, row in zip(ranks, rows):
+            scores[int(row)] = scores.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    best = sorted(scores, key=lambda row: -scores[row])[:top_k]
+    return np.array(best, dtype=np.int64), np.array([scores[row] for row in best], dtype=np.float32)
+
+
+def pack_chunks(chunks: list, token_budget: int, count_tokens=None, chunk_overhead: int = 0) -> dict:
+    """
+    Fits search results in a token budget, to build a prompt that the backend will not truncate.
+
+    The chunks are taken best first while they fit, using their cached token counts. The sentences
+    already taken from a better chunk (the overlap between neighbour chunks) are not repeated, and the
+    chunks that follow each other in a document are merged into one passage.
+
+    Args:
+        chunks (list): The chunks, best first, as returned by `search_chunks`.
+        token_budget (int): The maximum number of tokens of the passages.
+        count_tokens (callable): Counts the tokens of the chunks whose sentences were deduplicated
+            (defaults to counting words).
+        chunk_overhead (int): Tokens added to the prompt by each chunk (its header).
+
+    Returns:
+        dict: "passages" (dicts with document_name, chunk_ids, text, tokens and similarity, the best
+        passage first), "tokens" (the tokens used), "dropped" (the ids of the chunks that didn't fit),
+        "redundant" (the ids of the chunks whose sentences were all taken already) and "deduplicated"
+        (the number of repeated sentences removed).
+    """
+    count_tokens = count_tokens or (lambda value: len(value.split()))
+    seen = set()
+    kept = []
+    dropped = []
+    redundant = []
+    deduplicated = 0
+    used = 0
+    for chunk in chunks:
+        sentences = split_sentences(chunk["chunk_text"])
+        new_sentences = [sentence for sentence in sentences if sentence not in seen]
+        if not new_sentences:
+            redundant.append(chunk["chunk_id"])
+            continue
+        text = " ".join(new_sentences)
+        if len(new_sentences) == len(sentences) and chunk.get("chunk_tokens") is not None:
+            tokens = chunk["chunk_tokens"]
+        else:
+            tokens = count_tokens(text)
+        if used + tokens + chunk_overhead > token_budget:
+            dropped.append(chunk["chunk_id"])
+            continue
+        used += tokens + chunk_overhead
+        deduplicated += len(sentences) - len(new_sentences)
+        seen.update(new_sentences)
+        kept.append(dict(chunk, chunk_text=text, chunk_tokens=tokens, rank=len(kept)))
+
+    passages = []
+    for chunk in sorted(kept, key=lambda chunk: (chunk["document_name"], chunk["chunk_index"])):
+        previous = passages[-1] if passages else None
+        if previous is not None and previous["document_name"] == chunk["document_name"] and previous["last_index"] + 1 == chunk["chunk_index"]:
+            previous["chunk_ids"].append(chunk["chunk_id"])
+            previous["text"] += " " + chunk["chunk_text"]
+            previous["tokens"] += chunk["chunk_tokens"]
+            previous["similarity"] = max(previous["similarity"], chunk.get("similarity", 0.0))
+            previous["rank"] = min(previous["rank"], chunk["rank"])
+            previous["last_index"] = chunk["chunk_index"]
+            continue
+        passages.append({
+            "document_name": chunk["document_name"],
+            "chunk_ids": [chunk["chunk_id"]],
+            "text": chunk["chunk_text"],
+            "tokens": chunk["chunk_tokens"],
+            "similarity": chunk.get("similarity", 0.0),
+            "rank": chunk["rank"],
+            "last_index": chunk["chunk_index"],
+        })
+    passages.sort(key=lambda passage: passage["rank"])
+    for passage in passages:
+        del passage["rank"], passage["last_index"]
+    return {"passages": passages, "tokens": used, "dropped": dropped, "redundant": redundant, "deduplicated": deduplicated}
+
+
+class DocumentIndex:
+    """
+    The chunks of a set of documents and their vectors.
+
+    Args:
+        folder (Path): Where the index is saved (None keeps it in memory only).
+        vectorizer: Turns texts into vectors with `transform(texts)`. If it also has a `fit(texts)`
+            method, its vectors depend on the whole corpus: the vectorizer is fitted on the stored chunk
+            texts (without reading or chunking the files) by the first search after the corpus changed.
+            If it has `transform_sparse`, `state` and `load_state` methods like `TfidfModel`, the fitted
+            vectorizer and the sparse chunk matrix are saved, and reused until the corpus changes.
+        chunk_size (int): Maximum number of tokens of a chunk.
+        overlap (int): Number of sentences shared by consecutive chunks.
+        count_tokens (callable): Counts the tokens of a text.
+        read_file (callable): Returns the text of a file (defaults to reading it as UTF-8).
+        dtype (str): "float32" or "float16", the type of the stored vectors (defaults to the one of
+            the existing index, or float32). float16 halves the size of the matrix. Changing it
+            converts the stored vectors.
+        ann_probes (int): Number of clusters read by the approximate search (0 for an exact search).
+            More probes find more of the exact results, and take more time.
+        ann_lists (int): Number of clusters of the approximate search (0 for the square root of the chunks).
+        search_mode (str): "dense" ranks the chunks by vector similarity, "bm25" by keywords, and "hybrid"
+            fuses both rankings by reciprocal rank fusion.
+    """
+
+    def __init__(self, folder: Path, vectorizer, chunk_size: int = 512, overlap: int = 1, count_tokens=None, read_file=None, dtype: str = None, ann_probes: int = 0, ann_lists: int = 0, search_mode: str = "dense") -> None:
+        self.folder = Path(folder) if folder is not None else None
+        self.vectorizer = vectorizer
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.count_tokens = count_tokens
+        self.read_file = read_file or (lambda path: Path(path).read_text(encoding="utf8", errors="replace"))
+        self.requested_dtype = dtype
+        self.ann_probes = ann_probes
+        self.ann_lists = ann_lists
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {search_mode}, expected one of {', '.join(SEARCH_MODES)}")
+        self.search_mode = search_mode
+        self.dtype = np.dtype(dtype or "float32")
+        self.documents = {}
+        self._lock = threading.RLock()
+        self._connection = None
+        self._meta = {}
+        self._base = None
+        self._log = None
+        self._live = np.zeros(0, dtype=bool)
+        self._fitted = None
+        self._ann = None
+        self._lengths = None
+        self._projection = None
+        self.load()
+
+    @property
+    def corpus_dependent(self) -> bool:
+        return callable(getattr(self.vectorizer, "fit", None))
+
+    @property
+    def chunk_count(self) -> int:
+        return int(self._live.sum())
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._live.any())
+
+    def _matrix_path(self, generation: int) -> Path:
+        return self.folder / f"vectors_{generation}.npy"
+
+    def _log_path(self, generation: int) -> Path:
+        return self.folder / f"vectors_{generation}.log"
+
+    def _set_meta(self, **values) -> None:
+        self._meta.update(values)
+        self._connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(key, str(value)) for key, value in values.items()])
+
+    def load(self) -> None:
+        """
+        Opens the index: reads the list of documents and maps the vectors. No chunk text is read.
+        """
+        with self._lock:
+            self.close()
+            if self.folder is not None:
+                self.folder.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.folder / DATABASE_FILE_NAME) if self.folder is not None else ":memory:", check_same_thread=False)
+            self._connection.executescript(_SCHEMA)
+            stored = dict(self._connection.execute("SELECT key, value FROM meta"))
+            if stored and stored.get("version") != str(INDEX_FORMAT_VERSION):
+                ASCIIColors.warning(f"The index in {self.folder} has an old format, it will be rebuilt")
+                self._connection.executescript("DELETE FROM chunks; DELETE FROM documents; DELETE FROM meta; DELETE FROM postings; DELETE FROM chunk_lengths;")
+                stored = {}
+            self._meta = {key: int(stored.get(key, 0)) for key in ("generation", "base_rows", "log_rows", "next_row", "dimensions", "corpus_version")}
+            self._meta["dtype"] = stored.get("dtype", self.dtype.name)
+            self._meta["corpus_dependent"] = stored.get("corpus_dependent", str(int(self.corpus_dependent)))
+            self._set_meta(version=INDEX_FORMAT_VERSION, **self._meta)
+            self._connection.commit()
+            self.documents = {name: {"size": size, "mtime_ns": mtime_ns, "sha256": sha256, "chunks": chunks} for name, size, mtime_ns, sha256, chunks in self._connection.execute("SELECT name, size, mtime_ns, sha256, chunks FROM documents")}
+            rows = np.fromiter((row for (row,) in self._connection.execute("SELECT row FROM chunks")), dtype=np.int64)
+            self._live = np.zeros(self._meta["next_row"], dtype=bool)
+            self._live[rows] = True
+            self._fitted = None
+            self._ann = None
+            self._lengths = None
+            if stored.get("postings") != str(POSTINGS_VERSION):
+                self._build_postings()
+            try:
+                self._open_vectors()
+            except (OSError, ValueError) as ex:
+                ASCIIColors.warning(f"Couldn't open the vectors in {self.folder}, the index will be rebuilt: {ex}")
+                self.clear_database()
+                return
+            if self.vectorizer is not None and self._meta["corpus_dependent"] != str(int(self.corpus_dependent)):
+                ASCIIColors.warning(f"The index in {self.folder} was built with another vectorizer, it will be rebuilt")
+                self.clear_database()
+                return
+            self.dtype = np.dtype(self.requested_dtype or self._meta["dtype"])
+            if self.dtype.name != self._meta["dtype"]:
+                self.compact()
+            self._load_ann()
+
+    def close(self) -> None:
+        with self._lock:
+            self._base = None
+            self._log = None
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _open_vectors(self) -> None:
+        if self.folder is None:
+            return
+        self._base = None
+        self._log = None
+        generation = self._meta["generation"]
+        if self._meta["base_rows"]:
+            self._base = np.load(self._matrix_path(generation), mmap_mode="r")
+        if self._meta["log_rows"]:
+            self._log = np.memmap(self._log_path(generation), dtype=self._meta["dtype"], mode="r", shape=(self._meta["log_rows"], self._meta["dimensions"]))
+
+    def _append_vectors(self, vectors: np.ndarray) -> None:
+        # The rows are written before the SQLite transaction that counts them is committed:
+        # after an interruption, the bytes past the counted rows are ignored and overwritten
+        stored_rows = self._meta["base_rows"] + self._meta["log_rows"]
+        if stored_rows and vectors.shape[1] != self._meta["dimensions"]:
+            raise ValueError(f"The index holds vectors of {self._meta['dimensions']} dimensions and the vectorizer gives {vectors.shape[1]}: clear the database after changing the vectorizer")
+        if self._ann is not None:
+            self._ann.add(vectors)
+        vectors = np.ascontiguousarray(vectors, dtype=self._meta["dtype"])
+        if self.folder is None:
+            self._log = vectors if self._log is None else np.vstack([self._log, vectors])
+        else:
+            self._log = None
+            path = self._log_path(self._meta["generation"])
+            with open(path, "r+b" if path.exists() else "wb") as f:
+                f.truncate(self._meta["log_rows"] * vectors.shape[1] * vectors.itemsize)
+                f.seek(0, 2)
+                f.write(vectors.tobytes())
+        self._set_meta(log_rows=self._meta["log_rows"] + len(vectors), dimensions=vectors.shape[1])
+
+    def _rows_vectors(self, rows: np.ndarray) -> np.ndarray:
+        base_rows = self._meta["base_rows"]
+        vectors = np.empty((len(rows), self._meta["dimensions"]), dtype=np.float32)
+        in_base = rows < base_rows
+        if in_base.any():
+            vectors[in_base] = self._base[rows[in_base]]
+        if not in_base.all():
+            vectors[~in_base] = self._log[rows[~in_base] - base_rows]
+        return vectors
+
+    def _normalized(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _ensure_fitted(self) -> None:
+        # A corpus dependent vectorizer is fitted by the first search after the corpus changed,
+        # or loaded from the file saved by the last fit if the corpus did not change since
+        if self.corpus_dependent and self._fitted is None and not self._load_fitted():
+            self._refit()
+            self._save_fitted()
+
+    def _refit(self) -> None:
+        rows_texts = self._connection.execute("SELECT row, chunk_text FROM chunks ORDER BY row").fetchall()
+        texts = [text for _, text in rows_texts]
+        if texts:
+            self.vectorizer.fit(texts)
+        if callable(getattr(self.vectorizer, "transform_sparse", None)):
+            data, indices, indptr = self.vectorizer.transform_sparse(texts)
+        else:
+            vectors = self._normalized(self.vectorizer.transform(texts)) if texts else np.zeros((0, 0), dtype=np.float32)
+            value_rows, indices = np.nonzero(vectors)
+            data = vectors[value_rows, indices]
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(value_rows, minlength=len(texts)))])
+        self._set_fitted(np.array([row for row, _ in rows_texts], dtype=np.int64), data, indices, indptr)
+
+    def _set_fitted(self, rows: np.ndarray, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray) -> None:
+        # The chunk vectors of a corpus dependent vectorizer are kept as a CSR matrix
+        self._fitted = {
+            "rows": rows, "data": np.asarray(data, dtype=np.float32), "indices": np.asarray(indices, dtype=np.int64), "indptr": indptr,
+            "value_rows": np.repeat(np.arange(len(rows)), np.diff(indptr)),
+        }
+
+    def _save_fitted(self) -> None:
+        if self.folder is None or not callable(getattr(self.vectorizer, "state", None)):
+            return
+        state = {f"vectorizer_{key}": value for key, value in self.vectorizer.state().items()}
+        path = self.folder / TFIDF_FILE_NAME
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            np.savez(f, corpus_version=self._meta["corpus_version"], rows=self._fitted["rows"], data=self._fitted["data"], indices=self._fitted["indices"], indptr=self._fitted["indptr"], **state)
+        temporary.replace(path)
+
+    def _load_fitted(self) -> bool:
+        path = self.folder / TFIDF_FILE_NAME if self.folder is not None else None
+        if path is None or not path.exists() or not callable(getattr(self.vectorizer, "load_state", None)):
+            return False
+        try:
+            with np.load(path) as data:
+                if int(data["corpus_version"]) != self._meta["corpus_version"]:
+                    return False
+                self.vectorizer.load_state({key[len("vectorizer_"):]: data[key] for key in data.files if key.startswith("vectorizer_")})
+                self._set_fitted(data["rows"], data["data"], data["indices"], data["indptr"])
+        except (OSError, ValueError, KeyError) as ex:
+            ASCIIColors.warning(f"Couldn't load {path}, the vectorizer will be fitted again: {ex}")
+            return False
+        return True
+
+    def _live_vectors(self, max_rows: int = None, seed: int = 0):
+        # Returns the rows of the live chunks, or of a random sample of `max_rows` of them, and their vectors
+        self._ensure_fitted()
+        rng = np.random.default_rng(seed)
+        if self.corpus_dependent:
+            fitted = self._fitted
+            selected = np.arange(len(fitted["rows"]))
+            if max_rows is not None and len(selected) > max_rows:
+                selected = np.sort(rng.choice(selected, max_rows, replace=False))
+            columns = int(fitted["indices"].max()) + 1 if len(fitted["indices"]) else 1
+            vectors = np.zeros((len(selected), columns), dtype=np.float32)
+            for position, index in enumerate(selected):
+                start, end = fitted["indptr"][index], fitted["indptr"][index + 1]
+                vectors[position, fitted["indices"][start:end]] = fitted["data"][start:end]
+            return fitted["rows"][selected], vectors
+        rows = np.flatnonzero(self._live)
+        if max_rows is not None and len(rows) > max_rows:
+            rows = np.sort(rng.choice(rows, max_rows, replace=False))
+        return rows, self._rows_vectors(rows)
+
+    def _scores(self, query_vectors: np.ndarray):
+        # Returns the rows of the candidate chunks and their similarities with each query (-inf for removed chunks)
+        if self.corpus_dependent:
+            fitted = self._fitted
+            similarities = [np.bincount(fitted["value_rows"], weights=fitted["data"] * query_vector[fitted["indices"]], minlength=len(fitted["rows"])) for query_vector in query_vectors]
+            return fitted["rows"], np.array(similarities, dtype=np.float32).reshape(len(query_vectors), len(fitted["rows"]))
+        if query_vectors.shape[1] != self._meta["dimensions"]:
+            raise ValueError(f"The index holds vectors of {self._meta['dimensions']} dimensions and the vectorizer gives {query_vectors.shape[1]}: clear the database after changing the vectorizer")
+        blocks = []
+        for part in (self._base, self._log):
+            if part is None:
+                continue
+            for start in range(0, len(part), SEARCH_BLOCK_ROWS):
+                blocks.append(query_vectors @ np.asarray(part[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32).T)
+        similarities = np.concatenate(blocks, axis=1)
+        similarities[:, ~self._live] = -np.inf
+        return np.arange(len(self._live)), similarities
+
+    def _top_rows(self, query_vectors: np.ndarray, top_k: int) -> list:
+        # Returns the rows of the `top_k` closest live chunks of each query and their similarities, best first
+        if self.ann_enabled and self._ann is None:
+            self._update_ann()
+        results = []
+        if self.ann_enabled and len(self._ann.assignments) == len(self._live):
+            for query_vector, rows in zip(query_vectors, self._ann.probe(query_vectors, self.ann_probes)):
+                rows = rows[self._live[rows]]
+                if len(rows) < top_k:
+                    break
+                similarities = self._rows_vectors(rows) @ query_vector
+                best = np.argpartition(-similarities, top_k - 1)[:top_k]
+                best = best[np.argsort(-similarities[best], kind="stable")]
+                results.append((rows[best], similarities[best]))
+            else:
+                return results
+            # Too few chunks in the probed clusters: the search is done exactly
+            results = []
+        rows, similarities = self._scores(query_vectors)
+        top_k = min(top_k, self.chunk_count)
+        for query_similarities in similarities:
+            best = np.argpartition(-query_similarities, top_k - 1)[:top_k]
+            best = best[np.argsort(-query_similarities[best], kind="stable")]
+            results.append((rows[best], query_similarities[best]))
+        return results
+
+    def _chunks_at_rows(self, rows) -> list:
+        rows = [int(row) for row in rows]
+        found = {}
+        for start in range(0, len(rows), 500):
+            part = rows[start:start + 500]
+            query = f"SELECT row, chunk_id, document_name, chunk_index, chunk_text, chunk_tokens FROM chunks WHERE row IN ({','.join('?' * len(part))})"
+            for row, chunk_id, document_name, chunk_index, text, tokens in self._connection.execute(query, part):
+                found[row] = {"chunk_id": chunk_id, "document_name": document_name, "chunk_index": chunk_index, "chunk_text": text, "chunk_tokens": tokens}
+        return [found[row] for row in rows]
+
+    def get_chunks(self, chunk_ids: list) -> list:
+        """
+        Returns the chunks with the given ids (dicts with chunk_id, document_name, chunk_index, chunk_text and chunk_tokens).
+        """
+        with self._lock:
+            rows = []
+            for chunk_id in chunk_ids:
+                row = self._connection.execute("SELECT row FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row is None:
+                    raise KeyError(chunk_id)
+                rows.append(row[0])
+            return self._chunks_at_rows(rows)
+
+    def document_changed(self, path: Path) -> bool:
+        """
+        Returns True if a file is not indexed or differs from its indexed version.
+        """
+        entry = self.documents.get(str(path))
+        if entry is None:
+            return True
+        stat = Path(path).stat()
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return False
+        if entry["sha256"] == file_digest(path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            with self._lock:
+                self._connection.execute("UPDATE documents SET mtime_ns = ? WHERE name = ?", (stat.st_mtime_ns, str(path)))
+                self._connection.commit()
+            return False
+        return True
+
+    def _add_postings(self, rows_texts: list) -> None:
+        postings = []
+        lengths = []
+        for row, text in rows_texts:
+            terms = keyword_terms(text)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            postings.extend((term, row, count) for term, count in counts.items())
+            lengths.append((row, len(terms)))
+        self._connection.executemany("INSERT OR REPLACE INTO postings (term, row, tf) VALUES (?, ?, ?)", postings)
+        self._connection.executemany("INSERT OR REPLACE INTO chunk_lengths (row, length) VALUES (?, ?)", lengths)
+
+    def _build_postings(self) -> None:
+        # Indexes the words of the chunks of an index made before the keyword search existed, or with other terms
+        self._connection.executescript("DELETE FROM postings; DELETE FROM chunk_lengths;")
+        cursor = self._connection.execute("SELECT row, chunk_text FROM chunks")
+        for rows_texts in iter(lambda: cursor.fetchmany(1000), []):
+            self._add_postings(rows_texts)
+        self._set_meta(postings=POSTINGS_VERSION)
+        self._connection.commit()
+
+    def _bm25_top_rows(self, query: str, top_k: int) -> tuple:
+        # Returns the rows of the `top_k` live chunks that best match the words of a query and their BM25 scores
+        if self._lengths is None:
+            self._lengths = np.zeros(len(self._live), dtype=np.float32)
+            for row, length in self._connection.execute("SELECT row, length FROM chunk_lengths"):
+                self._lengths[row] = length
+        n_chunks = self.chunk_count
+        average_length = float(self._lengths[self._live].mean()) or 1.0
+        scores = np.zeros(len(self._live), dtype=np.float32)
+        for term in set(keyword_terms(query)):
+            postings = np.array(self._connection.execute("SELECT row, tf FROM postings WHERE term = ?", (term,)).fetchall(), dtype=np.int64).reshape(-1, 2)
+            postings = postings[self._live[postings[:, 0]]]
+            if len(postings) == 0:
+                continue
+            rows, frequencies = postings[:, 0], postings[:, 1].astype(np.float32)
+            idf = np.log(1 + (n_chunks - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[rows] / average_length))
+        matches = np.flatnonzero(scores)
+        best = matches[np.argsort(-scores[matches], kind="stable")[:top_k]]
+        return best, scores[best]
+
+    def _add_chunks(self, path: Path) -> None:
+        stat = path.stat()
+        digest = file_digest(path)
+        text = self.read_file(path)
+        pieces = chunk_text(text, self.chunk_size, self.overlap, self.count_tokens)
+        first_row = self._meta["next_row"]
+        if not self.corpus_dependent and pieces:
+            self._append_vectors(self._normalized(self.vectorizer.transform(pieces)))
+        self._connection.executemany(
+            "INSERT INTO chunks (chunk_id, row, document_name, chunk_index, chunk_text, chunk_tokens) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (f"{path}_chunk_{index + 1}", first_row + index, str(path), index, piece, self.count_tokens(piece) if self.count_tokens else len(piece.split()))
+                for index, piece in enumerate(pieces)
+            ],
+        )
+        self._add_postings([(first_row + index, piece) for index, piece in enumerate(pieces)])
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest, "chunks": len(pieces)}
+        self._connection.execute("INSERT OR REPLACE INTO documents (name, size, mtime_ns, sha256, chunks) VALUES (?, ?, ?, ?, ?)", (str(path), entry["size"], entry["mtime_ns"], entry["sha256"], entry["chunks"]))
+        self._set_meta(next_row=first_row + len(pieces), corpus_version=self._meta["corpus_version"] + 1)
+        self._connection.commit()
+        self._open_vectors()
+        self.documents[str(path)] = entry
+        self._live = np.concatenate([self._live, np.ones(len(pieces), dtype=bool)])
+        self._fitted = None
+        self._lengths = None
+
+    def remove_document(self, path) -> int:
+        """
+        Removes the chunks of a document. Returns the number of removed chunks.
+        """
+        name = str(path)
+        with self._lock:
+            if self.documents.pop(name, None) is None:
+                return 0
+            rows_texts = self._connection.execute("SELECT row, chunk_text FROM chunks WHERE document_name = ?", (name,)).fetchall()
+            rows = [row for row, _ in rows_texts]
+            self._connection.executemany("DELETE FROM postings WHERE term = ? AND row = ?", [(term, row) for row, text in rows_texts for term in set(keyword_terms(text))])
+            self._connection.executemany("DELETE FROM chunk_lengths WHERE row = ?", [(row,) for row in rows])
+            self._connection.execute("DELETE FROM chunks WHERE document_name = ?", (name,))
+            self._connection.execute("DELETE FROM documents WHERE name = ?", (name,))
+            self._set_meta(corpus_version=self._meta["corpus_version"] + 1)
+            self._connection.commit()
+            self._live[rows] = False
+            self._fitted = None
+            self._lengths = None
+            return len(rows)
+
+    def compact(self) -> None:
+        """
+        Writes the vectors of the live chunks in a new matrix, in `dtype`, and numbers the chunks again from 0.
+        """
+        with self._lock:
+            old_rows = np.flatnonzero(self._live)
+            old_generation = self._meta["generation"]
+            generation = old_generation + 1
+            has_vectors = not self.corpus_dependent and self._meta["base_rows"] + self._meta["log_rows"] > 0
+            base_rows = len(old_rows) if has_vectors else 0
+            if has_vectors and self.folder is not None:
+                temporary = self.folder / f"vectors_{generation}.tmp.npy"
+                matrix = np.lib.format.open_memmap(temporary, mode="w+", dtype=self.dtype, shape=(len(old_rows), self._meta["dimensions"]))
+                for start in range(0, len(old_rows), SEARCH_BLOCK_ROWS):
+                    matrix[start:start + SEARCH_BLOCK_ROWS] = self._rows_vectors(old_rows[start:start + SEARCH_BLOCK_ROWS])
+                matrix.flush()
+                del matrix
+                temporary.replace(self._matrix_path(generation))
+            elif has_vectors:
+                self._base = self._rows_vectors(old_rows).astype(self.dtype)
+                self._log = None
+            # Negative rows first, so that the new numbers never collide with the old ones
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS renumbering (old INTEGER PRIMARY KEY, new INTEGER)")
+            self._connection.execute("DELETE FROM renumbering")
+            self._connection.executemany("INSERT INTO renumbering (old, new) VALUES (?, ?)", [(int(old_row), new_row) for new_row, old_row in enumerate(old_rows)])
+            for table in ("chunks", "postings", "chunk_lengths"):
+                self._connection.execute(f"UPDATE {table} SET row = -1 - (SELECT new FROM renumbering WHERE old = {table}.row)")
+                self._connection.execute(f"UPDATE {table} SET row = -1 - row")
+            self._set_meta(generation=generation, base_rows=base_rows, log_rows=0, next_row=len(old_rows), dtype=self.dtype.name, corpus_version=self._meta["corpus_version"] + 1)
+            self._connection.commit()
+            self._live = np.ones(len(old_rows), dtype=bool)
+            self._fitted = None
+            self._lengths = None
+            if self._ann is not None:
+                self._ann.remap(old_rows)
+                self._save_ann()
+            if self.folder is not None:
+                self._open_vectors()
+                for old_file in (self._matrix_path(old_generation), self._log_path(old_generation)):
+                    try:
+                        old_file.unlink()
+                    except OSError:
+                        pass
+
+    def _compact_if_needed(self) -> None:
+        # Compacting costs a rewrite of the matrix: it is done once the dead rows are a quarter of the
+        # matrix or the log is larger than the matrix, which keeps the cost per added chunk constant
+        total_rows = len(self._live)
+        dead_rows = total_rows - self.chunk_count
+        if dead_rows > total_rows // 4 or self._meta["log_rows"] > max(self._meta["base_rows"], MIN_COMPACTED_LOG_ROWS):
+            self.compact()
+
+    @property
+    def ann_enabled(self) -> bool:
+        return bool(self.ann_probes) and not self.corpus_dependent and self.chunk_count >= ANN_MIN_ROWS
+
+    def _save_ann(self) -> None:
+        if self.folder is not None:
+            self._ann.save(self.folder / ANN_FILE_NAME, generation=self._meta["generation"])
+
+    def _load_ann(self) -> None:
+        # The saved clusters are used if they belong to the current matrix, the rows appended since are assigned
+        if not self.ann_enabled or self.folder is None or not (self.folder / ANN_FILE_NAME).exists():
+            return
+        ann, extra = IVFIndex.load(self.folder / ANN_FILE_NAME)
+        if ann is None or extra.get("generation") != self._meta["generation"] or len(ann.assignments) > len(self._live):
+            return
+        if len(ann.assignments) < len(self._live):
+            ann.add(self._rows_vectors(np.arange(len(ann.assignments), len(self._live))))
+        self._ann = ann
+
+    def _update_ann(self) -> None:
+        # The clusters are trained again when the corpus doubled since they were trained
+        if not self.ann_enabled:
+            return
+        if self._ann is None or self.chunk_count > 2 * self._ann.trained_rows:
+            n_lists = self.ann_lists or default_list_count(self.chunk_count)
+            live_rows = np.flatnonzero(self._live)
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(live_rows, min(len(live_rows), n_lists * 64), replace=False))
+            ann = IVFIndex()
+            ann.train(self._rows_vectors(sample), n_lists)
+            ann.trained_rows = self.chunk_count
+            for start in range(0, len(self._live), SEARCH_BLOCK_ROWS):
+                ann.add(self._rows_vectors(np.arange(start, min(start + SEARCH_BLOCK_ROWS, len(self._live)))))
+            self._ann = ann
+        self._save_ann()
+
+    def sync(self, files: list, on_progress=None) -> dict:
+        """
+        Makes the index hold exactly the given files, processing only what changed.
+
+        Args:
+            files (list): The paths of the documents.
+            on_progress (callable): Called with (path, status) for each new or changed file.
+
+        Returns:
+            dict: The lists of "added", "updated", "removed" and "unchanged" paths.
+        """
+        changes = {"added": [], "updated": [], "removed": [], "unchanged": []}
+        paths = [Path(file) for file in files]
+        wanted = {str(path) for path in paths}
+        with self._lock:
+            for name in [name for name in self.documents if name not in wanted]:
+                self.remove_document(name)
+                changes["removed"].append(name)
+            for path in paths:
+                if not path.exists():
+                    continue
+                if not self.document_changed(path):
+                    changes["unchanged"].append(str(path))
+                    continue
+                status = "updated" if str(path) in self.documents else "added"
+                self.remove_document(path)
+                if on_progress is not None:
+                    on_progress(path, status)
+                self._add_chunks(path)
+                changes[status].append(str(path))
+            if changes["added"] or changes["updated"] or changes["removed"]:
+                self._compact_if_needed()
+                self._update_ann()
+        return changes
+
+    def clear_database(self) -> None:
+        with self._lock:
+            old_generation = self._meta["generation"]
+            self._base = None
+            self._log = None
+            self._connection.executescript("DELETE FROM chunks; DELETE FROM documents; DELETE FROM postings; DELETE FROM chunk_lengths;")
+            self._set_meta(generation=old_generation + 1, base_rows=0, log_rows=0, next_row=0, dimensions=0, dtype=self.dtype.name, corpus_dependent=str(int(self.corpus_dependent)), corpus_version=self._meta["corpus_version"] + 1)
+            self._connection.commit()
+            self.documents = {}
+            self._live = np.zeros(0, dtype=bool)
+            self._fitted = None
+            self._ann = None
+            self._lengths = None
+            if self.folder is not None:
+                for old_file in (self._matrix_path(old_generation), self._log_path(old_generation), self.folder / ANN_FILE_NAME, self.folder / TFIDF_FILE_NAME, *self.folder.glob("projection_*.npz")):
+                    try:
+                        old_file.unlink()
+                    except OSError:
+                        pass
+
+    def search_chunks(self, query: str, top_k: int = 3) -> list:
+        """
+        Returns the `top_k` chunks closest to a query, best first, with their `similarity` (see `search_many`).
+        """
+        return self.search_many([query], top_k)[0]
+
+    def search_many(self, queries: list, top_k: int = 3) -> list:
+        """
+        Searches several queries at once: they are vectorized by one call of the vectorizer and compared
+        with the chunks by matrix products. A chunk found by several queries is read once.
+
+        The `similarity` of the chunks is their cosine similarity in the "dense" search mode, their BM25
+        score in the "bm25" mode and their reciprocal rank fusion score in the "hybrid" mode.
+
+        Returns:
+            list: The chunks of each query, as returned by `search_chunks`.
+        """
+        with self._lock:
+            self._ensure_fitted()
+            if not self.ready or not queries:
+                return [[] for _ in queries]
+            depth = top_k if self.search_mode == "dense" else max(top_k, HYBRID_CANDIDATES)
+            if self.search_mode != "bm25":
+                query_vectors = self._normalized(self.vectorizer.transform(list(queries)))
+                results = []
+                for start in range(0, len(query_vectors), QUERY_BLOCK_ROWS):
+                    results.extend(self._top_rows(query_vectors[start:start + QUERY_BLOCK_ROWS], depth))
+            if self.search_mode != "dense":
+                keyword_results = [self._bm25_top_rows(query, depth) for query in queries]
+                if self.search_mode == "bm25":
+                    results = [(rows[:top_k], scores[:top_k]) for rows, scores in keyword_results]
+                else:
+                    results = [reciprocal_rank_fusion([dense, keyword], top_k) for dense, keyword in zip(results, keyword_results)]
+            unique_rows = np.unique(np.concatenate([rows for rows, _ in results])).astype(np.int64)
+            chunks = dict(zip(unique_rows.tolist(), self._chunks_at_rows(unique_rows)))
+        return [[dict(chunks[int(row)], similarity=float(similarity)) for row, similarity in zip(rows, similarities)] for rows, similarities in results]
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """
+        Returns the ids and cosine similarities of the `top_k` chunks closest to a query, best first.
+        """
+        return [(chunk["chunk_id"], chunk["similarity"]) for chunk in self.search_chunks(query, top_k)]
+
+    def recover_text(self, query: str, top_k: int = 3):
+        """
+        Returns the texts of the chunks closest to a query, their [chunk id, similarity] pairs and their document names.
+        """
+        chunks = self.search_chunks(query, top_k)
+        texts = [chunk["chunk_text"] for chunk in chunks]
+        similarities = [[chunk["chunk_id"], chunk["similarity"]] for chunk in chunks]
+        document_ids = [chunk["document_name"] for chunk in chunks]
+        return texts, similarities, document_ids
+
+    @property
+    def corpus_version(self) -> int:
+        """
+        A number that changes every time chunks are added or removed.
+        """
+        return self._meta["corpus_version"]
+
+    def projection(self, method: str = "PCA", max_points: int = PROJECTION_MAX_POINTS) -> dict:
+        """
+        Returns two dimensional coordinates of the chunks, to plot them.
+
+        Large indexes are projected on a random sample of `max_points` chunks, so the cost does not
+        grow with the index. TSNE runs on the 50 first principal components of the sample. The result
+        is kept, in memory and in the index folder, until the corpus changes.
+
+        Returns:
+            dict: "rows", "points" (an array of (x, y) rows) and "documents" (the document of each point).
+        """
+        key = [method, max_points, self.corpus_version]
+        path = self.folder / f"projection_{method}.npz" if self.folder is not None else None
+        with self._lock:
+            if self._projection is not None and self._projection["key"] == key:
+                return self._projection
+            if path is not None and path.exists():
+                try:
+                    with np.load(path) as data:
+                        if [str(data["method"]), int(data["max_points"]), int(data["corpus_version"])] == key:
+                            self._projection = {"key": key, "rows": data["rows"], "points": data["points"], "documents": [str(name) for name in data["documents"]]}
+                            return self._projection
+                except (OSError, ValueError, KeyError):
+                    pass
+            rows, vectors = self._live_vectors(max_points)
+            row_documents = {}
+            for start in range(0, len(rows), 500):
+                part = [int(row) for row in rows[start:start + 500]]
+                row_documents.update(self._connection.execute(f"SELECT row, document_name FROM chunks WHERE row IN ({','.join('?' * len(part))})", part))
+        documents = [row_documents[int(row)] for row in rows]
+        if len(rows) < 2:
+            points = np.zeros((len(rows), 2), dtype=np.float32)
+        else:
+            vectors = vectors - vectors.mean(axis=0)
+            _, _, components = np.linalg.svd(vectors, full_matrices=False)
+            if method == "TSNE":
+                from sklearn.manifold import TSNE
+                reduced = vectors @ components[:50].T
+                points = TSNE(n_components=2, perplexity=min(30, len(reduced) - 1), init="pca").fit_transform(reduced)
+            else:
+                points = vectors @ components[:2].T
+                if points.shape[1] < 2:
+                    points = np.hstack([points, np.zeros((len(points), 2 - points.shape[1]), dtype=points.dtype)])
+        projection = {"key": key, "rows": rows, "points": np.asarray(points, dtype=np.float32), "documents": documents}
+        if path is not None:
+            temporary = path.with_suffix(".tmp")
+            with open(temporary, "wb") as f:
+                np.savez(f, method=method, max_points=max_points, corpus_version=key[2], rows=rows, points=projection["points"], documents=np.array(documents, dtype=str))
+            temporary.replace(path)
+        with self._lock:
+            self._projection = projection
+        return projection
+
+    def show_document(self, save_fig_path: Path = None, show_interactive_form: bool = False, method: str = "PCA", max_points: int = PROJECTION_MAX_POINTS) -> None:
+        """
+        Plots the chunks (or a sample of `max_points` of them) in two dimensions, colored by document.
+        """
+        import matplotlib
+        if not show_interactive_form:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        projection = self.projection(method, max_points)
+        points = projection["points"]
+        if len(points) < 2:
+            return
+        documents = np.array(projection["documents"])
+        figure, axes = plt.subplots(figsize=(10, 8))
+        for name in sorted(set(projection["documents"])):
+            selected = documents == name
+            axes.scatter(points[selected, 0], points[selected, 1], label=Path(name).name, s=12)
+        axes.legend(fontsize="small")
+        sampled = f", {len(points)} of {self.chunk_count} chunks" if len(points) < self.chunk_count else ""
+        axes.set_title(f"Document chunks ({method}{sampled})")
+        if save_fig_path is not None:
+            figure.savefig(save_fig_path)
+        if show_interactive_form:
+            plt.show()
+        plt.close(figure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shows the documents held by a document index")
+    parser.add_argument("folder", type=Path, help="The folder of the index")
+    parser.add_argument("--compact", action="store_true", help="Merge the log into the matrix and drop the vectors of removed chunks")
+    args = parser.parse_args()
+
+    index = DocumentIndex(args.folder, vectorizer=None)
+    if args.compact:
+        index.compact()
+        ASCIIColors.success("Index compacted")
+    for name, entry in sorted(index.documents.items()):
+        print(f"{entry['chunks']:6d} chunks  {entry['sha256'][:12]}  {name}")
+    meta = index._meta
+    print(f"{len(index.documents)} documents, {index.chunk_count} chunks, {meta['dimensions']} dimensions ({meta['dtype']})")
+    print(f"{meta['base_rows']} rows in the matrix, {meta['log_rows']} in the log, {len(index._live) - index.chunk_count} removed")
+
+if __name__ == "__main__":
+    main()
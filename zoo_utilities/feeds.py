@@ -0,0 +1,256 @@
+"""
+Feed fetching
+
+Downloads RSS/Atom feeds and site favicons concurrently through one shared
+HTTP session, so refreshing a list of feeds takes about one round trip instead
+of one per feed.
+
+Feeds are fetched with conditional GET requests: the ETag and Last-Modified
+headers of each feed are kept with its last body in a cache folder, so a feed
+that did not change answers 304 and its cached body is reused. When a feed
+can't be reached, its last body is returned as stale rather than nothing.
+
+Favicons are looked up once per domain and remembered on disk for a week.
+
+Usage in a processor:
+    from zoo_utilities.feeds import FeedFetcher
+
+    fetcher = FeedFetcher(output_folder / "feeds_cache")
+    for result in fetcher.fetch_feeds(urls):
+        if result["content"]:
+            feed = feedparser.parse(result["content"])
+    fetcher.prefetch_favicons(article_links)
+    icon = fetcher.favicon_url(article_link)
+
+Usage from the command line:
+    python -m zoo_utilities.feeds CACHE_FOLDER URL [URL...]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+from ascii_colors import ASCIIColors
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_TIMEOUT = 10
+FAVICON_TTL = 7 * 24 * 3600
+USER_AGENT = "Mozilla/5.0 (compatible; lollms-feed-fetcher)"
+
+
+class _IconLinkParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.icons = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "link":
+            return
+        attributes = dict(attrs)
+        rel = (attributes.get("rel") or "").lower().split()
+        if "icon" in rel and attributes.get("href"):
+            self.icons.append(attributes["href"])
+
+
+def find_favicon(html: str, page_url: str) -> str:
+    """
+    Returns the absolute url of the icon declared by an HTML page, or "" if it declares none.
+    """
+    parser = _IconLinkParser()
+    try:
+        parser.feed(html)
+    except Exception:
+        pass
+    return urljoin(page_url, parser.icons[0]) if parser.icons else ""
+
+
+class FeedFetcher:
+    """
+    Concurrent feed and favicon downloader with an on-disk cache.
+
+    Args:
+        cache_folder (Path): Where the feed bodies, their validators and the favicons are kept.
+        max_workers (int): Maximum number of requests in flight.
+        timeout (float): Timeout of each request in seconds.
+    """
+
+    def __init__(self, cache_folder: Path, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT) -> None:
+        import requests
+
+        self.cache_folder = Path(cache_folder)
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._feeds_state = self._load_json("feeds_state.json")
+        self._favicons = self._load_json("favicons.json")
+        # Domains whose site could not be reached by this fetcher, not cached on disk so they are retried next run
+        self._unreachable = set()
+
+    def _load_json(self, name: str) -> dict:
+        try:
+            with open(self.cache_folder / name, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_json(self, name: str, data: dict) -> None:
+        path = self.cache_folder / name
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf8") as f:
+            json.dump(data, f, indent=1)
+        temporary.replace(path)
+
+    def _body_path(self, url: str) -> Path:
+        return self.cache_folder / f"{hashlib.sha1(url.encode('utf8')).hexdigest()}.xml"
+
+    def _cached_body(self, url: str) -> bytes:
+        try:
+            return self._body_path(url).read_bytes()
+        except OSError:
+            return None
+
+    def fetch_feed(self, url: str) -> dict:
+        """
+        Downloads a feed unless the server says it did not change since the last download.
+
+        Returns:
+            dict: The url, the feed body as `content` (None if it could not be fetched and nothing
+            was cached), the `status` ("fetched", "not_modified", "stale" when the download failed
+            and the cached body is returned, or "failed"), the `error` message and the `seconds` taken.
+        """
+        result = {"url": url, "content": None, "status": "failed", "error": "", "seconds": 0.0}
+        with self._lock:
+            state = dict(self._feeds_state.get(url, {}))
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                result["content"] = self._cached_body(url)
+                result["status"] = "not_modified" if result["content"] is not None else "failed"
+                if result["content"] is None:
+                    # The validators outlived the body, ask for the full feed next time
+                    with self._lock:
+                        self._feeds_state.pop(url, None)
+            else:
+                response.raise_for_status()
+                result["content"] = response.content
+                result["status"] = "fetched"
+                self._body_path(url).write_bytes(response.content)
+                with self._lock:
+                    self._feeds_state[url] = {
+                        "etag": response.headers.get("ETag", ""),
+                        "last_modified": response.headers.get("Last-Modified", ""),
+                        "fetched": time.time(),
+                    }
+        except Exception as ex:
+            result["error"] = str(ex)
+            result["content"] = self._cached_body(url)
+            result["status"] = "stale" if result["content"] is not None else "failed"
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def fetch_feeds(self, urls: list) -> list:
+        """
+        Downloads feeds concurrently.
+
+        Returns:
+            list: The results of `fetch_feed`, in the order of the urls.
+        """
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            results = list(executor.map(self.fetch_feed, urls))
+        with self._lock:
+            self._save_json("feeds_state.json", self._feeds_state)
+        return results
+
+    def _lookup_favicon(self, domain: str) -> str:
+        # None when the site could not be reached, so that it is tried again next time
+        page_url = f"https://{domain}"
+        try:
+            response = self.session.get(page_url, timeout=min(self.timeout, 5))
+            return find_favicon(response.text, response.url or page_url)
+        except Exception as ex:
+            ASCIIColors.warning(f"Couldn't fetch the favicon of {domain}: {ex}")
+            return None
+
+    def _cached_favicon(self, domain: str):
+        with self._lock:
+            entry = self._favicons.get(domain)
+        if entry is None or time.time() - entry.get("time", 0) > FAVICON_TTL:
+            return None
+        return entry.get("url", "")
+
+    def favicon_url(self, link: str) -> str:
+        """
+        Returns the favicon of the site of a link ("" if it has none), from the cache when possible.
+        """
+        domain = urlparse(link).netloc
+        if not domain:
+            return ""
+        if domain in self._unreachable:
+            return ""
+        url = self._cached_favicon(domain)
+        if url is None:
+            url = self._lookup_favicon(domain)
+            with self._lock:
+                self._remember_favicon(domain, url, time.time())
+                self._save_json("favicons.json", self._favicons)
+        return url or ""
+
+    def _remember_favicon(self, domain: str, url: str, now: float) -> None:
+        if url is None:
+            self._unreachable.add(domain)
+        else:
+            self._favicons[domain] = {"url": url, "time": now}
+
+    def prefetch_favicons(self, links: list) -> None:
+        """
+        Looks up concurrently the favicons of the domains of links that are not cached yet.
+        """
+        domains = {urlparse(link).netloc for link in links if link}
+        missing = sorted(domain for domain in domains if domain and domain not in self._unreachable and self._cached_favicon(domain) is None)
+        if not missing:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            urls = list(executor.map(self._lookup_favicon, missing))
+        now = time.time()
+        with self._lock:
+            for domain, url in zip(missing, urls):
+                self._remember_favicon(domain, url, now)
+            self._save_json("favicons.json", self._favicons)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetches feeds concurrently and shows which ones changed")
+    parser.add_argument("cache_folder", type=Path, help="The cache folder (for example the feeds_cache folder of rss_feed_fuser)")
+    parser.add_argument("urls", nargs="+", help="The feed addresses")
+    args = parser.parse_args()
+
+    fetcher = FeedFetcher(args.cache_folder)
+    start = time.perf_counter()
+    results = fetcher.fetch_feeds(args.urls)
+    for result in results:
+        size = len(result["content"]) if result["content"] else 0
+        print(f"{result['status']:<13} {result['seconds']:6.2f}s {size / 1024:8.1f} KB  {result['url']}  {result['error'][:80]}")
+    print(f"{len(results)} feeds in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Processor import-time budget
+
+Imports every `scripts/processor.py` of the zoo in a fresh interpreter with
+the lollms package stubbed out, and fails when a processor takes longer than
+the budget to import. Heavy optional modules (torch, docling, selenium, cv2,
+pyautogui...) must be bound with `zoo_utilities.dependencies.lazy_import` or
+imported inside the command that needs them.
+
+Processors that can't be imported because a third party package is missing
+from the current environment are reported but do not fail the check.
+
+Usage:
+    python -m zoo_utilities.import_budget [--budget SECONDS] [--jobs N] [--filter TEXT] [--json PATH]
+    python -m pytest zoo_utilities/tests     # the same check, one processor at a time
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ZOO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGET = 0.5
+
+
+def discover_processors(zoo_path: Path = ZOO_ROOT, name_filter: str = "") -> list:
+    """
+    Returns the processor files of the zoo, optionally filtered by a substring of their path.
+    """
+    processors = sorted(Path(zoo_path).glob("*/*/scripts/processor.py"))
+    if name_filter:
+        processors = [p for p in processors if name_filter in p.relative_to(zoo_path).as_posix()]
+    return processors
+
+
+def import_processor(processor_path: Path, module_name: str = "processor"):
+    """
+    Imports a processor file the way lollms does: its scripts folder is added to the
+    python path and the file is loaded as a standalone module.
+
+    Returns:
+        module: The imported processor module.
+    """
+    import importlib.util
+
+    processor_path = Path(processor_path)
+    scripts_folder = str(processor_path.parent)
+    if scripts_folder not in sys.path:
+        sys.path.insert(0, scripts_folder)
+    spec = importlib.util.spec_from_file_location(module_name, processor_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure_import(processor_path: Path) -> dict:
+    """
+    Measures the import time of a processor in the current interpreter. Meant to run in a fresh process.
+    """
+    from zoo_utilities.lollms_stubs import install_lollms_stubs
+
+    install_lollms_stubs()
+    result = {"path": str(processor_path), "seconds": None, "status": "ok", "error": ""}
+    start = time.perf_counter()
+    try:
+        import_processor(processor_path)
+        result["seconds"] = time.perf_counter() - start
+    except ModuleNotFoundError as ex:
+        result["status"] = "missing"
+        result["error"] = f"missing module {ex.name}"
+    except BaseException as ex:
+        result["status"] = "error"
+        result["error"] = f"{type(ex).__name__}: {ex}"
+    return result
+
+
+def measure_in_subprocess(processor_path: Path, zoo_path: Path = ZOO_ROOT, timeout: float = 600) -> dict:
+    command = [sys.executable, "-m", "zoo_utilities.import_budget", "--measure", str(processor_path)]
+    try:
+        completed = subprocess.run(command, cwd=str(zoo_path), capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"path": str(processor_path), "seconds": timeout, "status": "ok", "error": "timeout"}
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"path": str(processor_path), "seconds": None, "status": "error", "error": completed.stderr.strip()[-500:]}
+
+
+def check_import_budget(zoo_path: Path = ZOO_ROOT, budget: float = DEFAULT_BUDGET, jobs: int = 1, name_filter: str = "") -> tuple:
+    """
+    Measures the import time of every processor.
+
+    Measures running at once compete for the cores and come out slower, so `jobs` is capped
+    at the number of cores.
+
+    Returns:
+        tuple: (results, over_budget) where over_budget lists the results exceeding the budget.
+    """
+    processors = discover_processors(zoo_path, name_filter)
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, os.cpu_count() or 1))) as executor:
+        results = list(executor.map(lambda p: measure_in_subprocess(p, zoo_path), processors))
+    for result in results:
+        result["path"] = Path(result["path"]).relative_to(zoo_path).as_posix()
+    over_budget = [r for r in results if r["status"] == "ok" and r["seconds"] is not None and r["seconds"] > budget]
+    return results, over_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that every processor of the zoo imports within a time budget")
+    parser.add_argument("--zoo", type=Path, default=ZOO_ROOT, help="The root folder of the zoo")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Maximum import time in seconds")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processors measured in parallel, at most the number of cores")
+    parser.add_argument("--filter", default="", help="Only measure processors whose path contains this text")
+    parser.add_argument("--json", type=Path, default=None, help="Write the measurements to this file")
+    parser.add_argument("--measure", type=Path, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_import(args.measure)))
+        return
+
+    results, over_budget = check_import_budget(args.zoo.resolve(), args.budget, args.jobs, args.filter)
+    measured = sorted([r for r in results if r["seconds"] is not None], key=lambda r: -r["seconds"])
+    for result in measured:
+        flag = "OVER" if result in over_budget else "ok  "
+        print(f"{flag} {result['seconds']*1000:8.1f} ms  {result['path']}")
+    for result in results:
+        if result["status"] != "ok":
+            print(f"{result['status']:<7} {result['path']}: {result['error']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=4)
+
+    nb_skipped = len(results) - len(measured)
+    print(f"{len(measured)} processors measured, {nb_skipped} not importable here, {len(over_budget)} over the {args.budget}s budget")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+LLM answers cache
+
+An opt-in persistent cache of the answers of the APScript generation helpers
+(`fast_gen`, `generate`, `yes_no`, `multichoice_question`, `summarize_text`).
+It only applies to deterministic calls, made with a temperature at or below a
+configured threshold, so re-running a batch job after a crash replays the
+answers it already got instead of generating them again.
+
+Entries are keyed by the model, the binding, the helper, the hash of the prompt
+and the generation parameters. They live in a SQLite file shared by all the
+personalities, each personality having its own namespace, and are evicted least
+recently used first when a namespace grows over its size limit.
+
+Processors opt in with two personality settings:
+    {"name":"llm_cache","type":"bool","value":False, "help":"Reuse the answers of deterministic LLM calls across runs"},
+    {"name":"llm_cache_max_temperature","type":"float","value":0.0, "help":"Only calls made with a temperature at or below this value are cached"},
+
+Usage in a processor:
+    from zoo_utilities.llm_cache import LLMCacheMixin
+
+    class Processor(LLMCacheMixin, APScript):
+        ...
+
+Usage from the command line:
+    python -m zoo_utilities.llm_cache CACHE_FILE [--clear NAMESPACE]
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+CACHE_FILE_NAME = "llm_cache.sqlite"
+DEFAULT_MAX_SIZE_MB = 256
+# Helpers of APScript that take no temperature: a `temperature` passed to them is applied to the personality during the call
+UNTEMPERED_HELPERS = ("yes_no", "multichoice_question")
+
+
+class LLMCache:
+    """
+    A SQLite backed cache of LLM answers with per namespace LRU eviction.
+
+    Args:
+        cache_path (Path): The SQLite file.
+        namespace (str): The namespace of the entries (usually the personality folder name).
+        max_size_mb (float): The maximum size of the answers stored in this namespace.
+    """
+
+    def __init__(self, cache_path: Path, namespace: str, max_size_mb: float = DEFAULT_MAX_SIZE_MB) -> None:
+        self.cache_path = Path(cache_path)
+        self.namespace = namespace
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.cache_path), check_same_thread=False, timeout=30)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS answers_lru ON answers (namespace, last_access)")
+
+    @staticmethod
+    def make_key(method: str, model: str, binding: str, prompt: str, params: dict) -> str:
+        """
+        Builds the key of a call from the model, the binding, the helper, the prompt hash and the generation parameters.
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf8", errors="surrogatepass")).hexdigest()
+        description = json.dumps({"method": method, "model": model, "binding": binding, "prompt": prompt_hash, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns the cached answer (a tuple holding it) or None on a miss.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM answers WHERE namespace=? AND key=?", (self.namespace, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE answers SET last_access=? WHERE namespace=? AND key=?", (time.time(), self.namespace, key))
+            self.hits += 1
+        return (json.loads(row[0]),)
+
+    def set(self, key: str, value) -> None:
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers (namespace, key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, data, len(data), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM answers WHERE namespace=?", (self.namespace,)).fetchone()[0]
+        if total <= self.max_size:
+            return
+        # Free a bit more than needed so that eviction does not run on every insert
+        to_free = total - int(self.max_size * 0.9)
+        freed = 0
+        keys = []
+        for key, size in self._connection.execute("SELECT key, size FROM answers WHERE namespace=? ORDER BY last_access", (self.namespace,)):
+            keys.append((self.namespace, key))
+            freed += size
+            if freed >= to_free:
+                break
+        self._connection.executemany("DELETE FROM answers WHERE namespace=? AND key=?", keys)
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM answers WHERE namespace=?", (self.namespace,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers WHERE namespace=?", (self.namespace,)).fetchone()
+        return {"entries": entries, "size": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def _call_prompt(method: str, args: tuple, kwargs: dict) -> str:
+    if method in ("yes_no", "multichoice_question"):
+        return str(kwargs.get("question", args[0] if args else ""))
+    if method == "summarize_text":
+        return str(kwargs.get("text", args[0] if args else ""))
+    return str(kwargs.get("prompt", args[0] if args else ""))
+
+
+def _call_params(args: tuple, kwargs: dict) -> dict:
+    # The prompt is hashed separately, everything else that is not a callback is a parameter
+    return {
+        "args": [a for a in args[1:] if not callable(a)],
+        "kwargs": {k: v for k, v in kwargs.items() if k not in ("prompt", "question", "text", "callback") and not callable(v)},
+    }
+
+
+def _run_helper(self, method: str, base, args: tuple, kwargs: dict):
+    if method not in UNTEMPERED_HELPERS or "temperature" not in kwargs:
+        return base(*args, **kwargs)
+    kwargs = dict(kwargs)
+    temperature = kwargs.pop("temperature")
+    personality = self.personality
+    if temperature is None or not hasattr(personality, "model_temperature"):
+        return base(*args, **kwargs)
+    previous = personality.model_temperature
+    personality.model_temperature = temperature
+    try:
+        return base(*args, **kwargs)
+    finally:
+        personality.model_temperature = previous
+
+
+def _cached_helper(method: str):
+    def wrapper(self, *args, **kwargs):
+        base = getattr(super(LLMCacheMixin, self), method)
+        cache = self.llm_cache if self._llm_cache_applies(kwargs) else None
+        if cache is None:
+            return _run_helper(self, method, base, args, kwargs)
+        key = LLMCache.make_key(method, self._llm_config_value("model_name"), self._llm_config_value("binding_name"), _call_prompt(method, args, kwargs), _call_params(args, kwargs))
+        try:
+            cached = cache.get(key)
+        except sqlite3.Error as ex:
+            ASCIIColors.warning(f"LLM cache unavailable: {ex}")
+            return _run_helper(self, method, base, args, kwargs)
+        if cached is not None:
+            answer = cached[0]
+            callback = kwargs.get("callback")
+            if isinstance(answer, str) and callable(callback):
+                self._replay_to_callback(callback, answer)
+            return answer
+        answer = _run_helper(self, method, base, args, kwargs)
+        if isinstance(answer, (str, bool, int, float, dict, list)):
+            try:
+                cache.set(key, answer)
+            except sqlite3.Error as ex:
+                ASCIIColors.warning(f"Couldn't cache the LLM answer: {ex}")
+        return answer
+
+    wrapper.__name__ = method
+    wrapper.__qualname__ = f"LLMCacheMixin.{method}"
+    return wrapper
+
+
+class LLMCacheMixin:
+    """
+    Caches the answers of the deterministic LLM helper calls of a processor. Put it before APScript in the bases.
+
+    `yes_no` and `multichoice_question` also accept a `temperature`, used for that call only,
+    so that scoring and selection calls can run at temperature 0 and be cached.
+
+    The `llm_cache` and `llm_cache_max_temperature` personality settings take
+    precedence over the class attributes of the same name.
+    """
+
+    llm_cache_enabled = False
+    llm_cache_max_temperature = 0.0
+    llm_cache_max_size_mb = DEFAULT_MAX_SIZE_MB
+
+    def _llm_cache_setting(self, name: str, default):
+        try:
+            value = self.personality_config[name]
+        except Exception:
+            return default
+        return default if value is None else value
+
+    def _llm_config_value(self, name: str) -> str:
+        try:
+            return str(self.personality.config[name])
+        except Exception:
+            return ""
+
+    def _llm_cache_applies(self, kwargs: dict) -> bool:
+        if not self._llm_cache_setting("llm_cache", self.llm_cache_enabled):
+            return False
+        temperature = kwargs.get("temperature")
+        if temperature is None:
+            temperature = getattr(self.personality, "model_temperature", None)
+        try:
+            temperature = float(temperature)
+        except (TypeError, ValueError):
+            return False
+        return temperature <= float(self._llm_cache_setting("llm_cache_max_temperature", self.llm_cache_max_temperature))
+
+    @property
+    def llm_cache(self) -> LLMCache:
+        cache = self.__dict__.get("_llm_cache")
+        if cache is None:
+            personality = self.personality
+            namespace = str(getattr(personality, "personality_folder_name", None) or getattr(personality, "name", "personality"))
+            try:
+                cache = LLMCache(Path(personality.lollms_paths.personal_databases_path) / CACHE_FILE_NAME, namespace, self.llm_cache_max_size_mb)
+            except (OSError, sqlite3.Error) as ex:
+                ASCIIColors.warning(f"Couldn't open the LLM cache: {ex}")
+                return None
+            self.__dict__["_llm_cache"] = cache
+        return cache
+
+    def _replay_to_callback(self, callback, answer: str) -> None:
+        try:
+            from lollms.types import MSG_OPERATION_TYPE
+            callback(answer, MSG_OPERATION_TYPE.MSG_OPERATION_TYPE_ADD_CHUNK)
+        except ImportError:
+            pass
+
+    fast_gen = _cached_helper("fast_gen")
+    generate = _cached_helper("generate")
+    yes_no = _cached_helper("yes_no")
+    multichoice_question = _cached_helper("multichoice_question")
+    summarize_text = _cached_helper("summarize_text")
+    # The generations of the concurrent batches of `BatchGenerationMixin.map_generate`
+    isolated_generate = _cached_helper("isolated_generate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shows or clears the LLM answers cache")
+    parser.add_argument("cache_file", type=Path, help=f"The {CACHE_FILE_NAME} file of the personal databases folder")
+    parser.add_argument("--clear", default=None, metavar="NAMESPACE", help="Delete the entries of this namespace")
+    args = parser.parse_args()
+
+    if args.clear:
+        cache = LLMCache(args.cache_file, args.clear)
+        cache.clear()
+        ASCIIColors.success(f"Cleared the {args.clear} namespace")
+        return
+    connection = sqlite3.connect(str(args.cache_file))
+    rows = connection.execute("SELECT namespace, COUNT(*), SUM(size), MAX(last_access) FROM answers GROUP BY namespace ORDER BY SUM(size) DESC").fetchall()
+    print(f"{'entries':>8} {'size KB':>9}  {'last used':<19}  namespace")
+    for namespace, entries, size, last_access in rows:
+        print(f"{entries:8d} {size / 1024:9.1f}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_access))}  {namespace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+LLM call tracing
+
+A mixin for processors that records every call to the APScript generation
+helpers (`fast_gen`, `generate`, `yes_no`, `multichoice_question`,
+`summarize_text`, `summarize_chunks`, `sequential_summarize`) as a span with
+its prompt tokens, generated tokens, latency, the processor method that made
+the call and the UI step that was running.
+
+Spans are appended as JSON lines to
+`<personal_outputs_path>/llm_traces/<personality>.jsonl`. Calls are grouped in
+runs: `run_workflow` is a run by itself and commands can be made runs with the
+`traced_run` decorator. At the end of a run a summary is shown as a step.
+
+Helpers calling other helpers (`summarize_chunks` calling `fast_gen`...) give
+nested spans. Token totals only count the innermost spans and time totals only
+the outermost ones, so nothing is counted twice. Only the innermost spans are
+tokenized. Calls made concurrently (by `map_generate` worker threads) overlap,
+so the time totals are the time during which at least one call was running,
+not the sum of the latencies.
+
+Usage in a processor:
+    from zoo_utilities.llm_tracing import LLMTracingMixin, traced_run
+
+    class Processor(LLMTracingMixin, APScript):
+        @traced_run
+        def scrape_news(self, command, full_context, callback, context_state, client):
+            ...
+
+Usage from the command line, to find where the time goes:
+    python -m zoo_utilities.llm_tracing TRACE_FILE [--run RUN_ID] [--by caller|step|method]
+"""
+import argparse
+import functools
+import json
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+from zoo_utilities.batch_generation import current_batch_caller
+from zoo_utilities.token_cache import get_token_cache
+
+TRACES_FOLDER_NAME = "llm_traces"
+
+
+def _prompt_text(method: str, args: tuple, kwargs: dict) -> str:
+    """
+    Returns the text sent to the model by a traced helper call.
+    """
+    if method in ("yes_no", "multichoice_question"):
+        question = kwargs.get("question", args[0] if args else "")
+        possible_answers = kwargs.get("possible_answers", args[1] if method == "multichoice_question" and len(args) > 1 else [])
+        context = kwargs.get("context", "")
+        conditionning = kwargs.get("conditionning", "")
+        return "\n".join(str(part) for part in [conditionning, context, question, *possible_answers] if part)
+    if method in ("summarize_chunks", "sequential_summarize"):
+        chunks = kwargs.get("chunks", kwargs.get("text", args[0] if args else []))
+        if isinstance(chunks, (list, tuple)):
+            return "\n".join(str(chunk) for chunk in chunks)
+        return str(chunks)
+    if method == "summarize_text":
+        return str(kwargs.get("text", args[0] if args else ""))
+    return str(kwargs.get("prompt", args[0] if args else ""))
+
+
+class LLMTrace:
+    """
+    The spans of the runs of one processor.
+
+    Args:
+        personality (str): The personality name recorded in the spans.
+        trace_file (Path): The JSONL file the spans are appended to (None to keep them in memory only).
+    """
+
+    def __init__(self, personality: str, trace_file: Path = None) -> None:
+        self.personality = personality
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.run_id = None
+        self.run_name = None
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def start_run(self, name: str) -> str:
+        self.run_id = uuid.uuid4().hex[:12]
+        self.run_name = name
+        self.spans = []
+        return self.run_id
+
+    def end_run(self) -> dict:
+        summary = self.summary()
+        self.run_id = None
+        self.run_name = None
+        return summary
+
+    def start_span(self, method: str, caller: str, step: str) -> dict:
+        stack = self._stack
+        span = {
+            "run_id": self.run_id,
+            "run": self.run_name,
+            "span_id": uuid.uuid4().hex[:12],
+            "parent_id": stack[-1]["span_id"] if stack else None,
+            "personality": self.personality,
+            "method": method,
+            "caller": caller,
+            "step": step,
+            "start": time.time(),
+            "latency": None,
+            "prompt_tokens": None,
+            "generated_tokens": None,
+            "nested_calls": 0,
+            "status": "ok",
+        }
+        if stack:
+            stack[-1]["nested_calls"] += 1
+        stack.append(span)
+        span["_start"] = time.perf_counter()
+        return span
+
+    def end_span(self, span: dict, error: BaseException = None) -> None:
+        span["latency"] = time.perf_counter() - span.pop("_start")
+        if error is not None:
+            span["status"] = "error"
+            span["error"] = f"{type(error).__name__}: {error}"
+        stack = self._stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            self.spans.append(span)
+            if self.trace_file:
+                try:
+                    self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.trace_file, "a", encoding="utf8") as f:
+                        f.write(json.dumps(span) + "\n")
+                except OSError as ex:
+                    ASCIIColors.warning(f"Couldn't write the LLM trace: {ex}")
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return summarize_spans(spans)
+
+
+def busy_time(intervals: list) -> float:
+    """
+    Returns the time covered by (start, end) intervals, counting overlapping intervals once.
+    """
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def summarize_spans(spans: list, by: str = "caller") -> dict:
+    """
+    Aggregates spans.
+
+    Token counts come from the innermost spans (the actual generations) and
+    latencies from the outermost ones. Concurrent calls overlap, so a latency
+    total is the time during which at least one of the calls was running.
+
+    Args:
+        spans (list): The spans to aggregate.
+        by (str): The span field used to group the totals ("caller", "step" or "method").
+
+    Returns:
+        dict: Totals and per group totals sorted by decreasing latency.
+    """
+    span_ids = {span["span_id"] for span in spans}
+    totals = {"calls": 0, "prompt_tokens": 0, "generated_tokens": 0, "latency": 0.0, "errors": 0}
+    groups = {}
+    root_intervals = []
+    group_intervals = {}
+    for span in spans:
+        group = groups.setdefault(span.get(by) or "", {"calls": 0, "prompt_tokens": 0, "generated_tokens": 0, "latency": 0.0})
+        is_leaf = span.get("nested_calls", 0) == 0
+        is_root = span.get("parent_id") not in span_ids
+        if is_leaf:
+            for key in ("prompt_tokens", "generated_tokens"):
+                totals[key] += span.get(key) or 0
+                group[key] += span.get(key) or 0
+            totals["calls"] += 1
+            group["calls"] += 1
+        if is_root:
+            interval = (span.get("start") or 0.0, (span.get("start") or 0.0) + (span.get("latency") or 0.0))
+            root_intervals.append(interval)
+            group_intervals.setdefault(span.get(by) or "", []).append(interval)
+        if span.get("status") == "error":
+            totals["errors"] += 1
+    totals["latency"] = busy_time(root_intervals)
+    for name, intervals in group_intervals.items():
+        groups[name]["latency"] = busy_time(intervals)
+    totals["by_" + by] = dict(sorted(groups.items(), key=lambda item: -item[1]["latency"]))
+    return totals
+
+
+def format_summary(summary: dict, by: str = "caller", top: int = 3) -> str:
+    text = f"LLM usage: {summary['calls']} calls, {summary['prompt_tokens']} prompt tokens, {summary['generated_tokens']} generated tokens, {summary['latency']:.1f}s"
+    groups = [f"{name or '?'} {group['latency']:.1f}s ({group['calls']} calls)" for name, group in list(summary["by_" + by].items())[:top]]
+    if groups:
+        text += " - " + ", ".join(groups)
+    return text
+
+
+def _traced_helper(method: str):
+    def wrapper(self, *args, **kwargs):
+        base = getattr(super(LLMTracingMixin, self), method)
+        trace = self.llm_trace
+        if not self.trace_llm_calls or trace is None:
+            return base(*args, **kwargs)
+        caller = current_batch_caller()
+        if caller is None:
+            frame = sys._getframe(1)
+            while frame.f_back is not None and frame.f_code.co_name.startswith("<"):
+                # comprehensions and lambdas are reported as the function defining them
+                frame = frame.f_back
+            caller = frame.f_code.co_name
+        span = trace.start_span(method, caller, self._llm_steps[-1] if self._llm_steps else "")
+        try:
+            result = base(*args, **kwargs)
+        except BaseException as ex:
+            trace.end_span(span, ex)
+            raise
+        if span["nested_calls"] == 0:
+            # Helpers calling other helpers get their tokens from the nested spans
+            span["prompt_tokens"] = self._count_tokens(_prompt_text(method, args, kwargs))
+            span["generated_tokens"] = self._count_tokens(result) if isinstance(result, str) else 0
+        trace.end_span(span)
+        return result
+
+    wrapper.__name__ = method
+    wrapper.__qualname__ = f"LLMTracingMixin.{method}"
+    return wrapper
+
+
+def traced_run(function):
+    """
+    Decorates a processor method so that the LLM calls it makes form a run with a summary.
+    Nested runs are merged into the outermost one.
+    """
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        trace = getattr(self, "llm_trace", None)
+        if trace is None or trace.run_id is not None or not self.trace_llm_calls:
+            return function(self, *args, **kwargs)
+        trace.start_run(function.__name__)
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            summary = trace.end_run()
+            if summary["calls"] and self.show_llm_summary:
+                self.step(format_summary(summary))
+
+    return wrapper
+
+
+class LLMTracingMixin:
+    """
+    Traces the LLM helper calls of a processor. Put it before APScript in the bases.
+
+    Attributes:
+        trace_llm_calls (bool): Set to False to disable tracing.
+        show_llm_summary (bool): Set to False to only write the spans without showing a summary.
+    """
+
+    trace_llm_calls = True
+    show_llm_summary = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "run_workflow" in cls.__dict__:
+            cls.run_workflow = traced_run(cls.__dict__["run_workflow"])
+
+    @property
+    def llm_trace(self) -> LLMTrace:
+        trace = self.__dict__.get("_llm_trace")
+        if trace is None:
+            personality = self.__dict__.get("personality")
+            if personality is None:
+                return None
+            name = str(getattr(personality, "personality_folder_name", None) or getattr(personality, "name", "personality"))
+            try:
+                trace_file = Path(personality.lollms_paths.personal_outputs_path) / TRACES_FOLDER_NAME / f"{name}.jsonl"
+            except Exception:
+                trace_file = None
+            trace = LLMTrace(name, trace_file)
+            self.__dict__["_llm_trace"] = trace
+        return trace
+
+    @property
+    def _llm_steps(self) -> list:
+        return self.__dict__.setdefault("_llm_steps_stack", [])
+
+    def _count_tokens(self, text: str) -> int:
+        try:
+            return get_token_cache(self.personality.model).count(text)
+        except Exception:
+            return len(str(text)) // 4
+
+    def step_start(self, step_text: str, *args, **kwargs):
+        self._llm_steps.append(step_text)
+        return super().step_start(step_text, *args, **kwargs)
+
+    def step_end(self, step_text: str, *args, **kwargs):
+        steps = self._llm_steps
+        if step_text in steps:
+            del steps[len(steps) - 1 - steps[::-1].index(step_text)]
+        return super().step_end(step_text, *args, **kwargs)
+
+    fast_gen = _traced_helper("fast_gen")
+    generate = _traced_helper("generate")
+    yes_no = _traced_helper("yes_no")
+    multichoice_question = _traced_helper("multichoice_question")
+    summarize_text = _traced_helper("summarize_text")
+    summarize_chunks = _traced_helper("summarize_chunks")
+    sequential_summarize = _traced_helper("sequential_summarize")
+    # The generations of the concurrent batches of `BatchGenerationMixin.map_generate`
+    isolated_generate = _traced_helper("isolated_generate")
+
+
+def read_spans(trace_file: Path, run_id: str = None) -> list:
+    spans = []
+    with open(trace_file, "r", encoding="utf8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                if run_id is None or span.get("run_id") == run_id:
+                    spans.append(span)
+    return spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarizes an LLM trace file")
+    parser.add_argument("trace_file", type=Path, help="A <personality>.jsonl file of the llm_traces folder")
+    parser.add_argument("--run", default=None, help="Only summarize this run id (defaults to all the runs)")
+    parser.add_argument("--by", choices=["caller", "step", "method", "run"], default="caller", help="How to group the totals")
+    args = parser.parse_args()
+
+    spans = read_spans(args.trace_file, args.run)
+    summary = summarize_spans(spans, args.by)
+    print(f"{summary['calls']} calls, {summary['prompt_tokens']} prompt tokens, {summary['generated_tokens']} generated tokens, {summary['latency']:.1f}s, {summary['errors']} errors")
+    print(f"{'seconds':>9} {'calls':>6} {'tok in':>9} {'tok out':>9}  {args.by}")
+    for name, group in summary["by_" + args.by].items():
+        print(f"{group['latency']:9.1f} {group['calls']:6d} {group['prompt_tokens']:9d} {group['generated_tokens']:9d}  {name or '?'}")
+
+
+if __name__ == "__main__":
+    main()
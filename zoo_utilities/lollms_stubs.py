@@ -0,0 +1,494 @@
+"""
+Lollms stubs
+
+Lightweight stand-ins for the `lollms` package (and the packages of its
+ecosystem) so that processors can be imported and measured outside of a lollms
+installation, without a GPU, a model or network access.
+
+Any module under a stubbed package can be imported and any name can be
+imported from it. Unknown names resolve to permissive stub classes that can be
+subclassed, instantiated and called. The few lollms classes processors rely on
+(`APScript`, `AIPersonality`, `ConfigTemplate`, `BaseConfig`, `TypedConfig`,
+`LollmsContextDetails`) get minimal working implementations.
+
+`FakeModel` and `FakePersonality` let a processor run its workflow end to end:
+the model returns canned, deterministic answers and counts the calls and the
+tokens it receives and generates.
+
+Usage:
+    from zoo_utilities.lollms_stubs import install_lollms_stubs, FakePersonality
+    install_lollms_stubs()
+    # importing a processor now works even if lollms is not installed
+    processor = module.Processor(FakePersonality(personality_folder, work_folder))
+"""
+import importlib.abc
+import importlib.machinery
+import re
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+STUBBED_PACKAGES = ("lollms", "lollmsvectordb", "safe_store", "pipmaster")
+
+
+class StubName(str):
+    """
+    The value of a class level attribute of a stub class: a string equal to the
+    attribute name, so that enum-like usages such as
+    `MSG_OPERATION_TYPE.MSG_OPERATION_TYPE_SET_CONTENT` work, which can also be
+    called like the static methods of helper classes (`PackageManager.install_package(...)`).
+    """
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+
+class _StubMeta(type):
+    """
+    Metaclass of the stub classes: class level attribute access returns a StubName.
+    """
+
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return StubName(name)
+
+
+class Stub(metaclass=_StubMeta):
+    """
+    A permissive object: keyword arguments of the constructor become attributes, any
+    other attribute is a callable stub and calling it returns a new stub.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+def _make_stub_class(name: str, module_name: str) -> type:
+    return _StubMeta(name, (Stub,), {"__module__": module_name, "__qualname__": name})
+
+
+# ----------------------------------------------------------------------------- lollms.config
+class ConfigTemplate:
+    def __init__(self, template: list = None) -> None:
+        self.template = list(template or [])
+
+    def __iter__(self):
+        return iter(self.template)
+
+
+class BaseConfig(dict):
+    @staticmethod
+    def from_template(template: ConfigTemplate, exceptional_keys: list = [], config=None):
+        return BaseConfig({entry["name"]: entry.get("value") for entry in template})
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class TypedConfig:
+    def __init__(self, config_template: ConfigTemplate, config: BaseConfig = None) -> None:
+        self.__dict__["config_template"] = config_template
+        self.__dict__["config"] = BaseConfig(config or BaseConfig.from_template(config_template))
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["config"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self.__dict__["config"][name] = value
+
+    def __getitem__(self, name):
+        return self.__dict__["config"][name]
+
+    def __setitem__(self, name, value):
+        self.__dict__["config"][name] = value
+
+    def __contains__(self, name):
+        return name in self.__dict__["config"]
+
+
+# ----------------------------------------------------------------------------- lollms.prompting
+class LollmsContextDetails:
+    """
+    The context handed to `run_workflow`. Missing fields are empty strings and the
+    object can also be used as the dict older processors expect.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return ""
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.__dict__
+
+    def get(self, name, default=None):
+        return self.__dict__.get(name, default)
+
+    def build_prompt(self, template=None, custom_entries={}, suppress: list = []) -> str:
+        if isinstance(custom_entries, dict):
+            parts = [self.conditionning, self.discussion_messages, *[v for k, v in custom_entries.items() if k != "ai_prefix"], custom_entries.get("ai_prefix", self.ai_prefix)]
+        else:
+            parts = [self.conditionning, self.discussion_messages, custom_entries, self.ai_prefix]
+        return "\n".join(str(part) for part in parts if part)
+
+    def get_discussion_to(self, *args, **kwargs) -> str:
+        return self.discussion_messages
+
+
+# ----------------------------------------------------------------------------- fake model
+class FakeModel:
+    """
+    A deterministic stand in model. Tokens are whitespace separated words and every
+    generation returns the same canned answer.
+
+    Attributes:
+        calls (int): Number of generations.
+        prompt_tokens (int): Tokens of all the prompts received.
+        generated_tokens (int): Tokens of all the answers returned.
+        yes_no_answer (bool): The answer given to `yes_no` questions.
+
+    `answer` can also be a function of the prompt.
+    """
+
+    DEFAULT_ANSWER = "This is a canned answer from the benchmark model.\n```python\nprint('hello')\n```"
+
+    def __init__(self, answer: str = DEFAULT_ANSWER, yes_no_answer: bool = False, latency: float = 0.0, config: dict = None) -> None:
+        self.config = config if config is not None else {"ctx_size": 4096, "max_n_predict": 1024}
+        self.answer = answer
+        self.yes_no_answer = yes_no_answer
+        self.latency = latency
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self._lock = threading.Lock()
+
+    def tokenize(self, text: str) -> list:
+        return list(range(len(str(text).split())))
+
+    def detokenize(self, tokens: list) -> str:
+        return " ".join("tok" for _ in tokens)
+
+    def count_tokens(self, text: str) -> int:
+        return len(str(text).split())
+
+    def generate(self, prompt: str, n_predict: int = None, callback=None, **kwargs) -> str:
+        answer = self.answer(prompt) if callable(self.answer) else self.answer
+        if n_predict:
+            answer = " ".join(answer.split(" ")[:n_predict])
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += self.count_tokens(prompt)
+            self.generated_tokens += self.count_tokens(answer)
+        # The answer is streamed word by word over the latency, like a real binding
+        pieces = [piece + " " for piece in answer.split(" ")[:-1]] + [answer.split(" ")[-1]]
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            if callable(callback) and callback(piece, 0) is False:
+                break
+        return answer
+
+    def stats(self) -> dict:
+        return {"llm_calls": self.calls, "prompt_tokens": self.prompt_tokens, "generated_tokens": self.generated_tokens}
+
+
+# ----------------------------------------------------------------------------- lollms.personality
+class AIPersonality(Stub):
+    """
+    A stand in personality. Every attribute that is not explicitly set is a stub.
+    """
+
+
+class APScript(Stub):
+    """
+    A stand in for the lollms APScript base class of every processor.
+
+    The generation helpers are routed to `personality.model` so that a FakeModel
+    sees every call, and the UI helpers notify `personality.record_output`.
+    """
+
+    def __init__(self, personality=None, personality_config=None, states_list: list = [], callback=None) -> None:
+        self.personality = personality
+        self.personality_config = personality_config
+        self.states_list = states_list
+        self.callback = callback
+        self.config = getattr(personality, "config", None)
+
+    def install(self):
+        pass
+
+    def sink(self, *args, **kwargs):
+        return True
+
+    # UI
+    def _record_output(self, *args, **kwargs):
+        record_output = getattr(self.personality, "record_output", None)
+        if callable(record_output):
+            record_output()
+
+    set_message_content = add_chunk_to_message_content = set_message_html = new_message = _record_output
+    step_start = step_end = step = info = warning = error = json = ui = finished_message = _record_output
+
+    # Prompting
+    def system_custom_header(self, name: str) -> str:
+        return f"!@>{name}: "
+
+    ai_custom_header = user_custom_header = system_custom_header
+
+    def build_prompt(self, prompt_parts: list, sacrifice_id: int = -1, context_size: int = None, minimum_spare_context_size: int = None) -> str:
+        return "\n".join(str(part) for part in prompt_parts if part)
+
+    def build_prompt_from_context_details(self, context_details, custom_entries: dict = {}, suppress: list = []) -> str:
+        return context_details.build_prompt(custom_entries=custom_entries, suppress=suppress)
+
+    def extract_code_blocks(self, text: str, return_remaining_text: bool = False):
+        blocks = [{"index": i, "file_name": "", "content": content, "type": language or "language-specific", "is_complete": True}
+                  for i, (language, content) in enumerate(re.findall(r"```(\w*)\n(.*?)```", text, re.DOTALL))]
+        return (blocks, text) if return_remaining_text else blocks
+
+    # Generation
+    def _model_generate(self, prompt: str, max_size: int = None, callback=None) -> str:
+        model = getattr(self.personality, "model", None)
+        if not isinstance(model, FakeModel):
+            return ""
+        return self.personality.generate(str(prompt), max_size, callback=callback)
+
+    def generate(self, prompt, max_size=None, temperature=None, top_k=None, top_p=None, repeat_penalty=None, repeat_last_n=None, callback=None, debug=False, **kwargs) -> str:
+        return self._model_generate(prompt, max_size, callback)
+
+    def fast_gen(self, prompt: str, max_generation_size: int = None, placeholders: dict = {}, sacrifice: list = ["previous_discussion"], debug: bool = False, callback=None, show_progress=False, **kwargs) -> str:
+        return self._model_generate(prompt, max_generation_size, callback)
+
+    def generate_with_images(self, prompt: str, images: list = [], *args, callback=None, **kwargs) -> str:
+        return self._model_generate(prompt, callback=callback)
+
+    fast_gen_with_images = generate_with_images
+
+    def generate_code(self, prompt, images=[], template=None, language="json", code_tag_format="markdown", max_size=None, accept_all_if_no_code_tags_is_present=False, max_continues=5, **kwargs):
+        blocks = self.extract_code_blocks(self._model_generate(prompt, max_size))
+        return blocks[0]["content"] if blocks else None
+
+    def yes_no(self, question: str, context: str = "", max_answer_length: int = None, conditionning: str = "", return_explanation: bool = False, callback=None) -> bool:
+        self._model_generate(f"{conditionning}\n{context}\n{question}", max_answer_length)
+        answer = getattr(getattr(self.personality, "model", None), "yes_no_answer", False)
+        return {"answer": answer, "explanation": ""} if return_explanation else answer
+
+    def multichoice_question(self, question: str, possible_answers: list, context: str = "", max_answer_length: int = None, conditionning: str = "", return_explanation: bool = False, callback=None) -> int:
+        self._model_generate(f"{conditionning}\n{context}\n{question}\n" + "\n".join(str(a) for a in possible_answers), max_answer_length)
+        return 0
+
+    def summarize_text(self, text, summary_instruction="summarize", doc_name="chunk", answer_start="", max_generation_size=3000, max_summary_size=512, callback=None, chunk_summary_post_processing=None, summary_mode=None, **kwargs) -> str:
+        return self._model_generate(f"{summary_instruction}\n{text}", max_generation_size, callback)
+
+    def summarize_chunks(self, chunks, summary_instruction="summarize", doc_name="chunk", answer_start="", max_generation_size=3000, callback=None, chunk_summary_post_processing=None, summary_mode=None, **kwargs) -> str:
+        return "\n".join(self._model_generate(f"{summary_instruction}\n{chunk}", max_generation_size, callback) for chunk in chunks)
+
+    sequential_summarize = summarize_chunks
+
+
+class _FakeLollmsPaths:
+    """
+    Lollms paths that all live in a throw away work folder. Every folder is created on first use.
+    """
+
+    def __init__(self, work_folder: Path, zoo_path: Path = None) -> None:
+        self.__dict__["_work_folder"] = Path(work_folder)
+        self.__dict__["personalities_zoo_path"] = Path(zoo_path) if zoo_path else Path(work_folder) / "personalities_zoo"
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        folder = self._work_folder / name
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder
+
+
+class _FakeLollmsConfig(BaseConfig):
+    """
+    A lollms configuration with the usual defaults. Unknown entries are empty strings.
+    """
+
+    DEFAULTS = {
+        "ctx_size": 4096, "max_n_predict": 1024, "debug": False, "user_name": "user", "hardware_mode": "cpu",
+        "start_header_id_template": "!@>", "end_header_id_template": ": ", "separator_template": "\n",
+        "start_user_header_id_template": "!@>", "end_user_header_id_template": ": ",
+        "start_ai_header_id_template": "!@>", "end_ai_header_id_template": ": ", "system_message_template": "system",
+        "rag_vectorizer": "tfidf", "rag_vectorizer_model": "", "rag_chunk_size": 512, "rag_overlap": 50, "rag_n_chunks": 4,
+        "data_vectorization_method": "tfidf_vectorizer", "default_negative_prompt": "",
+    }
+
+    def __init__(self, **overrides) -> None:
+        super().__init__({**self.DEFAULTS, **overrides})
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self.get(name, "")
+
+
+class FakePersonality(AIPersonality):
+    """
+    A personality mounted on a FakeModel with every path redirected to a work folder.
+
+    Args:
+        personality_folder (Path): The zoo folder of the personality (its config.yaml and assets are used as is).
+        work_folder (Path): A throw away folder receiving everything the processor writes.
+        model (FakeModel): The model used for every generation (a new one by default).
+    """
+
+    def __init__(self, personality_folder: Path, work_folder: Path, model: FakeModel = None) -> None:
+        personality_folder = Path(personality_folder)
+        self.config = _FakeLollmsConfig()
+        self.model = model or FakeModel(config=self.config)
+        self.lollms_paths = _FakeLollmsPaths(work_folder, personality_folder.parent.parent)
+        self.app = Stub(config=self.config, lollms_paths=self.lollms_paths, model=self.model)
+        self.name = personality_folder.name
+        self.personality_folder_name = personality_folder.name
+        self.personality_package_path = personality_folder
+        self.assets_path = personality_folder / "assets"
+        self.personality_output_folder = self.lollms_paths.personal_outputs_path / personality_folder.name
+        self.personality_output_folder.mkdir(parents=True, exist_ok=True)
+        self.text_files = []
+        self.image_files = []
+        self.personality_conditioning = ""
+        self.welcome_message = ""
+        self.ai_message_prefix = "assistant"
+        self.model_temperature = 0.1
+        self.model_top_k = 50
+        self.model_top_p = 0.95
+        self.model_repeat_penalty = 1.0
+        self.first_output_time = None
+
+    def record_output(self, *args, **kwargs):
+        if self.first_output_time is None:
+            self.first_output_time = time.perf_counter()
+
+    info = warning = error = success = step = step_start = step_end = record_output
+
+    def fast_gen(self, prompt: str, max_generation_size: int = None, *args, callback=None, **kwargs) -> str:
+        return self.generate(prompt, max_generation_size, callback=callback)
+
+    def generate(self, prompt: str, max_size: int = None, *args, callback=None, **kwargs) -> str:
+        # Like lollms, the streamed answer is accumulated in the personality, so concurrent calls mix their answers
+        self.bot_says = ""
+
+        def process(chunk, message_type=None, *args, **kwargs):
+            self.bot_says += chunk
+            if callable(callback):
+                callback(chunk, message_type)
+            return True
+
+        self.model.generate(str(prompt), max_size, callback=process)
+        return self.bot_says
+
+    def detect_antiprompt(self, text: str) -> bool:
+        return False
+
+
+_EXPLICIT_NAMES = {
+    "lollms.config": {"ConfigTemplate": ConfigTemplate, "BaseConfig": BaseConfig, "TypedConfig": TypedConfig},
+    "lollms.personality": {"AIPersonality": AIPersonality, "APScript": APScript},
+    "lollms.prompting": {"LollmsContextDetails": LollmsContextDetails},
+}
+
+
+class StubModule(types.ModuleType):
+    """
+    A module that creates a stub class for any attribute it is asked for.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__path__ = []
+        self.__dict__.update(_EXPLICIT_NAMES.get(name, {}))
+        if name in ("lollms.helpers", "lollms.utilities"):
+            try:
+                from ascii_colors import ASCIIColors, trace_exception
+                self.ASCIIColors = ASCIIColors
+                self.trace_exception = trace_exception
+            except ImportError:
+                pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        stub = _make_stub_class(name, self.__name__)
+        setattr(self, name, stub)
+        return stub
+
+
+class _StubLoader(importlib.abc.Loader):
+    def create_module(self, spec):
+        return StubModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+class LollmsStubFinder(importlib.abc.MetaPathFinder):
+    """
+    Resolves every module of the stubbed packages to a StubModule.
+    """
+
+    def __init__(self, packages=STUBBED_PACKAGES) -> None:
+        self.packages = tuple(packages)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.split(".")[0] in self.packages:
+            return importlib.machinery.ModuleSpec(fullname, _StubLoader(), is_package=True)
+        return None
+
+
+def install_lollms_stubs(packages=STUBBED_PACKAGES) -> LollmsStubFinder:
+    """
+    Makes every module of `packages` importable as a stub, shadowing real installations.
+
+    Returns:
+        LollmsStubFinder: The installed finder (pass it to `uninstall_lollms_stubs` to remove it).
+    """
+    for name in list(sys.modules):
+        if name.split(".")[0] in packages:
+            del sys.modules[name]
+    finder = LollmsStubFinder(packages)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall_lollms_stubs(finder: LollmsStubFinder) -> None:
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+    for name in list(sys.modules):
+        if name.split(".")[0] in finder.packages:
+            del sys.modules[name]
@@ -0,0 +1,249 @@
+"""
+News store
+
+A persistent store of the articles scraped from RSS feeds and of the themes
+they were fused into, so that a new scrape only processes what is new. Each
+article is keyed by a hash of its GUID, or of its canonical link when the feed
+gives none, and remembers when it was first and last seen. Each theme records
+the members it was summarized with, so only the themes that gained articles
+are summarized again.
+
+Themes expire once none of their articles was seen in the feeds for the
+retention period.
+
+Usage in a processor:
+    from zoo_utilities.news_store import NewsStore
+
+    store = NewsStore(output_folder / "news_store.json")
+    new_ids = store.add_articles(feeds)
+    ...
+    theme_key = store.add_theme(article_ids)
+    for theme_key in store.themes_to_summarize():
+        store.set_summary(theme_key, summary)
+    store.save()
+
+Usage from the command line:
+    python -m zoo_utilities.news_store STORE_FILE [--prune DAYS]
+"""
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from ascii_colors import ASCIIColors
+
+STORE_VERSION = 1
+DEFAULT_RETENTION_DAYS = 3
+# Query parameters added by trackers, dropped from the links before comparing them
+TRACKING_PARAMETERS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ocid", "cmpid", "at_medium", "at_campaign")
+
+
+def canonical_link(link: str) -> str:
+    """
+    Returns a link without its fragment, tracking parameters and trailing slash, with an https scheme
+    and a lowercase host, so that the links of the same article given by several feeds are equal.
+    """
+    parts = urlparse(str(link).strip())
+    if not parts.netloc:
+        return str(link).strip()
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if not key.lower().startswith(TRACKING_PARAMETERS)]
+    path = parts.path.rstrip("/") or "/"
+    scheme = "https" if parts.scheme in ("http", "https") else parts.scheme
+    return urlunparse((scheme, parts.netloc.lower(), path, parts.params, urlencode(query), ""))
+
+
+def article_key(article: dict) -> str:
+    """
+    Returns the store key of an article (a dict with `link` and optionally `guid`).
+    """
+    identifier = str(article.get("guid") or "").strip()
+    if not identifier or identifier.startswith(("http://", "https://")):
+        identifier = canonical_link(identifier or article.get("link", ""))
+    return hashlib.sha1(identifier.encode("utf8")).hexdigest()[:20]
+
+
+class NewsStore:
+    """
+    The articles and themes kept from one scrape to the next, saved as a JSON file.
+
+    Args:
+        store_file (Path): The JSON file. It is created by the first `save`.
+    """
+
+    def __init__(self, store_file: Path) -> None:
+        self.store_file = Path(store_file)
+        self.articles = {}
+        self.themes = {}
+        self.next_theme = 1
+        try:
+            with open(self.store_file, "r", encoding="utf8") as f:
+                data = json.load(f)
+            if data.get("version") == STORE_VERSION:
+                self.articles = data.get("articles", {})
+                self.themes = data.get("themes", {})
+                self.next_theme = data.get("next_theme", len(self.themes) + 1)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as ex:
+            ASCIIColors.warning(f"Couldn't read the news store {self.store_file}, starting a new one: {ex}")
+
+    def save(self) -> None:
+        """
+        Writes the store, through a temporary file so that an interrupted write leaves the previous one intact.
+        """
+        data = {"version": STORE_VERSION, "next_theme": self.next_theme, "articles": self.articles, "themes": self.themes}
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.store_file.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf8") as f:
+            json.dump(data, f, indent=1)
+        temporary.replace(self.store_file)
+
+    def add_articles(self, articles: list, now: float = None) -> list:
+        """
+        Adds the articles of a scrape. Articles already stored only get their `last_seen` time updated.
+
+        Args:
+            articles (list): Dicts with at least `title`, `link` and `description`.
+            now (float): The time of the scrape (defaults to the current time).
+
+        Returns:
+            list: The keys of the articles seen for the first time, in the order of the scrape.
+        """
+        now = time.time() if now is None else now
+        new_keys = []
+        for article in articles:
+            key = article_key(article)
+            stored = self.articles.get(key)
+            if stored is not None:
+                stored["last_seen"] = now
+                continue
+            self.articles[key] = dict(article, first_seen=now, last_seen=now, theme=None)
+            new_keys.append(key)
+        return new_keys
+
+    def unassigned(self) -> list:
+        """
+        Returns the keys of the articles that are not in a theme yet.
+        """
+        return [key for key, article in self.articles.items() if article.get("theme") is None]
+
+    def add_theme(self, article_keys: list) -> str:
+        """
+        Creates a theme holding articles and returns its key.
+        """
+        theme_key = f"theme_{self.next_theme}"
+        self.next_theme += 1
+        self.themes[theme_key] = {"articles": [], "summary": None, "summarized_articles": [], "created": time.time()}
+        self.attach(theme_key, article_keys)
+        return theme_key
+
+    def attach(self, theme_key: str, article_keys: list) -> None:
+        """
+        Adds articles to a theme.
+        """
+        theme = self.themes[theme_key]
+        for key in article_keys:
+            if key not in theme["articles"]:
+                theme["articles"].append(key)
+            self.articles[key]["theme"] = theme_key
+
+    def merge_themes(self, theme_keys: list) -> str:
+        """
+        Merges themes into the oldest one and returns its key.
+        """
+        theme_keys = sorted(set(theme_keys), key=lambda key: self.themes[key]["created"])
+        kept = theme_keys[0]
+        for theme_key in theme_keys[1:]:
+            self.attach(kept, self.themes.pop(theme_key)["articles"])
+        return kept
+
+    def theme_articles(self, theme_key: str) -> list:
+        return [self.articles[key] for key in self.themes[theme_key]["articles"]]
+
+    def themes_to_summarize(self) -> list:
+        """
+        Returns the keys of the themes whose articles changed since their summary was made.
+        """
+        return [theme_key for theme_key, theme in self.themes.items() if theme.get("summary") is None or sorted(theme["summarized_articles"]) != sorted(theme["articles"])]
+
+    def set_summary(self, theme_key: str, summary: str) -> None:
+        theme = self.themes[theme_key]
+        theme["summary"] = summary
+        theme["summarized_articles"] = list(theme["articles"])
+
+    def category(self, theme_key: str) -> str:
+        """
+        Returns the category given to a theme, or None if it has none or its articles changed since.
+        """
+        theme = self.themes[theme_key]
+        if theme.get("category") is None or sorted(theme.get("categorized_articles", [])) != sorted(theme["articles"]):
+            return None
+        return theme["category"]
+
+    def set_category(self, theme_key: str, category: str) -> None:
+        theme = self.themes[theme_key]
+        theme["category"] = category
+        theme["categorized_articles"] = list(theme["articles"])
+
+    def prune(self, retention_days: float = DEFAULT_RETENTION_DAYS, now: float = None) -> int:
+        """
+        Removes the themes and the articles that were not seen in the feeds for `retention_days`.
+
+        Returns:
+            int: The number of removed articles.
+        """
+        limit = (time.time() if now is None else now) - retention_days * 24 * 3600
+        for theme_key in list(self.themes):
+            if all(article["last_seen"] < limit for article in self.theme_articles(theme_key)):
+                for key in self.themes.pop(theme_key)["articles"]:
+                    self.articles[key]["theme"] = None
+        expired = [key for key, article in self.articles.items() if article.get("theme") is None and article["last_seen"] < limit]
+        for key in expired:
+            del self.articles[key]
+        return len(expired)
+
+    def fused_articles(self, keep_only_multi_articles_subjects: bool = False) -> dict:
+        """
+        Returns the themes in the format of the `fused_articles.json` file: the title, thumbnails, content,
+        urls and summary of each theme, the themes with the most recent articles first.
+        """
+        fused = {}
+        order = sorted(self.themes, key=lambda theme_key: -max(article["first_seen"] for article in self.theme_articles(theme_key)))
+        for theme_key in order:
+            articles = self.theme_articles(theme_key)
+            if keep_only_multi_articles_subjects and len(articles) < 2:
+                continue
+            content = "\n\n".join(article.get("description", "") for article in articles)
+            summary = self.themes[theme_key].get("summary")
+            fused[theme_key] = {
+                "title": articles[0]["title"],
+                "thumbnails": articles[0].get("media_thumbnail", []),
+                "content": content,
+                "urls": [article["link"] for article in articles],
+                "summary": summary if summary is not None else content.strip(),
+            }
+        return fused
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shows the content of a news store")
+    parser.add_argument("store_file", type=Path, help="A news_store.json file, for example the one of the rss_feed_fuser output folder")
+    parser.add_argument("--prune", type=float, metavar="DAYS", help="Remove the themes and articles not seen for this number of days")
+    args = parser.parse_args()
+
+    store = NewsStore(args.store_file)
+    if args.prune is not None:
+        removed = store.prune(args.prune)
+        store.save()
+        ASCIIColors.success(f"Removed {removed} articles")
+    nb_fused = sum(1 for theme in store.themes.values() if len(theme["articles"]) > 1)
+    print(f"{len(store.articles)} articles, {len(store.unassigned())} not in a theme")
+    print(f"{len(store.themes)} themes, {nb_fused} with several articles, {len(store.themes_to_summarize())} to summarize")
+    for theme_key, theme in store.fused_articles(keep_only_multi_articles_subjects=True).items():
+        print(f"{len(theme['urls']):3d} articles  {theme_key:<12} {theme['title'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
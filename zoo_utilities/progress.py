@@ -0,0 +1,134 @@
+"""
+Throttled progress
+
+Nested loops that push a progress display at every inner iteration send
+O(n²) UI updates through the websocket, most of them showing the same
+percentages. `ThrottledProgress` sits between the loop and the function that
+renders the progress. It only forwards an update when one of the percentages
+changed since the last one sent, and at most `max_per_second` times per
+second. The latest skipped update is kept and sent by `flush()`, so the
+display always ends on the real final state.
+
+Usage in a processor:
+    from zoo_utilities.progress import ThrottledProgress, progress_text
+
+    progress = ThrottledProgress(lambda bars, **details: self.step(progress_text(bars, ["File", "Chunk"])))
+    for i, file in enumerate(files):
+        for j, chunk in enumerate(chunks):
+            progress.update([(i, len(files)), (j, len(chunks))])
+    progress.flush()
+
+Usage from the command line, to see how many updates a nested loop sends:
+    python -m zoo_utilities.progress [--outer 100] [--inner 100] [--rate 4]
+"""
+import argparse
+import threading
+import time
+
+DEFAULT_MAX_PER_SECOND = 4.0
+
+
+def percentages(bars: list) -> tuple:
+    """
+    Returns the integer percentages of progress bars given as (current, total) pairs.
+    """
+    return tuple(min(100, int(100 * current / total)) if total else 100 for current, total in bars)
+
+
+def progress_text(bars: list, labels: list = None) -> str:
+    """
+    Returns a one line description of progress bars, for example "File 2/5 (40%) | Chunk 3/10 (30%)".
+    """
+    labels = labels or [""] * len(bars)
+    parts = [f"{label} {current}/{total} ({percent}%)".strip() for label, (current, total), percent in zip(labels, bars, percentages(bars))]
+    return " | ".join(parts)
+
+
+class ThrottledProgress:
+    """
+    Coalesces progress updates before they reach the UI.
+
+    Args:
+        send (callable): Called with (bars, **details) to display an update.
+        max_per_second (float): Maximum number of updates sent per second (0 for no rate limit).
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, send, max_per_second: float = DEFAULT_MAX_PER_SECOND, clock=time.monotonic) -> None:
+        self.send = send
+        self.interval = 1.0 / max_per_second if max_per_second else 0.0
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_percentages = None
+        self._last_time = None
+        self._pending = None
+        self.received = 0
+        self.sent = 0
+
+    def update(self, bars: list, force: bool = False, **details) -> bool:
+        """
+        Reports the progress of nested loops.
+
+        Args:
+            bars (list): (current, total) pairs, from the outer loop to the inner one.
+            force (bool): Send the update even if the percentages did not change or the rate limit is reached.
+            **details: Passed to `send` (titles of the current items...).
+
+        Returns:
+            bool: True if the update was sent.
+        """
+        bars = [tuple(bar) for bar in bars]
+        now = self.clock()
+        with self._lock:
+            self.received += 1
+            current = percentages(bars)
+            if not force and (current == self._last_percentages or (self._last_time is not None and now - self._last_time < self.interval)):
+                self._pending = (bars, details)
+                return False
+            self._mark_sent(current, now)
+        self.send(bars, **details)
+        return True
+
+    def _mark_sent(self, current: tuple, now: float) -> None:
+        self._last_percentages = current
+        self._last_time = now
+        self._pending = None
+        self.sent += 1
+
+    def flush(self) -> bool:
+        """
+        Sends the last update if it was skipped.
+
+        Returns:
+            bool: True if an update was sent.
+        """
+        with self._lock:
+            pending = self._pending
+            if pending is None:
+                return False
+            self._mark_sent(percentages(pending[0]), self.clock())
+        self.send(pending[0], **pending[1])
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts the updates a nested loop sends with and without throttling")
+    parser.add_argument("--outer", type=int, default=100, help="Iterations of the outer loop")
+    parser.add_argument("--inner", type=int, default=100, help="Iterations of the inner loop")
+    parser.add_argument("--rate", type=float, default=DEFAULT_MAX_PER_SECOND, help="Maximum updates per second")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Simulated duration of the loop")
+    args = parser.parse_args()
+
+    total = args.outer * args.inner
+    clock_time = [0.0]
+    progress = ThrottledProgress(lambda bars, **details: None, args.rate, clock=lambda: clock_time[0])
+    for i in range(args.outer):
+        for j in range(args.inner):
+            clock_time[0] += args.seconds / total
+            progress.update([(i, args.outer), (j, args.inner)])
+    progress.flush()
+    print(f"{progress.received} updates received, {progress.sent} sent over {args.seconds:.0f} simulated seconds")
+
+
+if __name__ == "__main__":
+    main()
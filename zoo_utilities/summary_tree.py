@@ -0,0 +1,226 @@
+"""
+Summary tree
+
+A map-reduce summarization of a long text. The chunks of the text are
+summarized concurrently (the leaves), and consecutive summaries are merged by
+summarizing them together as soon as enough of them are ready to fill the
+input budget of a call (the fan-in follows the context size instead of being
+fixed) and the ready summaries of their level already exceed the target size,
+so that the level can't be the result. Merges run concurrently with the leaves still being summarized, so a
+level does not wait for the previous one to finish. The tree stops once a
+level, joined, fits the target size.
+
+With the same summarize function, the result is the one of the hierarchical
+mode (summarize every chunk, join, and repeat until the text fits), except that
+merges group whole summaries instead of cutting the joined text at arbitrary
+token positions. The wall time is about the depth of the tree times the
+latency of a call when the backend serves `concurrency` requests at once.
+
+Usage in a processor:
+    from zoo_utilities.summary_tree import summarize_tree
+
+    # summarize runs in worker threads, it must not use the personality helpers (see batch_generation)
+    summary = summarize_tree(
+        chunks,
+        lambda text: self.isolated_generate(chunk_header + text + chunk_footer),
+        count_tokens=get_token_cache(self.personality.model).count,
+        input_budget=int(self.personality.config.ctx_size * 0.6),
+        target_size=1024,
+        concurrency=self.default_llm_concurrency(),
+    )
+
+Usage from the command line, to compare the wall time with level by level summarizations, sequential and concurrent:
+    python -m zoo_utilities.summary_tree [--chunks 64] [--latency 0.2] [--concurrency 8]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ascii_colors import ASCIIColors
+
+# Levels of merges after which the tree stops even if the text does not fit the target size yet
+MAX_DEPTH = 8
+
+
+def summarize_tree(chunks: list, summarize, count_tokens=None, input_budget: int = 2048, target_size: int = 1024, concurrency: int = 1, separator: str = "\n", on_progress=None, max_depth: int = MAX_DEPTH) -> str:
+    """
+    Summarizes chunks into a text of at most `target_size` tokens with a tree of summaries.
+
+    Args:
+        chunks (list): The texts of the leaves, in document order.
+        summarize (callable): Summarizes a text. Called for the leaves and for the merges, from
+            worker threads when `concurrency` is above 1.
+        count_tokens (callable): Counts the tokens of a text (defaults to counting words).
+        input_budget (int): Maximum number of tokens of the summaries merged by one call. A summary
+            larger than the budget is summarized alone.
+        target_size (int): The size the result must fit in.
+        concurrency (int): Maximum number of calls running at once.
+        separator (str): The separator of the summaries that are merged or returned together.
+        on_progress (callable): Called with (finished calls, submitted calls) after each call.
+        max_depth (int): Maximum number of merge levels.
+
+    Returns:
+        str: The summaries of the last level, joined.
+    """
+    count_tokens = count_tokens or (lambda value: len(value.split()))
+    if not chunks:
+        return ""
+    # levels[depth] holds the summaries of a level, None until ready. A level is sealed
+    # once all its nodes exist, which happens when the level below is fully grouped.
+    levels = [[None] * len(chunks)]
+    sizes = [[None] * len(chunks)]
+    sealed = [True]
+    grouped = [0]
+    # Whether the ready summaries of a level already exceed the target size, so that the level
+    # cannot be the result and its groups can be merged before the rest of it is ready
+    overflowing = [False]
+    pending = {}
+    finished = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="summary_tree") as executor:
+
+        def submit(depth, texts):
+            while len(levels) <= depth:
+                levels.append([])
+                sizes.append([])
+                sealed.append(False)
+                grouped.append(0)
+                overflowing.append(False)
+            levels[depth].append(None)
+            sizes[depth].append(None)
+            pending[executor.submit(summarize, separator.join(texts))] = (depth, len(levels[depth]) - 1)
+
+        def schedule(depth):
+            # Groups the ready summaries of a level, in order, and returns the result once the tree is done
+            nodes = levels[depth]
+            start = grouped[depth]
+            level_done = sealed[depth] and all(node is not None for node in nodes[start:])
+            if not overflowing[depth]:
+                overflowing[depth] = sum(size for size in sizes[depth] if size is not None) > target_size
+            if level_done and start == 0:
+                joined = separator.join(nodes)
+                if count_tokens(joined) <= target_size or depth >= max_depth:
+                    if depth >= max_depth:
+                        ASCIIColors.warning(f"The summary tree reached {depth} levels and its text still has {count_tokens(joined)} tokens")
+                    grouped[depth] = len(nodes)
+                    return joined
+            if not (level_done or overflowing[depth]):
+                # The level may still fit the target size, as in the hierarchical mode it is then not merged
+                return None
+            tokens = 0
+            position = start
+            while position < len(nodes) and nodes[position] is not None:
+                if position > start and tokens + sizes[depth][position] > input_budget:
+                    submit(depth + 1, nodes[start:position])
+                    start = position
+                    tokens = 0
+                tokens += sizes[depth][position]
+                position += 1
+            if level_done and start < len(nodes):
+                submit(depth + 1, nodes[start:])
+                start = len(nodes)
+            grouped[depth] = start
+            if level_done:
+                sealed[depth + 1] = True
+            return None
+
+        for index, chunk in enumerate(chunks):
+            pending[executor.submit(summarize, chunk)] = (0, index)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth, index = pending.pop(future)
+                    summary = future.result()
+                    levels[depth][index] = summary
+                    sizes[depth][index] = count_tokens(summary)
+                    finished += 1
+                for depth in range(len(levels)):
+                    result = schedule(depth)
+                    if result is not None:
+                        return result
+                if on_progress is not None:
+                    on_progress(finished, finished + len(pending))
+        finally:
+            for future in pending:
+                future.cancel()
+    return separator.join(summary for summary in levels[-1] if summary is not None)
+
+
+def summarize_by_levels(chunks: list, summarize, count_tokens=None, input_budget: int = 2048, target_size: int = 1024, concurrency: int = 1, separator: str = "\n", max_depth: int = MAX_DEPTH) -> str:
+    """
+    Summarizes chunks level by level: every summary of a level is ready before the next level starts.
+    With a concurrency of 1 this is the hierarchical mode. The reference of `summarize_tree`, used by the benchmark.
+    """
+    count_tokens = count_tokens or (lambda value: len(value.split()))
+    texts = list(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as executor:
+        for depth in range(max_depth + 1):
+            summaries = list(executor.map(summarize, texts))
+            joined = separator.join(summaries)
+            if count_tokens(joined) <= target_size or depth == max_depth:
+                return joined
+            texts = []
+            group = []
+            tokens = 0
+            for summary in summaries:
+                size = count_tokens(summary)
+                if group and tokens + size > input_budget:
+                    texts.append(separator.join(group))
+                    group, tokens = [], 0
+                group.append(summary)
+                tokens += size
+            texts.append(separator.join(group))
+    return joined
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the wall time of the summary tree with level by level summarizations, with a simulated model")
+    parser.add_argument("--chunks", type=int, default=64, help="Number of chunks of the document")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Tokens of a chunk")
+    parser.add_argument("--summary-size", type=int, default=300, help="Tokens of a summary")
+    parser.add_argument("--budget", type=int, default=2400, help="Input budget of a call, in tokens")
+    parser.add_argument("--target", type=int, default=1024, help="Maximum size of the result, in tokens")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds taken by a call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Random variation of the latency, as a fraction of it")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls running at once")
+    args = parser.parse_args()
+
+    import random
+
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+    calls = [0]
+
+    def summarize(text):
+        with rng_lock:
+            calls[0] += 1
+            delay = args.latency * (1 + args.jitter * (2 * rng.random() - 1))
+        time.sleep(delay)
+        words = text.split()
+        return " ".join(words[:min(len(words), args.summary_size)])
+
+    chunks = [" ".join(f"w{i}_{j}" for j in range(args.chunk_size)) for i in range(args.chunks)]
+    runs = (
+        ("hierarchical", summarize_by_levels, 1),
+        ("by levels", summarize_by_levels, args.concurrency),
+        ("tree", summarize_tree, args.concurrency),
+    )
+    # The second case has a target larger than the input budget: a level may then fit the target
+    # after its summaries went over the budget, and must not be merged
+    cases = ((args.budget, args.target), (min(args.budget, args.target) * 3 // 5, args.target))
+    for budget, target in cases:
+        print(f"input budget {budget}, target size {target}")
+        reference = None
+        for name, function, concurrency in runs:
+            calls[0] = 0
+            start = time.perf_counter()
+            result = function(chunks, summarize, input_budget=budget, target_size=target, concurrency=concurrency)
+            reference = result if reference is None else reference
+            same = "same result" if result == reference else "DIFFERENT result"
+            print(f"{name:>12}: {time.perf_counter() - start:6.2f}s, {calls[0]} calls, {len(result.split())} tokens, {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The tests import zoo_utilities from the zoo root, like the processors do
+zoo_path = str(Path(__file__).resolve().parents[2])
+if zoo_path not in sys.path:
+    sys.path.append(zoo_path)
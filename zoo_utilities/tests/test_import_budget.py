@@ -0,0 +1,26 @@
+"""
+Import-time budget of the processors (see import_budget.py).
+
+Each processor is imported in a fresh interpreter, one at a time, so that the
+measures don't compete for the cores. Processors that need a package missing
+from the current environment are skipped. The budget can be changed with the
+ZOO_IMPORT_BUDGET environment variable (in seconds).
+
+    python -m pytest zoo_utilities/tests
+"""
+import os
+
+import pytest
+
+from zoo_utilities.import_budget import DEFAULT_BUDGET, ZOO_ROOT, discover_processors, measure_in_subprocess
+
+BUDGET = float(os.environ.get("ZOO_IMPORT_BUDGET", DEFAULT_BUDGET))
+
+
+@pytest.mark.parametrize("processor_path", discover_processors(), ids=lambda path: path.relative_to(ZOO_ROOT).parent.parent.as_posix())
+def test_processor_imports_within_budget(processor_path):
+    result = measure_in_subprocess(processor_path)
+    if result["status"] == "missing":
+        pytest.skip(result["error"])
+    assert result["status"] == "ok", result["error"]
+    assert result["seconds"] <= BUDGET, f"imported in {result['seconds']:.2f}s, over the {BUDGET}s budget{' (' + result['error'] + ')' if result['error'] else ''}"
@@ -0,0 +1,330 @@
+"""
+Text clustering
+
+Groups short texts (news titles and descriptions, questions...) that talk
+about the same thing without asking the LLM about every pair. Texts are turned
+into TF-IDF vectors with NumPy, pairs above a cosine similarity threshold are
+merged with a union-find, and pairs in a gray zone below the threshold can be
+handed to a confirmation function (usually a `yes_no` LLM call).
+
+`classify_texts` reuses the vectors for a nearest centroid classifier that
+labels the texts close enough to examples and leaves the others to the LLM.
+
+Usage in a processor:
+    from zoo_utilities.text_clustering import cluster_texts
+
+    clusters = cluster_texts(
+        [f"{a['title']} {a['description']}" for a in articles],
+        threshold=0.5,
+        borderline=0.3,
+        confirm=lambda i, j: self.are_articles_similar(articles[i], articles[j]),
+    )
+
+Usage from the command line, to tune the threshold on real data:
+    python -m zoo_utilities.text_clustering FILE [--threshold 0.5]
+"""
+import argparse
+import json
+import math
+import re
+from pathlib import Path
+
+import numpy as np
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[^\W\d_]{2,}|\d{3,}")
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has have he her his how i if in
+into is it its just may more most new no not of on one or our out over said says she so some than that the their them then there
+these they this those to up was we were what when which who will with would you your
+""".split())
+
+
+def text_terms(text: str) -> list:
+    """
+    Returns the lowercase words of a text, without HTML tags nor stop words.
+    """
+    return [word for word in _WORD.findall(_TAG.sub(" ", str(text)).lower()) if word not in STOP_WORDS]
+
+
+class TfidfModel:
+    """
+    A minimal TF-IDF vectorizer with sublinear term frequencies and smoothed IDF.
+
+    Vectors are dense and L2 normalized, so dot products are cosine similarities.
+    That suits collections of a few thousand short texts.
+
+    Args:
+        min_df (int): Terms found in fewer texts are ignored.
+        max_features (int): Keep only the most frequent terms (None keeps them all).
+    """
+
+    def __init__(self, min_df: int = 1, max_features: int = None) -> None:
+        self.min_df = min_df
+        self.max_features = max_features
+        self.vocabulary = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    def fit(self, texts: list) -> "TfidfModel":
+        documents = [set(text_terms(text)) for text in texts]
+        document_frequencies = {}
+        for terms in documents:
+            for term in terms:
+                document_frequencies[term] = document_frequencies.get(term, 0) + 1
+        terms = [term for term, frequency in document_frequencies.items() if frequency >= self.min_df]
+        terms.sort(key=lambda term: (-document_frequencies[term], term))
+        if self.max_features:
+            terms = terms[:self.max_features]
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        n_documents = len(documents)
+        self.idf = np.array([math.log((1 + n_documents) / (1 + document_frequencies[term])) + 1 for term in terms], dtype=np.float32)
+        return self
+
+    def transform(self, texts: list) -> np.ndarray:
+        matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in text_terms(text):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    matrix[row, column] += 1
+        np.log1p(matrix, out=matrix)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def fit_transform(self, texts: list) -> np.ndarray:
+        return self.fit(texts).transform(texts)
+
+    def transform_sparse(self, texts: list) -> tuple:
+        """
+        Returns the vectors of texts as the (data, indices, indptr) arrays of a CSR matrix,
+        for collections whose dense matrix would not fit in memory.
+        """
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            counts = {}
+            for term in text_terms(text):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            columns = np.array(sorted(counts), dtype=np.int32)
+            values = np.log1p(np.array([counts[column] for column in columns], dtype=np.float32)) * self.idf[columns]
+            norm = np.linalg.norm(values)
+            data.append(values / norm if norm else values)
+            indices.append(columns)
+            indptr.append(indptr[-1] + len(columns))
+        if not texts:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64)
+        return np.concatenate(data), np.concatenate(indices), np.array(indptr, dtype=np.int64)
+
+    def state(self) -> dict:
+        """
+        Returns the fitted vocabulary and IDF as arrays, to save them with `np.savez`.
+        """
+        return {"terms": np.array(list(self.vocabulary), dtype=str), "idf": self.idf}
+
+    def load_state(self, state: dict) -> "TfidfModel":
+        self.vocabulary = {str(term): index for index, term in enumerate(state["terms"])}
+        self.idf = np.asarray(state["idf"], dtype=np.float32)
+        return self
+
+
+class UnionFind:
+    """
+    Disjoint sets over the integers 0..n-1 with path halving and union by size.
+    """
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+    def groups(self) -> list:
+        """
+        Returns the sets as sorted lists of items, ordered by their smallest item.
+        """
+        groups = {}
+        for item in range(len(self.parent)):
+            groups.setdefault(self.find(item), []).append(item)
+        return sorted(groups.values(), key=lambda group: group[0])
+
+
+def similarity_matrix(texts: list) -> np.ndarray:
+    """
+    Returns the cosine similarities between the TF-IDF vectors of texts.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = TfidfModel().fit_transform(texts)
+    return vectors @ vectors.T
+
+
+def similar_pairs(texts: list, compared: list, min_similarity: float) -> tuple:
+    """
+    Returns the pairs of texts whose TF-IDF cosine similarity is at or above a value, for a few compared texts.
+
+    The vectors stay sparse (see `TfidfModel.transform_sparse`) and each compared text is only
+    scored against the texts sharing one of its terms, so neither the texts x vocabulary matrix
+    nor the texts x compared texts similarities are ever built.
+
+    Args:
+        texts (list): The texts.
+        compared (list): The indices of the texts to compare with all the texts.
+        min_similarity (float): The smallest similarity of the returned pairs.
+
+    Returns:
+        tuple: (rows, columns, similarities) arrays, `columns` holding the compared texts. A text is not paired with itself.
+    """
+    n = len(texts)
+    model = TfidfModel().fit(texts)
+    data, indices, indptr = model.transform_sparse(texts)
+    # The same vectors by term: the texts holding each term and their weights
+    by_term = np.argsort(indices, kind="stable")
+    term_texts = np.repeat(np.arange(n), np.diff(indptr))[by_term]
+    term_weights = data[by_term]
+    term_starts = np.searchsorted(indices[by_term], np.arange(len(model.vocabulary) + 1))
+    rows, columns, similarities = [], [], []
+    for column in np.asarray(compared, dtype=np.int64).tolist():
+        terms = indices[indptr[column]:indptr[column + 1]]
+        starts, lengths = term_starts[terms], term_starts[terms + 1] - term_starts[terms]
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        weights = term_weights[positions] * np.repeat(data[indptr[column]:indptr[column + 1]], lengths)
+        scores = np.bincount(term_texts[positions], weights=weights, minlength=n)
+        matches = np.flatnonzero(scores >= min_similarity)
+        matches = matches[matches != column]
+        rows.append(matches)
+        columns.append(np.full(len(matches), column, dtype=np.int64))
+        similarities.append(scores[matches])
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(rows), np.concatenate(columns), np.concatenate(similarities)
+
+
+def cluster_texts(texts: list, threshold: float = 0.5, borderline: float = None, confirm=None, on_progress=None, groups: list = None, new: list = None) -> list:
+    """
+    Groups texts about the same subject.
+
+    To add texts to a previous clustering, pass the previous groups and the indices of the
+    added texts: only the pairs involving an added text are compared, so the groups can grow
+    and merge but are never split.
+
+    Args:
+        texts (list): The texts.
+        threshold (float): Pairs with a cosine similarity at or above this value are merged.
+        borderline (float): Pairs with a similarity between this value and `threshold` are
+            passed to `confirm` (ignored when `confirm` is None).
+        confirm (callable): Called with (i, j) for the borderline pairs, returns True to merge them.
+            Pairs whose texts are already in the same group are not asked.
+        on_progress (callable): Called with (done, total) after each confirmation.
+        groups (list): Lists of text indices already grouped together.
+        new (list): The indices of the texts to compare (None compares all the pairs). Only the
+            texts sharing a term with them are scored (see `similar_pairs`).
+
+    Returns:
+        list: The groups, as lists of text indices ordered by their first text.
+    """
+    n = len(texts)
+    union_find = UnionFind(n)
+    for group in groups or []:
+        for item in group[1:]:
+            union_find.union(group[0], item)
+    if n < 2:
+        return union_find.groups()
+    is_new = np.ones(n, dtype=bool)
+    if new is not None:
+        is_new[:] = False
+        is_new[list(new)] = True
+    asking = confirm is not None and borderline is not None and borderline < threshold
+    rows, columns, similarities = similar_pairs(texts, np.flatnonzero(is_new), borderline if asking else threshold)
+    # Each pair is looked at once: a pair of compared texts is kept for its later text only
+    kept = (rows < columns) | ~is_new[rows]
+    rows, columns, similarities = rows[kept], columns[kept], similarities[kept]
+    order = np.lexsort((columns, rows))
+    rows, columns, similarities = rows[order], columns[order], similarities[order]
+    above = similarities >= threshold
+    for i, j in zip(rows[above].tolist(), columns[above].tolist()):
+        union_find.union(i, j)
+    if asking:
+        rows, columns, values = rows[~above], columns[~above], similarities[~above]
+        # The most similar pairs first, so that later pairs are more often already merged
+        order = np.argsort(-values, kind="stable")
+        total = len(order)
+        for done, index in enumerate(order.tolist(), start=1):
+            i, j = sorted((int(rows[index]), int(columns[index])))
+            if union_find.find(i) != union_find.find(j) and confirm(i, j):
+                union_find.union(i, j)
+            if on_progress is not None:
+                on_progress(done, total)
+    return union_find.groups()
+
+
+def classify_texts(texts: list, examples: dict, min_similarity: float = 0.3, min_margin: float = 0.05) -> list:
+    """
+    Assigns texts to the label whose examples they are closest to (nearest TF-IDF centroid).
+
+    Args:
+        texts (list): The texts to classify.
+        examples (dict): Lists of example texts by label. Labels without examples are never given.
+        min_similarity (float): Texts whose cosine similarity to the nearest centroid is below this value get no label.
+        min_margin (float): Texts for which the nearest centroid is not at least this much closer than the
+            second one get no label.
+
+    Returns:
+        list: (label, similarity) pairs, the label is None when the text is too far or too ambiguous.
+    """
+    labels = [label for label, label_examples in examples.items() if label_examples]
+    if not texts or not labels:
+        return [(None, 0.0) for _ in texts]
+    model = TfidfModel().fit(list(texts) + [example for label in labels for example in examples[label]])
+    centroids = np.stack([model.transform(examples[label]).mean(axis=0) for label in labels])
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    similarities = model.transform(texts) @ (centroids / norms).T
+    order = np.argsort(-similarities, axis=1)
+    results = []
+    for row, ranking in enumerate(order):
+        best = float(similarities[row, ranking[0]])
+        second = float(similarities[row, ranking[1]]) if len(labels) > 1 else 0.0
+        label = labels[ranking[0]] if best >= min_similarity and best - second >= min_margin else None
+        results.append((label, best))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clusters the texts of a JSON list (strings or objects with title and description)")
+    parser.add_argument("file", type=Path, help="A JSON file, for example the news_data.json of rss_feed_fuser")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Cosine similarity from which two texts are grouped")
+    args = parser.parse_args()
+
+    with open(args.file, "r", encoding="utf8") as f:
+        entries = json.load(f)
+    texts = [entry if isinstance(entry, str) else f"{entry.get('title', '')} {entry.get('description', '')}" for entry in entries]
+    clusters = cluster_texts(texts, args.threshold)
+    for cluster in sorted(clusters, key=len, reverse=True):
+        if len(cluster) < 2:
+            break
+        print(f"{len(cluster)} texts:")
+        for index in cluster:
+            print(f"    {texts[index][:100]}")
+    print(f"{len(texts)} texts, {len(clusters)} clusters, {sum(1 for c in clusters if len(c) > 1)} with several texts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Logo thumbnails
+
+Turns the `assets/logo.png` of each personality into small content-hashed
+variants (64, 128 and 256 pixels) so that listing the zoo does not require
+sending the full size logos.
+
+Thumbnails are generated lazily the first time they are requested and kept on
+disk in the `.thumbnails` folder of the zoo. Since their names are derived from
+the hash of the source logo, a changed logo automatically gets new thumbnails
+and stale ones can be pruned.
+
+Usage:
+    python -m zoo_utilities.thumbnails [--zoo PATH] [--workers N] [--format webp|png] [--prune]
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+THUMBNAIL_SIZES = (64, 128, 256)
+THUMBNAILS_FOLDER_NAME = ".thumbnails"
+ZOO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@lru_cache(maxsize=None)
+def default_format() -> str:
+    """
+    Returns "webp" when the installed Pillow can encode it, "png" otherwise.
+    """
+    try:
+        from PIL import features
+        return "webp" if features.check("webp") else "png"
+    except ImportError:
+        return "png"
+
+
+def logo_digest(logo_path: Path) -> str:
+    """
+    Returns the content hash used to name the thumbnails of a logo.
+    """
+    h = hashlib.sha256()
+    with open(logo_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def thumbnail_name(digest: str, size: int, fmt: str = None) -> str:
+    return f"{digest}-{size}.{fmt or default_format()}"
+
+
+def thumbnail_names(digest: str, fmt: str = None) -> dict:
+    """
+    Returns the names of all the thumbnail variants of a logo, keyed by size.
+    """
+    fmt = fmt or default_format()
+    return {str(size): f"{THUMBNAILS_FOLDER_NAME}/{thumbnail_name(digest, size, fmt)}" for size in THUMBNAIL_SIZES}
+
+
+def render_thumbnails(logo_path: Path, output_folder: Path, digest: str = None, sizes=THUMBNAIL_SIZES, fmt: str = None) -> dict:
+    """
+    Renders the missing thumbnails of a logo.
+
+    The logo is decoded once and downscaled from the largest to the smallest
+    size, each variant being resized from the previous one.
+
+    Args:
+        logo_path (Path): The source logo.
+        output_folder (Path): The folder where the thumbnails are written.
+        digest (str): The content hash of the logo (computed if not provided).
+        sizes (tuple): The thumbnail sizes in pixels.
+        fmt (str): "webp" or "png" (defaults to the best supported one).
+
+    Returns:
+        dict: The path of every thumbnail, keyed by size.
+    """
+    from PIL import Image
+
+    fmt = fmt or default_format()
+    digest = digest or logo_digest(logo_path)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    paths = {size: output_folder / thumbnail_name(digest, size, fmt) for size in sizes}
+    missing = [size for size, path in paths.items() if not path.exists()]
+    if not missing:
+        return paths
+
+    with Image.open(logo_path) as image:
+        image = image.convert("RGBA")
+        for size in sorted(missing, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            tmp_path = paths[size].with_name(paths[size].name + f".{os.getpid()}.tmp")
+            if fmt == "webp":
+                image.save(tmp_path, "WEBP", quality=85, method=4)
+            else:
+                image.save(tmp_path, "PNG", optimize=True)
+            os.replace(tmp_path, paths[size])
+    return paths
+
+
+def get_thumbnail(personality_folder: Path, size: int = 128, fmt: str = None, digest: str = None, zoo_path: Path = ZOO_ROOT) -> Path:
+    """
+    Returns the path of a thumbnail of a personality logo, rendering it on first request.
+
+    Args:
+        personality_folder (Path): The personality folder.
+        size (int): One of THUMBNAIL_SIZES.
+        fmt (str): "webp" or "png".
+        digest (str): The logo hash recorded in the catalog, which avoids hashing the logo again.
+        zoo_path (Path): The zoo root holding the thumbnails folder.
+
+    Returns:
+        Path: The thumbnail path, or None if the personality has no logo.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"Unsupported thumbnail size {size}, use one of {THUMBNAIL_SIZES}")
+    logo_path = Path(personality_folder) / "assets" / "logo.png"
+    if not logo_path.exists():
+        return None
+    paths = render_thumbnails(logo_path, Path(zoo_path) / THUMBNAILS_FOLDER_NAME, digest, sizes=(size,), fmt=fmt)
+    return paths[size]
+
+
+def _render_worker(logo_path: str, output_folder: str, fmt: str) -> str:
+    digest = logo_digest(Path(logo_path))
+    render_thumbnails(Path(logo_path), Path(output_folder), digest, fmt=fmt)
+    return digest
+
+
+def build_all_thumbnails(zoo_path: Path = ZOO_ROOT, workers: int = None, fmt: str = None, prune: bool = False) -> dict:
+    """
+    Renders the thumbnails of every personality logo of the zoo using a process pool.
+
+    Args:
+        zoo_path (Path): The zoo root.
+        workers (int): Number of worker processes (defaults to the number of CPUs).
+        fmt (str): "webp" or "png".
+        prune (bool): If True, thumbnails that no longer match any logo are deleted.
+
+    Returns:
+        dict: Counters of rendered logos, failures and pruned files.
+    """
+    zoo_path = Path(zoo_path)
+    fmt = fmt or default_format()
+    output_folder = zoo_path / THUMBNAILS_FOLDER_NAME
+    logos = sorted(zoo_path.glob("*/*/assets/logo.png"))
+    digests = set()
+    stats = {"logos": len(logos), "failed": 0, "pruned": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_render_worker, str(logo), str(output_folder), fmt): logo for logo in logos}
+        for future in as_completed(futures):
+            try:
+                digests.add(future.result())
+            except Exception as ex:
+                ASCIIColors.error(f"Couldn't build thumbnails for {futures[future]}: {ex}")
+                stats["failed"] += 1
+
+    if prune and stats["failed"] == 0 and output_folder.exists():
+        for thumbnail in output_folder.iterdir():
+            if thumbnail.name.split("-")[0] not in digests:
+                thumbnail.unlink()
+                stats["pruned"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the thumbnails of all the personality logos of the zoo")
+    parser.add_argument("--zoo", type=Path, default=ZOO_ROOT, help="The root folder of the zoo")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--format", choices=["webp", "png"], default=None, help="Thumbnails format")
+    parser.add_argument("--prune", action="store_true", help="Delete thumbnails of logos that no longer exist")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_all_thumbnails(args.zoo, args.workers, args.format, args.prune)
+    ASCIIColors.success(f"Thumbnails of {stats['logos']} logos ready ({stats['failed']} failed, {stats['pruned']} pruned) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
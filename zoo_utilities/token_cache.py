@@ -0,0 +1,178 @@
+"""
+Token counts cache
+
+Processors often tokenize the same large text several times: to log its size,
+to check it against the context size and again to crop it. `TokenCache`
+memoizes tokenizations keyed by a hash of the text, and answers head and tail
+crops by tokenizing only the needed end of the text.
+
+The memory footprint is bounded: token lists are stored as compact integer
+arrays and evicted least recently used first once `max_tokens` tokens are
+held. Plain counts are kept in a separate, larger LRU.
+
+Usage:
+    from zoo_utilities.token_cache import get_token_cache
+
+    tokens = get_token_cache(self.personality.model)
+    if tokens.count(full_text) > self.personality.config.ctx_size:
+        full_text = tokens.tail(full_text, self.personality.config.ctx_size)
+    head = tokens.head(pdf_text, self.personality_config.chunk_size)
+"""
+import hashlib
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+
+DEFAULT_MAX_TOKENS = 2_000_000
+DEFAULT_MAX_COUNTS = 20_000
+# Tokens dropped at the cut when tokenizing a slice of a text, as the boundary may split a token differently
+_CROP_MARGIN = 8
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf8", errors="surrogatepass"), digest_size=16).digest()
+
+
+class TokenCache:
+    """
+    Memoized tokenization of a model.
+
+    Args:
+        tokenize (callable): The tokenize function of the model.
+        detokenize (callable): The detokenize function of the model.
+        max_tokens (int): Maximum number of tokens kept in memory.
+        max_counts (int): Maximum number of token counts kept in memory.
+    """
+
+    def __init__(self, tokenize, detokenize, max_tokens: int = DEFAULT_MAX_TOKENS, max_counts: int = DEFAULT_MAX_COUNTS) -> None:
+        self._tokenize = tokenize
+        self._detokenize = detokenize
+        self.max_tokens = max_tokens
+        self.max_counts = max_counts
+        self._tokens = OrderedDict()
+        self._counts = OrderedDict()
+        self._stored_tokens = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, digest: bytes, tokens: list) -> None:
+        with self._lock:
+            self._counts[digest] = len(tokens)
+            self._counts.move_to_end(digest)
+            while len(self._counts) > self.max_counts:
+                self._counts.popitem(last=False)
+            if len(tokens) > self.max_tokens or digest in self._tokens:
+                return
+            self._tokens[digest] = array("l", tokens)
+            self._stored_tokens += len(tokens)
+            while self._stored_tokens > self.max_tokens:
+                _, evicted = self._tokens.popitem(last=False)
+                self._stored_tokens -= len(evicted)
+
+    def tokenize(self, text: str) -> list:
+        """
+        Returns the tokens of a text, tokenizing it only if it was not seen recently.
+        """
+        digest = text_digest(text)
+        with self._lock:
+            tokens = self._tokens.get(digest)
+            if tokens is not None:
+                self._tokens.move_to_end(digest)
+                self.hits += 1
+                return tokens.tolist()
+            self.misses += 1
+        tokens = list(self._tokenize(text))
+        self._remember(digest, tokens)
+        return tokens
+
+    def detokenize(self, tokens: list) -> str:
+        return self._detokenize(list(tokens))
+
+    def count(self, text: str) -> int:
+        """
+        Returns the number of tokens of a text.
+        """
+        digest = text_digest(text)
+        with self._lock:
+            count = self._counts.get(digest)
+            if count is not None:
+                self._counts.move_to_end(digest)
+                self.hits += 1
+                return count
+        return len(self.tokenize(text))
+
+    def head(self, text: str, n_tokens: int) -> str:
+        """
+        Returns the first `n_tokens` tokens of a text as text.
+
+        Only a prefix of the text is tokenized: its length starts from an estimate and
+        doubles until it holds enough tokens, so cropping a whole book costs about as
+        much as tokenizing the crop.
+        """
+        return self._crop(text, n_tokens, from_start=True)
+
+    def tail(self, text: str, n_tokens: int) -> str:
+        """
+        Returns the last `n_tokens` tokens of a text as text, tokenizing only a suffix of it.
+        """
+        return self._crop(text, n_tokens, from_start=False)
+
+    def _crop(self, text: str, n_tokens: int, from_start: bool) -> str:
+        if n_tokens <= 0:
+            return ""
+        with self._lock:
+            tokens = self._tokens.get(text_digest(text))
+        if tokens is not None:
+            if len(tokens) <= n_tokens:
+                return text
+            return self._detokenize((tokens[:n_tokens] if from_start else tokens[-n_tokens:]).tolist())
+        span = (n_tokens + _CROP_MARGIN) * 6
+        while span < len(text):
+            part = text[:span] if from_start else text[-span:]
+            tokens = list(self._tokenize(part))
+            if len(tokens) >= n_tokens + _CROP_MARGIN:
+                return self._detokenize(tokens[:n_tokens] if from_start else tokens[-n_tokens:])
+            span *= 2
+        tokens = self.tokenize(text)
+        if len(tokens) <= n_tokens:
+            return text
+        return self._detokenize(tokens[:n_tokens] if from_start else tokens[-n_tokens:])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._counts.clear()
+            self._stored_tokens = 0
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def _model_name(model) -> str:
+    # A lollms binding keeps its object when another model is selected, only its configured model name changes
+    try:
+        return str(model.config.model_name)
+    except Exception:
+        return ""
+
+
+def get_token_cache(model) -> TokenCache:
+    """
+    Returns the token cache of a model (a lollms binding or anything with tokenize/detokenize).
+
+    One cache is kept per model object and model name (`model.config.model_name`), so
+    switching models, even within the same binding, never mixes token ids. It goes away
+    with the model.
+    """
+    model_name = _model_name(model)
+    with _caches_lock:
+        name, cache = _caches.get(model, (None, None))
+        if cache is None or name != model_name:
+            # The cache must not keep the model alive
+            model_ref = weakref.ref(model)
+            cache = TokenCache(lambda text: model_ref().tokenize(text), lambda tokens: model_ref().detokenize(tokens))
+            _caches[model] = (model_name, cache)
+        return cache
@@ -0,0 +1,224 @@
+"""
+Web article extraction
+
+Downloads web pages concurrently and turns them into markdown with a
+conversion function given by the processor (usually docling DocumentConverters
+kept for the whole session), called from the worker threads. Every page has a
+deadline covering its download and its conversion, so a slow site or a page
+that is slow to convert can't hold a run. The markdown is kept in a cache
+folder: a page shared by several themes or runs is downloaded and converted
+once until its entry expires. Pages that could not be extracted are not tried
+again until `forget_failures` is called, usually at the start of each run.
+
+The cache is content addressed: the markdown is stored under the hash of its
+text and an index maps each url to its hash and extraction time, so pages
+with the same content share one file.
+
+Usage in a processor:
+    from zoo_utilities.web_articles import ArticleExtractor
+
+    extractor = ArticleExtractor(output_folder / "articles_cache", self.convert_article)
+    extractor.forget_failures()                 # at the start of a run
+    texts = extractor.extract_many(urls)        # {url: markdown or None}
+    text = extractor.extract(url)
+
+Usage from the command line, to see or empty the cache:
+    python -m zoo_utilities.web_articles CACHE_FOLDER [--clear]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from ascii_colors import ASCIIColors
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 20
+DEFAULT_TTL = 24 * 3600
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+INDEX_FILE_NAME = "articles.json"
+USER_AGENT = "Mozilla/5.0 (compatible; lollms-article-extractor)"
+
+
+class ArticleExtractor:
+    """
+    Concurrent web page to markdown extraction with an on-disk cache.
+
+    Args:
+        cache_folder (Path): Where the markdown and its index are kept.
+        convert (callable): Called with (url, content, content_type) where content is the
+            downloaded bytes, returns the markdown. It is called from several worker threads at once.
+        max_workers (int): Maximum number of pages downloaded and converted at once.
+        timeout (float): Maximum time in seconds to download and convert a page. A page still
+            converting after it is given up, its markdown is cached if the conversion ends later.
+        ttl (float): Time in seconds after which a cached page is extracted again.
+        session (requests.Session): The HTTP session to use (a new one by default).
+    """
+
+    def __init__(self, cache_folder: Path, convert, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT, ttl: float = DEFAULT_TTL, session=None) -> None:
+        self.cache_folder = Path(cache_folder)
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        self.convert = convert
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ttl = ttl
+        if session is None:
+            import requests
+
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+        self._lock = threading.Lock()
+        self._failures = set()
+        try:
+            with open(self.cache_folder / INDEX_FILE_NAME, "r", encoding="utf8") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _save_index(self) -> None:
+        path = self.cache_folder / INDEX_FILE_NAME
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf8") as f:
+            json.dump(self._index, f, indent=1)
+        temporary.replace(path)
+
+    def cached(self, url: str) -> str:
+        """
+        Returns the cached markdown of a page, or None if it is not cached or expired.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+        if entry is None or time.time() - entry.get("time", 0) > self.ttl:
+            return None
+        try:
+            return (self.cache_folder / f"{entry['sha256']}.md").read_text(encoding="utf8")
+        except OSError:
+            return None
+
+    def forget_failures(self) -> None:
+        """
+        Lets the pages that could not be extracted be tried again.
+        """
+        with self._lock:
+            self._failures.clear()
+
+    def _download(self, url: str, deadline: float):
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                chunks.append(chunk)
+                size += len(chunk)
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"the download took more than {self.timeout}s")
+                if size > MAX_PAGE_BYTES:
+                    raise ValueError(f"the page is larger than {MAX_PAGE_BYTES // (1024 * 1024)} MB")
+            return b"".join(chunks), response.headers.get("Content-Type", "")
+
+    def _extract(self, url: str, started: dict) -> str:
+        started[url] = time.monotonic()
+        try:
+            content, content_type = self._download(url, started[url] + self.timeout)
+            text = self.convert(url, content, content_type)
+        except Exception as ex:
+            ASCIIColors.warning(f"Couldn't extract {url}: {ex}")
+            with self._lock:
+                self._failures.add(url)
+            return None
+        digest = hashlib.sha256(text.encode("utf8", errors="surrogatepass")).hexdigest()
+        blob = self.cache_folder / f"{digest}.md"
+        if not blob.exists():
+            blob.write_text(text, encoding="utf8", errors="surrogatepass")
+        with self._lock:
+            self._index[url] = {"sha256": digest, "time": time.time()}
+        return text
+
+    def extract(self, url: str) -> str:
+        """
+        Returns the markdown of a page, or None if it could not be downloaded or converted.
+        """
+        return self.extract_many([url]).get(url)
+
+    def extract_many(self, urls: list) -> dict:
+        """
+        Extracts pages concurrently, each url once.
+
+        Returns:
+            dict: The markdown of each url, None for the pages that could not be extracted
+            (now or earlier in the run) or that took more than `timeout` seconds.
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        texts = {url: self.cached(url) for url in unique_urls}
+        with self._lock:
+            missing = [url for url, text in texts.items() if text is None and url not in self._failures]
+        if not missing:
+            return texts
+        # The workers note when they start a page, its deadline runs from there
+        started = {}
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing)), thread_name_prefix="web_articles")
+        futures = {executor.submit(self._extract, url, started): url for url in missing}
+        try:
+            while futures:
+                now = time.monotonic()
+                deadlines = [started[url] + self.timeout for url in futures.values() if url in started]
+                done, _ = wait(futures, timeout=max(0.0, min(deadlines, default=now + 0.1) - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    texts[futures.pop(future)] = future.result()
+                now = time.monotonic()
+                for future, url in list(futures.items()):
+                    if url in started and now > started[url] + self.timeout:
+                        # The conversion can't be interrupted, it goes on in its thread but the page is given up
+                        del futures[future]
+                        ASCIIColors.warning(f"Couldn't extract {url}: it took more than {self.timeout}s")
+                        with self._lock:
+                            self._failures.add(url)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._save_index()
+        return texts
+
+    def prune(self) -> int:
+        """
+        Removes the expired entries and the files no entry uses anymore.
+
+        Returns:
+            int: The number of removed files.
+        """
+        now = time.time()
+        with self._lock:
+            self._index = {url: entry for url, entry in self._index.items() if now - entry.get("time", 0) <= self.ttl}
+            used = {entry["sha256"] for entry in self._index.values()}
+            self._save_index()
+        removed = 0
+        for blob in self.cache_folder.glob("*.md"):
+            if blob.stem not in used:
+                blob.unlink()
+                removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shows or empties a cache of extracted web articles")
+    parser.add_argument("cache_folder", type=Path, help="The cache folder (for example the articles_cache folder of rss_feed_fuser)")
+    parser.add_argument("--clear", action="store_true", help="Remove every cached article")
+    args = parser.parse_args()
+
+    extractor = ArticleExtractor(args.cache_folder, convert=None)
+    if args.clear:
+        extractor.ttl = -1
+        removed = extractor.prune()
+        ASCIIColors.success(f"Removed {removed} articles")
+        return
+    blobs = list(args.cache_folder.glob("*.md"))
+    size = sum(blob.stat().st_size for blob in blobs)
+    print(f"{len(extractor._index)} urls, {len(blobs)} distinct articles, {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()